@@ -0,0 +1,271 @@
+"""
+ Title: Main file for benchmarking
+ Description: Times the hot paths of the optimisation on reproducible fixtures
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import time, json, os, sys, platform, subprocess, tempfile, traceback, statistics
+import numpy as np
+
+# IO Constants
+BENCH_PATH      = './results/benchmarks/'
+FIXTURE_FILE    = 'synthetic_alloy'
+
+# Benchmark constants
+NUM_REPEATS     = 5
+SEED            = 0
+NUM_POINTS      = 2000 # points per synthetic experimental curve
+NUM_CURVES      = 100 # synthetic curves for the polyfier
+TEST_NAMES      = ['G32', 'G33', 'G44', 'G25']
+TEST_STRESSES   = [60, 65, 70, 80]
+TEST_X_ENDS     = [9000, 6000, 3500, 1500]
+TEST_Y_ENDS     = [0.30, 0.28, 0.25, 0.22]
+ERROR_NAMES     = ['err_dy_min', 'err_dy_area', 'err_x_area', 'err_y_area', 'err_x_end', 'err_y_end']
+PARAMS_LIST     = [ # fixed parameter sets (from previous optimisations)
+    [8.578169, 61.217991, 4.292193, 3.304246, 6324.500215, 4.167187e+09, 0.945448, 2.846106],
+    [42.939206, 57.250586, 2.408227, 3.128415, 4476.475098, 5.472747e+09, 0.947960, 4.228558],
+]
+NUM_TRAINING    = 200 # synthetic curves to train the surrogate with
+NUM_COMPONENTS  = 8 # principal components of the compressed surrogate
+MOGA_OPTIONS    = {'num_gens': 2, 'init_pop': 4, 'offspring': 4, 'crossover': 0.65, 'mutation': 0.35}
+
+# Main function
+def main():
+
+    # Initialisation
+    only_names = sys.argv[1:] # optionally only run the benchmarks containing these names
+    results = {}
+
+    # Runs the benchmarks (with the fixtures in a directory removed afterwards)
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        fixture_path = fixture_dir + '/'
+        create_workbook(fixture_path, FIXTURE_FILE)
+        for bench_name, bench_function in get_benchmarks():
+            if only_names != [] and not any([name in bench_name for name in only_names]):
+                continue
+            try:
+                results.update(bench_function(fixture_path))
+            except Exception:
+                results[bench_name] = {'error': traceback.format_exc().strip().split('\n')[-1]}
+            for name in [name for name in results if name.startswith(bench_name)]:
+                print(name.ljust(40) + get_summary(results[name]))
+
+    # Writes the results
+    commit = get_commit()
+    os.makedirs(BENCH_PATH, exist_ok = True)
+    with open(BENCH_PATH + 'bench_' + commit + '.json', 'w') as file:
+        json.dump({
+            'commit':    commit,
+            'time':      time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime()),
+            'python':    platform.python_version(),
+            'numpy':     np.__version__,
+            'machine':   platform.machine(),
+            'num_cpus':  os.cpu_count(),
+            'repeats':   NUM_REPEATS,
+            'results':   results,
+        }, file, indent = 2, sort_keys = True)
+    print('Results written to ' + BENCH_PATH + 'bench_' + commit + '.json')
+
+# Gets the benchmarks (name prefix and function)
+def get_benchmarks():
+    return [
+        ('excel',       bench_excel),
+        ('polyfier',    bench_polyfier),
+        ('error',       bench_errors),
+        ('objective',   bench_objective),
+        ('recorder',    bench_recorder),
+        ('surrogate',   bench_surrogate),
+        ('visco',       bench_visco_plastic),
+        ('moga',        bench_moga),
+    ]
+
+# Times a function (returns the statistics in seconds)
+def time_function(function, num_repeats = NUM_REPEATS, num_calls = 1):
+    times = []
+    for _ in range(0, num_repeats):
+        start_time = time.perf_counter()
+        for _ in range(0, num_calls):
+            function()
+        times.append((time.perf_counter() - start_time) / num_calls)
+    return {'min': min(times), 'median': statistics.median(times), 'mean': statistics.mean(times), 'calls': num_repeats * num_calls}
+
+# Gets a summary of the statistics
+def get_summary(stats):
+    if 'error' in stats:
+        return 'skipped (' + stats['error'] + ')'
+    return 'median=' + str(round(stats['median'] * 1000, 4)) + 'ms, min=' + str(round(stats['min'] * 1000, 4)) + 'ms'
+
+# Gets the current commit (or 'unknown')
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr = subprocess.DEVNULL).decode().strip()
+    except:
+        return 'unknown'
+
+# Gets a synthetic creep curve (primary, secondary and tertiary creep)
+def get_synthetic_curve(x_end, y_end, num_points, rng):
+    x_list = np.linspace(0, x_end, num_points)
+    y_list = 0.01 * (1 - np.exp(-x_list / (0.05 * x_end))) + 0.3 * y_end * x_list / x_end + 0.65 * y_end * (x_list / x_end) ** 8
+    y_list += rng.normal(0, 1e-5, num_points) + 1e-4
+    return list(x_list), list(y_list)
+
+# Gets the synthetic experimental curves
+def get_synthetic_data(num_points = NUM_POINTS):
+    rng = np.random.default_rng(SEED)
+    curves = [get_synthetic_curve(TEST_X_ENDS[i], TEST_Y_ENDS[i], num_points, rng) for i in range(0, len(TEST_NAMES))]
+    return [curve[0] for curve in curves], [curve[1] for curve in curves]
+
+# Gets synthetic predicted curves (with the number of points of a creep simulation)
+def get_synthetic_predictions(num_curves):
+    rng = np.random.default_rng(SEED + 1)
+    prd_x_data_list, prd_y_data_list = [], []
+    for _ in range(0, num_curves):
+        curves = [get_synthetic_curve(TEST_X_ENDS[i] * rng.uniform(0.7, 1.3), TEST_Y_ENDS[i] * rng.uniform(0.7, 1.3), int(rng.integers(200, 652)), rng) for i in range(0, len(TEST_NAMES))]
+        prd_x_data_list.append([curve[0] for curve in curves])
+        prd_y_data_list.append([curve[1] for curve in curves])
+    return prd_x_data_list, prd_y_data_list
+
+# Creates the synthetic alloy workbook
+def create_workbook(path, file):
+    import pandas as pd
+    exp_x_data, exp_y_data = get_synthetic_data()
+    info = pd.DataFrame({'test': TEST_NAMES, 'temp': [800] * len(TEST_NAMES), 'stress': TEST_STRESSES, 'type': ['creep'] * len(TEST_NAMES)})
+    data = pd.DataFrame({name: values for i in range(0, len(TEST_NAMES)) for name, values in [(TEST_NAMES[i] + '_time', exp_x_data[i]), (TEST_NAMES[i] + '_strain', exp_y_data[i])]})
+    with pd.ExcelWriter(path + file + '.xlsx') as writer:
+        info.to_excel(writer, sheet_name = 'info', index = False)
+        data.to_excel(writer, sheet_name = 'data', index = False)
+
+# Benchmarks reading columns from a workbook (parsed and cached)
+def bench_excel(fixture_path):
+    import packages.io.excel as excel
+    import packages.io.dataset as dataset
+    xl = excel.Excel(path = fixture_path, file = FIXTURE_FILE)
+    columns = [test_name + '_time' for test_name in TEST_NAMES]
+
+    # Clears the parsed and cached columns
+    def clear():
+        dataset.loaded_datasets.clear()
+        if os.path.isfile(fixture_path + FIXTURE_FILE + dataset.CACHE_EXTENSION):
+            os.remove(fixture_path + FIXTURE_FILE + dataset.CACHE_EXTENSION)
+
+    # Times reading with and without parsing
+    results = {}
+    results['excel.read_column.parse'] = time_function(lambda: [clear(), xl.read_column('G44_time', sheet = 'data')])
+    results['excel.read_column.cache'] = time_function(lambda: [dataset.loaded_datasets.clear(), xl.read_column('G44_time', sheet = 'data')])
+    results['excel.read_column.memory'] = time_function(lambda: xl.read_column('G44_time', sheet = 'data'), num_calls = 100)
+    results['excel.read_columns.memory'] = time_function(lambda: xl.read_columns(columns, sheet = 'data'), num_calls = 10)
+    clear()
+    return results
+
+# Benchmarks converting curves with the polyfier
+def bench_polyfier(_):
+    import packages.polyfier as polyfier
+    prd_x_data_list, prd_y_data_list = get_synthetic_predictions(NUM_CURVES // len(TEST_NAMES))
+    x_data = [x_list for prd_x_data in prd_x_data_list for x_list in prd_x_data]
+    y_data = [y_list for prd_y_data in prd_y_data_list for y_list in prd_y_data]
+    pf = polyfier.Polyfier()
+    results = {'polyfier.curves_to_curves': time_function(lambda: pf.curves_to_curves(x_data, y_data))}
+    for basis in polyfier.BASES:
+        results['polyfier.curves_to_arrays.' + basis] = time_function(lambda: polyfier.Polyfier(basis = basis).curves_to_arrays(x_data, y_data))
+    grid_y_data = [list(y_array) for y_array in pf.curves_to_arrays(x_data, y_data)[1]]
+    grid_x_data = [pf.get_x_list(len(y_list)) for y_list in grid_y_data]
+    results['polyfier.curves_to_arrays.shared_grid'] = time_function(lambda: pf.curves_to_arrays(grid_x_data, grid_y_data))
+    return results
+
+# Benchmarks each error function
+def bench_errors(_):
+    import packages.error.objective as objective
+    exp_x_data, exp_y_data = get_synthetic_data()
+    prd_x_data_list, prd_y_data_list = get_synthetic_predictions(1)
+    results = {}
+    for error_name in ERROR_NAMES:
+        err = objective.Objective([error_name], exp_x_data, exp_y_data, TEST_NAMES).err_collection[0]
+        results['error.' + error_name] = time_function(lambda: err.get_error(prd_x_data_list[0], prd_y_data_list[0]), num_calls = 20)
+    return results
+
+# Benchmarks the objective (per individual and in batches)
+def bench_objective(_):
+    import packages.error.objective as objective
+    import packages.error.fits as fits
+    exp_x_data, exp_y_data = get_synthetic_data()
+    prd_x_data_list, prd_y_data_list = get_synthetic_predictions(100)
+    obj_func = objective.Objective(ERROR_NAMES, exp_x_data, exp_y_data, TEST_NAMES)
+
+    # Initialises an objective without the fits registered by previous objectives
+    def init_objective():
+        fits.registered_fits.clear()
+        return objective.Objective(ERROR_NAMES, exp_x_data, exp_y_data, TEST_NAMES)
+
+    return {
+        'objective.init': time_function(init_objective),
+        'objective.init.registered': time_function(lambda: objective.Objective(ERROR_NAMES, exp_x_data, exp_y_data, TEST_NAMES)), # with the fits of previous objectives
+        'objective.get_errors': time_function(lambda: obj_func.get_errors(prd_x_data_list[0], prd_y_data_list[0]), num_calls = 20),
+        'objective.get_errors_batch.100': time_function(lambda: obj_func.get_errors_batch(prd_x_data_list, prd_y_data_list)),
+    }
+
+# Benchmarks recording the results (without simulating)
+def bench_recorder(fixture_path):
+    import packages.io.recorder as recorder
+    import packages.model.visco_plastic as visco_plastic
+    import packages.error.objective as objective
+    exp_x_data, exp_y_data = get_synthetic_data()
+    obj_func = objective.Objective(ERROR_NAMES, exp_x_data, exp_y_data, TEST_NAMES)
+    model = visco_plastic.ViscoPlastic(TEST_STRESSES)
+    settings = {'model': model.name, 'tests': TEST_NAMES, 'errors': ERROR_NAMES, 'moga': dict(MOGA_OPTIONS, init_pop = 10**9)} # never reaches a generation
+    rec = recorder.Recorder(999, model, obj_func, settings, path = fixture_path)
+    rng = np.random.default_rng(SEED)
+    errors_list = list(rng.uniform(0, 1, (1000, len(ERROR_NAMES))))
+    params_iter = iter(range(0, 10**9))
+    results = {
+        'recorder.update_population': time_function(lambda: rec.update_population(PARAMS_LIST[0], errors_list[next(params_iter) % 1000]), num_calls = 1000),
+        'recorder.update_results': time_function(lambda: rec.update_results(PARAMS_LIST[0], errors_list[next(params_iter) % 1000]), num_calls = 1000),
+    }
+    rec.store.close()
+    return results
+
+# Benchmarks training, predicting a thousand candidates, saving and loading the surrogate (with and without compression)
+def bench_surrogate(fixture_path):
+    import packages.surrogate as surrogate
+    import packages.polyfier as polyfier
+    prd_x_data_list, prd_y_data_list = get_synthetic_predictions(NUM_TRAINING)
+    _, output_array = polyfier.Polyfier().curves_to_arrays([prd_x_data[0] for prd_x_data in prd_x_data_list], [prd_y_data[0] for prd_y_data in prd_y_data_list])
+    rng = np.random.default_rng(SEED)
+    input_array = rng.uniform(0, 1, (NUM_TRAINING, len(PARAMS_LIST[0])))
+    candidate_array = rng.uniform(0, 1, (1000, len(PARAMS_LIST[0])))
+    results = {}
+    for name, num_components in [('full', None), ('pca', NUM_COMPONENTS)]:
+        sm = surrogate.Surrogate(num_components)
+        sm.sm.options['print_global'] = False
+        results['surrogate.train.' + name] = time_function(lambda: sm.train_sm(input_array, output_array), num_repeats = 1)
+        results['surrogate.predict.1000.' + name] = time_function(lambda: sm.predict(candidate_array))
+        results['surrogate.save.' + name] = time_function(lambda: sm.save_sm(fixture_path, 'sm_' + name))
+        results['surrogate.load.' + name] = time_function(lambda: sm.load_sm(fixture_path, 'sm_' + name))
+    return results
+
+# Benchmarks simulating the curves for each stress
+def bench_visco_plastic(_):
+    import packages.model.visco_plastic as visco_plastic
+    results = {}
+    for i in range(0, len(TEST_NAMES)):
+        model = visco_plastic.ViscoPlastic([TEST_STRESSES[i]])
+        for j in range(0, len(PARAMS_LIST)):
+            results['visco_plastic.get_prd_curves.' + TEST_NAMES[i] + '.' + str(j)] = time_function(lambda: model.get_prd_curves(*PARAMS_LIST[j]), num_repeats = 3)
+    return results
+
+# Benchmarks a small end-to-end optimisation
+def bench_moga(_):
+    import packages.model.visco_plastic as visco_plastic
+    import packages.error.objective as objective
+    import packages.genetic_algorithm as genetic_algorithm
+    exp_x_data, exp_y_data = get_synthetic_data()
+    obj_func = objective.Objective(ERROR_NAMES, exp_x_data[-2:], exp_y_data[-2:], TEST_NAMES[-2:])
+    model = visco_plastic.ViscoPlastic(TEST_STRESSES[-2:])
+    np.random.seed(SEED)
+    moga = genetic_algorithm.MOGA(model, obj_func, **MOGA_OPTIONS)
+    return {'moga.optimise': time_function(moga.optimise, num_repeats = 1)}
+
+# Main function caller
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+ Title: Main file for generating datasets
+ Description: Main file for generating the parameters and fitted curves to train surrogate models with
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import time
+import packages.io.excel as excel
+import packages.model.visco_plastic as visco_plastic
+import packages.generator as generator
+import packages.scheduler as scheduler
+
+# IO Constants
+DATA_PATH       = './'
+DATA_FILE       = 'alloy_617'
+OUTPUT_PATH     = './results/param_sets/'
+OUTPUT_FILE     = 'generated'
+
+# Generation constants
+TEST_NAME       = 'G44' # the stress of the test is simulated
+NUM_SAMPLES     = 1000000
+CHUNK_SIZE      = generator.CHUNK_SIZE
+NUM_PROCESSES   = scheduler.get_num_cpus()
+SEED            = generator.SEED
+
+# Main function
+def main():
+
+    # Initialisation
+    start_time = time.time()
+    print('Program began on ' + time.strftime('%A, %D, %H:%M:%S', time.localtime()) + '!')
+
+    # Prepare the model for the stress of the test
+    xl = excel.Excel(path = DATA_PATH, file = DATA_FILE)
+    exp_stresses = xl.read_included('stress', [TEST_NAME])
+    model = visco_plastic.ViscoPlastic(exp_stresses)
+
+    # Generate the chunks that have not been written, then merge them for the sampler
+    gen = generator.Generator(model, NUM_SAMPLES, CHUNK_SIZE, NUM_PROCESSES, SEED, OUTPUT_PATH, OUTPUT_FILE)
+    num_samples, num_failures = gen.generate()
+    if num_samples > 0:
+        print('Generated ' + str(num_samples) + ' samples (' + str(round(100 * num_failures / num_samples, 1)) + '% failed) at ' + str(round(num_samples / (time.time() - start_time), 1)) + ' samples/s!')
+    num_rows = gen.merge()
+    print('Merged ' + str(num_rows) + ' samples into ' + OUTPUT_PATH + OUTPUT_FILE + '!')
+    print('Program finished on ' + time.strftime('%A, %D, %H:%M:%S', time.localtime()) + ' in ' + str(round(time.time()-start_time)) + ' seconds!')
+
+if __name__ == "__main__":
+    main()
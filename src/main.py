@@ -6,8 +6,13 @@
 """
 
 # Libraries
-import time, json, os, threading
+import json, os, re, threading
+import packages.scheduler as scheduler
 import packages.optimiser as optimiser
+import packages.server as server
+import packages.distributed as distributed
+import packages.io.excel as excel
+import packages.error.objective as objective
 
 # IO Constants
 DATA_PATH           = './'
@@ -16,9 +21,17 @@ RECORD_PATH         = './results/'
 INPUT_FILE          = 'input.txt'
 HISTORY_FILE        = 'history.txt'
 
+# Server constants (POST /jobs, GET /jobs, GET /jobs/<id>, DELETE /jobs/<id>)
+SERVER_HOST         = server.DEFAULT_HOST
+SERVER_PORT         = server.DEFAULT_PORT
+
+# Broker constants (shared by the distributed optimisations, see packages/distributed.py)
+BROKER_HOST         = distributed.BROKER_HOST
+BROKER_PORT         = distributed.BROKER_PORT
+
 # Optimisation constants
 CHECK_INTERVAL      = 10
-NUM_THREADS         = 1 + 5
+NUM_CPUS            = scheduler.get_num_cpus()
 
 # Available Setting
 AVAILABLE_MODELS    = ['visco_plastic']
@@ -29,68 +42,235 @@ AVAILABLE_ERRORS    = ['err_dy_min', 'err_dy_area', 'err_x_area', 'err_y_area',
 DEFAULT_MODEL       = 'visco_plastic'
 DEFAULT_TESTS       = ['G44', 'G25']
 DEFAULT_ERRORS      = ['err_dy_area', 'err_x_area', 'err_x_end', 'err_y_end']
+DEFAULT_PRIORITY    = scheduler.DEFAULT_PRIORITY
+DEFAULT_CACHE_SIZE  = 1000
+DEFAULT_CACHE_PREC  = None
+DEFAULT_SCREEN      = False
+DEFAULT_STRESS_PROC = 1
+DEFAULT_DATABASE    = True
+DEFAULT_DB_CURVES   = False
+DEFAULT_RESUME      = False
 DEFAULT_NUM_GENS    = 100
 DEFAULT_INIT_POP    = 300
 DEFAULT_OFFSPRING   = 399
 DEFAULT_CROSSOVER   = 0.65
 DEFAULT_MUTATION    = 0.35
-# {"model": "visco_plastic", "tests": ["G44", "G25"], "errors": ["err_dy_area", "err_x_area", "err_x_end", "err_y_end"], "moga": {"num_gens": 10, "init_pop": 10, "offspring": 10, "crossover": 0.65, "mutation": 0.35}}
+DEFAULT_PROCESSES   = 1
+DEFAULT_SURROGATE   = False
+DEFAULT_COMPONENTS  = None
+DEFAULT_CHECKPOINT  = 10
+DEFAULT_NORMALISE   = True
+DEFAULT_WARM_START  = []
+DEFAULT_PERTURB     = 0.0
+DEFAULT_WARM_FRAC   = 1.0
+DEFAULT_DISTRIBUTED = False
+DEFAULT_ASYNC       = False
+DEFAULT_TIMEOUT     = None
+# {"model": "visco_plastic", "tests": ["G44", "G25"], "errors": ["err_dy_area", "err_x_area", "err_x_end", "err_y_end"], "priority": 0, "cache_size": 1000, "cache_precision": null, "screen": false, "stress_processes": 1, "database": true, "database_curves": false, "resume": false, "moga": {"num_gens": 10, "init_pop": 10, "offspring": 10, "crossover": 0.65, "mutation": 0.35, "num_processes": 1, "surrogate": false, "num_components": null, "checkpoint_interval": 10, "normalise": true, "warm_start": [], "perturbation": 0.0, "warm_fraction": 1.0, "distributed": false, "asynchronous": false, "timeout": null}}
+# {"moga": {"warm_start": ["results/results_003", "alloy_617:vp_moga"], "perturbation": 0.05}} (starts from previous results)
+# {"moga": {"distributed": true, "num_processes": 2}} (evaluates with worker_main.py workers and 2 local workers)
+# {"resume": 3} (resumes optimisation 3 from its checkpoint)
 
 # Main function
 def main():
 
     # Initialisation
-    open(RECORD_PATH + HISTORY_FILE, 'w').close() # create / truncate history file
-    optimisation_queue = get_settings_list()
-    history_list = []
+    open(RECORD_PATH + HISTORY_FILE, 'a').close() # create history file
+    prepare_fits()
+    broker_authkey = distributed.get_broker_authkey() # only passed to the optimisations (and their local workers) unless set by CREEP_AUTHKEY
+    daemon = Daemon(scheduler.Scheduler(DATA_PATH, DATA_FILE, RECORD_PATH, NUM_CPUS, broker_authkey))
+
+    # Accept optimisations over the local interface (as well as the input file)
+    try:
+        srv = server.Server(daemon.submit, daemon.get_status, daemon.cancel, SERVER_HOST, SERVER_PORT)
+        srv.start()
+    except OSError as error:
+        srv = None
+        print('Could not start the server on ' + SERVER_HOST + ':' + str(SERVER_PORT) + ' (' + str(error) + ')')
 
-    # Continually runs optimisations
-    identifier = 0
-    while True:
+    # Start the broker that the distributed optimisations publish to (each as its own job)
+    try:
+        broker_manager = distributed.start_broker(broker_authkey, BROKER_HOST, BROKER_PORT)
+    except (OSError, EOFError, ValueError) as error:
+        broker_manager = None
+        print('Could not start the broker on ' + BROKER_HOST + ':' + str(BROKER_PORT) + ' (' + str(error) + ')')
 
-        # Check if a thread is available
-        if threading.active_count() < NUM_THREADS and len(optimisation_queue) > 0:
+    # Continually queues and runs optimisations
+    try:
+        daemon.run()
 
-            # Pops settings of next optimisation
-            settings = optimisation_queue.pop(0)
+    # Kill running optimisations when halted
+    finally:
+        if srv != None:
+            srv.stop()
+        daemon.shutdown()
+        if broker_manager != None:
+            broker_manager.shutdown()
 
-            # Conduct optimisation if settings are valid
-            if (is_sublist([settings['model']], AVAILABLE_MODELS)
-            and is_sublist(settings['tests'], AVAILABLE_TESTS)
-            and is_sublist(settings['errors'], AVAILABLE_ERRORS)):
+# Class for queueing and running the submitted optimisations
+class Daemon:
 
-                # Write settings in history
+    # Constructor
+    def __init__(self, sch):
+        self.sch = sch
+        self.identifier = get_next_identifier()
+        self.lock = threading.Lock() # the scheduler is shared with the server threads
+        self.wake = threading.Event() # set when an optimisation is submitted
+
+    # Queues the optimisations of the input file and starts them on free CPUs (until halted)
+    def run(self):
+        while True:
+            for settings in get_settings_list():
                 try:
-                    history_list.append(str(settings))
-                    history_file = open(RECORD_PATH + HISTORY_FILE, 'w')
-                    history_file.write('\n'.join(history_list))
-                    history_file.close()
-                except:
-                    pass
-
-                # Conduct optimisation
-                opt = optimiser.Optimiser(settings, identifier, DATA_PATH, DATA_FILE, RECORD_PATH)
-                opt.start()
+                    identifier, error = self.submit(settings)
+                except Exception as exception: # so one line cannot stop the daemon
+                    identifier, error = None, 'Could not submit the optimisation (' + str(exception) + ')'
+                if error != None:
+                    print('[' + str(identifier).zfill(3) + ']: ' + error + ' (skipping)')
+            with self.lock:
+                self.sch.poll()
+            self.wake.wait(CHECK_INTERVAL)
+            self.wake.clear()
+
+    # Validates and queues an optimisation (returns the identifier and an error message if invalid)
+    def submit(self, settings):
+        with self.lock:
+
+            # Use the settings of the checkpoint when resuming an optimisation
+            if settings.get('resume', False) is not False:
+                identifier = settings['resume']
+                if isinstance(identifier, str) and identifier.isdigit():
+                    identifier = int(identifier)
+                if not is_integer(identifier, 0):
+                    return None, 'Optimisation to resume must be an identifier'
+                if self.sch.is_active(identifier):
+                    return identifier, 'Optimisation to resume is already queued or running'
+                settings = optimiser.read_checkpoint_settings(RECORD_PATH, identifier)
+                if settings == None:
+                    return identifier, 'No checkpoint to resume optimisation from'
+                settings['resume'] = True
             else:
-                print('[' + str(identifier).zfill(3) + ']: Optimisation settings are incorrect (skipping)')
-            identifier += 1
-        
-        # Wait until conducting another optimisation
-        time.sleep(CHECK_INTERVAL)
-        optimisation_queue += get_settings_list()
-
-# Reads all the text files and returns them
+                identifier = self.identifier
+                self.identifier += 1
+            if not isinstance(settings.get('moga', {}), dict):
+                return identifier, 'Optimisation settings are incorrect (moga must be an object)'
+            settings = fill_voids(settings)
+
+            # Queue optimisation if settings are valid
+            error = get_settings_error(settings)
+            if error != None:
+                return identifier, error
+            append_history(identifier, settings)
+            num_cpus = max(settings['moga']['num_processes'], settings['stress_processes'])
+            self.sch.submit(identifier, settings, settings['priority'], num_cpus)
+
+        # Start the optimisation without waiting for the next check
+        self.wake.set()
+        return identifier, None
+
+    # Gets the status and progress of an optimisation (or a list for all if none)
+    def get_status(self, identifier):
+        with self.lock:
+            self.sch.update_progress()
+            if identifier == None:
+                return [job.get_status() for job in self.sch.jobs.values()]
+            if not identifier in self.sch.jobs:
+                return None
+            return self.sch.jobs[identifier].get_status()
+
+    # Cancels an optimisation (returns whether it exists)
+    def cancel(self, identifier):
+        with self.lock:
+            if not identifier in self.sch.jobs:
+                return False
+            self.sch.cancel(identifier)
+        self.wake.set()
+        return True
+
+    # Cancels all the optimisations
+    def shutdown(self):
+        with self.lock:
+            self.sch.shutdown()
+
+# Checks the settings against the available settings (returns an error message if invalid)
+def get_settings_error(settings):
+    for name, values, available_values in [
+        ('model', [settings['model']], AVAILABLE_MODELS),
+        ('tests', settings['tests'], AVAILABLE_TESTS),
+        ('errors', settings['errors'], AVAILABLE_ERRORS)]:
+        if not isinstance(values, list) or not is_sublist(values, available_values):
+            return 'Optimisation settings are incorrect (' + name + ' must be in ' + str(available_values) + ')'
+
+    # Check the types and ranges of the numbers and flags
+    moga_settings = settings['moga']
+    min_processes = 0 if moga_settings['distributed'] is True else 1 # distributed optimisations can rely on other hosts
+    for name, value, is_valid, description in [
+        ('priority', settings['priority'], is_integer(settings['priority']), 'an integer'),
+        ('cache_size', settings['cache_size'], is_integer(settings['cache_size'], 0), 'an integer of at least 0'),
+        ('cache_precision', settings['cache_precision'], settings['cache_precision'] == None or is_integer(settings['cache_precision'], 1), 'null or an integer of at least 1'),
+        ('stress_processes', settings['stress_processes'], is_integer(settings['stress_processes'], 1), 'an integer of at least 1'),
+        ('num_gens', moga_settings['num_gens'], is_integer(moga_settings['num_gens'], 1), 'an integer of at least 1'),
+        ('init_pop', moga_settings['init_pop'], is_integer(moga_settings['init_pop'], 1), 'an integer of at least 1'),
+        ('offspring', moga_settings['offspring'], is_integer(moga_settings['offspring'], 1), 'an integer of at least 1'),
+        ('crossover', moga_settings['crossover'], is_number(moga_settings['crossover'], 0, 1), 'a number from 0 to 1'),
+        ('mutation', moga_settings['mutation'], is_number(moga_settings['mutation'], 0, 1), 'a number from 0 to 1'),
+        ('num_processes', moga_settings['num_processes'], is_integer(moga_settings['num_processes'], min_processes), 'an integer of at least ' + str(min_processes)),
+        ('num_components', moga_settings['num_components'], moga_settings['num_components'] == None or is_integer(moga_settings['num_components'], 1), 'null or an integer of at least 1'),
+        ('checkpoint_interval', moga_settings['checkpoint_interval'], is_integer(moga_settings['checkpoint_interval'], 0), 'an integer of at least 0'),
+        ('perturbation', moga_settings['perturbation'], is_number(moga_settings['perturbation'], 0), 'a number of at least 0'),
+        ('warm_fraction', moga_settings['warm_fraction'], is_number(moga_settings['warm_fraction'], 0, 1), 'a number from 0 to 1'),
+        ('timeout', moga_settings['timeout'], moga_settings['timeout'] == None or (is_number(moga_settings['timeout'], 0) and moga_settings['timeout'] > 0), 'null or a number above 0'),
+        ('warm_start', moga_settings['warm_start'], isinstance(moga_settings['warm_start'], list) and all([isinstance(source, str) for source in moga_settings['warm_start']]), 'a list of strings')]:
+        if not is_valid:
+            return 'Optimisation settings are incorrect (' + name + ' must be ' + description + ', not ' + json.dumps(value) + ')'
+    for name, value in [('screen', settings['screen']), ('database', settings['database']), ('database_curves', settings['database_curves']),
+                        ('surrogate', moga_settings['surrogate']), ('normalise', moga_settings['normalise']),
+                        ('distributed', moga_settings['distributed']), ('asynchronous', moga_settings['asynchronous'])]:
+        if not isinstance(value, bool):
+            return 'Optimisation settings are incorrect (' + name + ' must be true or false, not ' + json.dumps(value) + ')'
+    if settings['moga']['asynchronous'] and settings['moga']['surrogate']:
+        return 'Optimisation settings are incorrect (asynchronous optimisations cannot be surrogate-assisted)'
+    if settings['moga']['distributed'] and settings['moga']['timeout'] != None:
+        return 'Optimisation settings are incorrect (distributed workers cannot time out evaluations)'
+    return None
+
+# Appends the settings of an optimisation to the history
+def append_history(identifier, settings):
+    try:
+        with open(RECORD_PATH + HISTORY_FILE, 'a') as history_file:
+            history_file.write(str(identifier).zfill(3) + ': ' + json.dumps(settings) + '\n')
+    except OSError:
+        pass
+
+# Fits the experimental curves of all the tests once (shared by the optimisation processes)
+def prepare_fits():
+    xl = excel.Excel(path = DATA_PATH, file = DATA_FILE)
+    exp_x_data = [xl.read_column(column = test_name + '_time', sheet = 'data') for test_name in AVAILABLE_TESTS]
+    exp_y_data = [xl.read_column(column = test_name + '_strain', sheet = 'data') for test_name in AVAILABLE_TESTS]
+    objective.Objective(AVAILABLE_ERRORS, exp_x_data, exp_y_data, AVAILABLE_TESTS)
+
+# Gets the identifier after those of previous optimisations (so their results and checkpoints are kept)
+def get_next_identifier():
+    identifiers = [int(match.group(2)) for file in os.listdir(RECORD_PATH) if (match := re.match(r'^(results|checkpoint)_(\d+)\.', file))]
+    return max(identifiers) + 1 if identifiers else 0
+
+# Reads the settings of the input file (renamed before reading, so settings written meanwhile go to a new file)
 def get_settings_list():
     settings_list = []
-    if INPUT_FILE in os.listdir(RECORD_PATH):
-        read_file = open(RECORD_PATH + INPUT_FILE, 'r')
-        while (settings := read_file.readline().rstrip()):
-            settings_list.append(settings)
-        read_file.close()
-        os.remove(RECORD_PATH + INPUT_FILE)
-        return [json.loads(settings) for settings in settings_list]
-    else:
+    if not os.path.isfile(RECORD_PATH + INPUT_FILE):
         return []
+    reading_file = RECORD_PATH + INPUT_FILE + '.' + str(os.getpid()) + '.reading'
+    os.replace(RECORD_PATH + INPUT_FILE, reading_file)
+    with open(reading_file, 'r') as read_file:
+        for line in read_file:
+            if line.strip() == '':
+                continue
+            try:
+                settings_list.append(json.loads(line))
+            except ValueError:
+                print('Could not read the settings in ' + INPUT_FILE + ' (skipping): ' + line.strip())
+    os.remove(reading_file)
+    return [settings for settings in settings_list if isinstance(settings, dict)]
 
 # Fill the empty values of the settings with default values
 def fill_voids(settings):
@@ -100,6 +280,22 @@ def fill_voids(settings):
         settings.update({'tests': DEFAULT_TESTS})
     if not settings.__contains__('errors'):
         settings.update({'errors': DEFAULT_ERRORS})
+    if not settings.__contains__('priority'):
+        settings.update({'priority': DEFAULT_PRIORITY})
+    if not settings.__contains__('cache_size'):
+        settings.update({'cache_size': DEFAULT_CACHE_SIZE})
+    if not settings.__contains__('cache_precision'):
+        settings.update({'cache_precision': DEFAULT_CACHE_PREC})
+    if not settings.__contains__('screen'):
+        settings.update({'screen': DEFAULT_SCREEN})
+    if not settings.__contains__('stress_processes'):
+        settings.update({'stress_processes': DEFAULT_STRESS_PROC})
+    if not settings.__contains__('database'):
+        settings.update({'database': DEFAULT_DATABASE})
+    if not settings.__contains__('database_curves'):
+        settings.update({'database_curves': DEFAULT_DB_CURVES})
+    if not settings.__contains__('resume'):
+        settings.update({'resume': DEFAULT_RESUME})
     if not settings.__contains__('moga'):
         settings.update({
             'moga': {
@@ -107,7 +303,18 @@ def fill_voids(settings):
                 'init_pop': DEFAULT_INIT_POP,
                 'offspring': DEFAULT_OFFSPRING,
                 'crossover': DEFAULT_CROSSOVER,
-                'mutation': DEFAULT_MUTATION
+                'mutation': DEFAULT_MUTATION,
+                'num_processes': DEFAULT_PROCESSES,
+                'surrogate': DEFAULT_SURROGATE,
+                'num_components': DEFAULT_COMPONENTS,
+                'checkpoint_interval': DEFAULT_CHECKPOINT,
+                'normalise': DEFAULT_NORMALISE,
+                'warm_start': DEFAULT_WARM_START,
+                'perturbation': DEFAULT_PERTURB,
+                'warm_fraction': DEFAULT_WARM_FRAC,
+                'distributed': DEFAULT_DISTRIBUTED,
+                'asynchronous': DEFAULT_ASYNC,
+                'timeout': DEFAULT_TIMEOUT
             }
         })
     else:
@@ -121,8 +328,39 @@ def fill_voids(settings):
             settings['moga'].update({'crossover': DEFAULT_CROSSOVER})
         if not settings['moga'].__contains__('mutation'):
             settings['moga'].update({'mutation': DEFAULT_MUTATION})
+        if not settings['moga'].__contains__('num_processes'):
+            settings['moga'].update({'num_processes': DEFAULT_PROCESSES})
+        if not settings['moga'].__contains__('surrogate'):
+            settings['moga'].update({'surrogate': DEFAULT_SURROGATE})
+        if not settings['moga'].__contains__('num_components'):
+            settings['moga'].update({'num_components': DEFAULT_COMPONENTS})
+        if not settings['moga'].__contains__('checkpoint_interval'):
+            settings['moga'].update({'checkpoint_interval': DEFAULT_CHECKPOINT})
+        if not settings['moga'].__contains__('normalise'):
+            settings['moga'].update({'normalise': DEFAULT_NORMALISE})
+        if not settings['moga'].__contains__('warm_start'):
+            settings['moga'].update({'warm_start': DEFAULT_WARM_START})
+        if not settings['moga'].__contains__('perturbation'):
+            settings['moga'].update({'perturbation': DEFAULT_PERTURB})
+        if not settings['moga'].__contains__('warm_fraction'):
+            settings['moga'].update({'warm_fraction': DEFAULT_WARM_FRAC})
+        if not settings['moga'].__contains__('distributed'):
+            settings['moga'].update({'distributed': DEFAULT_DISTRIBUTED})
+        if not settings['moga'].__contains__('asynchronous'):
+            settings['moga'].update({'asynchronous': DEFAULT_ASYNC})
+        if not settings['moga'].__contains__('timeout'):
+            settings['moga'].update({'timeout': DEFAULT_TIMEOUT})
     return settings
 
+# Checks whether a value is an integer of at least a minimum (if any)
+def is_integer(value, minimum = None):
+    return isinstance(value, int) and not isinstance(value, bool) and (minimum == None or value >= minimum)
+
+# Checks whether a value is a number within a minimum and maximum (if any)
+def is_number(value, minimum = None, maximum = None):
+    return (isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+            and (minimum == None or value >= minimum) and (maximum == None or value <= maximum))
+
 # Check if sublist (order ignored)
 def is_sublist(sublist, list):
     for item in sublist:
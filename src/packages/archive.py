@@ -0,0 +1,87 @@
+"""
+ Title: Pareto Archive
+ Description: For keeping the non-dominated parameters found during an optimisation
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import numpy as np
+
+# Constants
+CAPACITY = 50
+
+# Class for a bounded archive of non-dominated parameters
+class Archive:
+
+    # Constructor
+    def __init__(self, num_params, num_errors, capacity = CAPACITY):
+        self.capacity = capacity
+        self.params_array = np.zeros((capacity + 1, num_params))
+        self.errors_array = np.zeros((capacity + 1, num_errors))
+        self.size = 0
+
+    # Adds a set of parameters if not dominated by the archive (returns whether added)
+    def add(self, params, errors):
+        errors = np.array(errors, dtype = np.float64)
+        if np.isnan(errors).any():
+            return False
+
+        # Reject if an archived set of parameters is at least as good for all the errors
+        errors_array = self.errors_array[:self.size]
+        if np.any(np.all(errors_array <= errors, axis = 1)):
+            return False
+
+        # Remove the archived parameters dominated by the new parameters
+        is_dominated = np.all(errors <= errors_array, axis = 1)
+        if is_dominated.any():
+            self.remove(is_dominated)
+
+        # Add the new parameters and remove the most crowded if over capacity
+        self.params_array[self.size] = params
+        self.errors_array[self.size] = errors
+        self.size += 1
+        if self.size > self.capacity:
+            self.truncate()
+        return True
+
+    # Removes the archived parameters of a mask
+    def remove(self, mask):
+        keep = ~mask
+        num_keep = int(keep.sum())
+        self.params_array[:num_keep] = self.params_array[:self.size][keep]
+        self.errors_array[:num_keep] = self.errors_array[:self.size][keep]
+        self.size = num_keep
+
+    # Removes the most crowded parameters (keeps the extremes and the lowest average error)
+    def truncate(self):
+        crowding = get_crowding_distances(self.errors_array[:self.size])
+        crowding[np.argmin(np.average(self.errors_array[:self.size], axis = 1))] = np.inf
+        mask = np.zeros(self.size, dtype = bool)
+        mask[np.argmin(crowding)] = True
+        self.remove(mask)
+
+    # Gets the archived parameters and errors (sorted by average error)
+    def get_sorted(self):
+        order = np.argsort(np.average(self.errors_array[:self.size], axis = 1), kind = 'stable')
+        return self.params_array[:self.size][order], self.errors_array[:self.size][order]
+
+    # Gets the parameters and errors with the lowest average error
+    def get_best(self):
+        index = np.argmin(np.average(self.errors_array[:self.size], axis = 1))
+        return self.params_array[index], self.errors_array[index]
+
+# Returns the crowding distance of each row of errors
+def get_crowding_distances(errors_array):
+    num_rows, num_errors = errors_array.shape
+    crowding = np.zeros(num_rows)
+    if num_rows <= 2:
+        return np.full(num_rows, np.inf)
+    for i in range(0, num_errors):
+        order = np.argsort(errors_array[:,i], kind = 'stable')
+        sorted_errors = errors_array[order,i]
+        error_range = sorted_errors[-1] - sorted_errors[0]
+        crowding[order[0]] = crowding[order[-1]] = np.inf
+        if error_range > 0:
+            crowding[order[1:-1]] += (sorted_errors[2:] - sorted_errors[:-2]) / error_range
+    return crowding
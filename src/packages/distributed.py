@@ -0,0 +1,375 @@
+"""
+ Title: Distributed evaluation
+ Description: For evaluating batches of parameters with workers on any number of hosts (pulling from a broker)
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import os, time, socket, threading, itertools, uuid, ipaddress
+from collections import deque
+from multiprocessing import Process, AuthenticationError
+from multiprocessing.managers import BaseManager
+import packages.evaluator as evaluator
+import packages.io.stats as stats
+
+# Constants
+BROKER_HOST        = '127.0.0.1' # interface the broker listens on (e.g., '0.0.0.0' so workers on other hosts can connect)
+BROKER_PORT        = 50000 # of the broker shared by the jobs of main.py
+AUTHKEY            = os.environ['CREEP_AUTHKEY'].encode() if os.environ.get('CREEP_AUTHKEY') else None # shared by the broker and the workers
+NUM_LOCAL_WORKERS  = 0 # workers started on the host of the broker
+LEASE_TIMEOUT      = 30 # seconds without a heartbeat before the tasks of a worker are given to other workers
+HEARTBEAT_INTERVAL = 5
+MAX_ATTEMPTS       = 3 # leases of a task before it is given the failure penalty
+RETRY_INTERVAL     = 5 # seconds between attempts of a worker to connect to the broker
+POLL_INTERVAL      = 1
+CONTEXT_CACHE      = 4 # models and objectives of jobs kept by each worker
+
+# Class for the tasks of the jobs (shared with the workers through the manager, and keyed by job)
+class Broker:
+
+    # Constructor
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.contexts = {} # job identifier: model and objective
+        self.task_ids = itertools.count()
+        self.pending = deque() # task identifiers
+        self.tasks = {} # task identifier: job identifier and parameters
+        self.attempts = {}
+        self.leases = {} # task identifier: worker identifier
+        self.heartbeats = {} # worker identifier: time of the last heartbeat
+        self.results = {}
+        self.num_retries = {} # job identifier: retried tasks
+
+    # Adds the model and objective of a new job (returns the job identifier)
+    def add_context(self, model, objective):
+        with self.condition:
+            context_id = uuid.uuid4().hex # unique across brokers, since workers keep the models of previous jobs
+            self.contexts[context_id] = (model, objective)
+            self.num_retries[context_id] = 0
+            return context_id
+
+    # Removes a job and discards its tasks
+    def remove_context(self, context_id):
+        with self.condition:
+            self.contexts.pop(context_id, None)
+            self.num_retries.pop(context_id, None)
+            for task_id in [task_id for task_id, task in self.tasks.items() if task[0] == context_id]:
+                del self.tasks[task_id], self.attempts[task_id]
+                self.leases.pop(task_id, None)
+                self.results.pop(task_id, None)
+            self.pending = deque([task_id for task_id in self.pending if task_id in self.tasks])
+
+    # Gets the model and objective of a job (none if the job was removed)
+    def get_context(self, context_id):
+        with self.condition:
+            return self.contexts.get(context_id)
+
+    # Adds tasks of a job for a list of parameters (returns the task identifiers)
+    def publish(self, context_id, params_list):
+        with self.condition:
+            task_ids = [next(self.task_ids) for _ in params_list]
+            for task_id, params in zip(task_ids, params_list):
+                self.tasks[task_id] = (context_id, params)
+                self.attempts[task_id] = 0
+                self.pending.append(task_id)
+            self.condition.notify_all()
+        return task_ids
+
+    # Leases pending tasks to a worker (waits briefly for tasks, and returns a list of job identifiers, task identifiers and parameters)
+    def lease(self, worker_id, max_tasks = 1):
+        with self.condition:
+            self.heartbeats[worker_id] = time.time()
+            self.expire_leases()
+            if len(self.pending) == 0:
+                self.condition.wait(POLL_INTERVAL)
+            tasks = []
+            while len(self.pending) > 0 and len(tasks) < max_tasks:
+                task_id = self.pending.popleft()
+                self.leases[task_id] = worker_id
+                self.attempts[task_id] += 1
+                tasks.append((self.tasks[task_id][0], task_id, self.tasks[task_id][1]))
+            return tasks
+
+    # Extends the leases of a worker
+    def heartbeat(self, worker_id):
+        with self.condition:
+            self.heartbeats[worker_id] = time.time()
+
+    # Adds the result of a task (ignored if the task is no longer leased to the worker)
+    def complete(self, worker_id, task_id, result):
+        with self.condition:
+            if self.leases.get(task_id) != worker_id:
+                return
+            del self.leases[task_id]
+            self.results[task_id] = result
+            self.heartbeats[worker_id] = time.time()
+            self.condition.notify_all()
+
+    # Gives the tasks of workers without recent heartbeats to other workers (or fails them after too many attempts)
+    def expire_leases(self):
+        expired_time = time.time() - LEASE_TIMEOUT
+        expired_ids = [task_id for task_id, worker_id in self.leases.items() if self.heartbeats.get(worker_id, 0) < expired_time]
+        for task_id in expired_ids:
+            del self.leases[task_id]
+            if self.attempts[task_id] >= MAX_ATTEMPTS:
+                self.results[task_id] = None
+            else:
+                self.num_retries[self.tasks[task_id][0]] += 1
+                self.pending.appendleft(task_id)
+        if len(expired_ids) > 0:
+            self.condition.notify_all()
+
+    # Waits briefly for and removes the results of any of the tasks (returns the task identifiers and results, with none for failed tasks)
+    def collect_any(self, task_ids, timeout = POLL_INTERVAL):
+        with self.condition:
+            self.expire_leases()
+            if not any([task_id in self.results for task_id in task_ids]):
+                self.condition.wait(timeout)
+                self.expire_leases()
+            done_ids = [task_id for task_id in task_ids if task_id in self.results]
+            results = [(task_id, self.results.pop(task_id)) for task_id in done_ids]
+            for task_id in done_ids:
+                del self.tasks[task_id], self.attempts[task_id]
+            return results
+
+    # Fails the tasks that have not finished (e.g., when there are no workers left)
+    def fail(self, task_ids):
+        with self.condition:
+            for task_id in task_ids:
+                if task_id in self.tasks and task_id not in self.results:
+                    self.leases.pop(task_id, None)
+                    self.results[task_id] = None
+            self.pending = deque([task_id for task_id in self.pending if task_id not in self.results])
+            self.condition.notify_all()
+
+    # Gets the number of workers with recent heartbeats
+    def get_num_workers(self):
+        with self.condition:
+            return len([worker_id for worker_id in self.heartbeats if self.heartbeats[worker_id] >= time.time() - LEASE_TIMEOUT])
+
+    # Gets and resets the number of retried tasks of a job
+    def pop_retries(self, context_id):
+        with self.condition:
+            num_retries = self.num_retries.get(context_id, 0)
+            self.num_retries[context_id] = 0
+            return num_retries
+
+# Broker of the manager process (created when first requested)
+manager_broker = None
+
+# Gets the broker of the manager process
+def get_broker():
+    global manager_broker
+    if manager_broker == None:
+        manager_broker = Broker()
+    return manager_broker
+
+# Manager for serving the broker (and connecting to it)
+class BrokerManager(BaseManager):
+    pass
+BrokerManager.register('get_broker', callable = get_broker)
+
+# Starts the broker shared by the jobs in a manager process (only listens on other interfaces with the authkey set by CREEP_AUTHKEY)
+def start_broker(authkey, host = BROKER_HOST, port = BROKER_PORT):
+    if authkey != AUTHKEY and not is_loopback(host):
+        raise ValueError('The broker only listens on ' + host + ' with the authkey set by CREEP_AUTHKEY (since workers send pickles)')
+    manager = BrokerManager(address = (host, port), authkey = authkey)
+    manager.start()
+    return manager
+
+# Gets the authkey of the broker (set by CREEP_AUTHKEY, or random so only the processes it is passed to can connect)
+def get_broker_authkey():
+    return os.urandom(32) if AUTHKEY == None else AUTHKEY
+
+# Class for evaluating parameters with distributed workers (same interface as the evaluator)
+class DistributedEvaluator(evaluator.Evaluator):
+
+    # Constructor (with the authkey of the shared broker, or none to start a broker for the local workers)
+    def __init__(self, model, objective, num_local_workers = NUM_LOCAL_WORKERS, port = BROKER_PORT, authkey = None):
+        super().__init__(model, objective, num_local_workers)
+        self.port = port
+        self.authkey = authkey
+        self.manager = None
+        self.owns_manager = False
+        self.broker = None
+        self.context_id = None
+        self.task_params = {} # task identifier: parameters (of the tasks that have not finished)
+        self.workers = []
+        self.had_workers = False
+
+    # Always sends the parameters to the workers
+    def is_local(self):
+        return False
+
+    # Adds the job to the shared broker (or starts a broker on any free port for the local workers only), then starts the local workers
+    def start(self):
+        if self.broker != None:
+            return
+        self.manager = None
+        if self.authkey != None:
+            try:
+                self.manager = BrokerManager(address = ('127.0.0.1', self.port), authkey = self.authkey)
+                self.manager.connect()
+                self.owns_manager = False
+            except (OSError, EOFError, AuthenticationError):
+                print('Could not connect to the broker on port ' + str(self.port) + ', so only the local workers are evaluating')
+                self.manager = None
+        if self.manager == None:
+            self.authkey = os.urandom(32) if self.authkey == None else self.authkey
+            self.manager = BrokerManager(address = ('127.0.0.1', 0), authkey = self.authkey)
+            self.manager.start()
+            self.owns_manager = True
+        self.broker = self.manager.get_broker()
+        self.context_id = self.broker.add_context(self.model, self.objective)
+        self.workers = [self.start_worker() for _ in range(0, self.num_processes)]
+
+    # Starts a local worker
+    def start_worker(self):
+        worker = Process(target = run_worker, args = ('127.0.0.1', self.manager.address[1], self.authkey), daemon = True)
+        worker.start()
+        return worker
+
+    # Replaces the local workers that have exited (e.g., crashed during a simulation)
+    def restart_workers(self):
+        for i in range(0, len(self.workers)):
+            if not self.workers[i].is_alive():
+                self.workers[i].join()
+                self.workers[i] = self.start_worker()
+                self.model.stats.add_count('distributed.restarts')
+
+    # Stops the local workers and removes the job from the broker (stopping the broker if started by the job)
+    def stop(self):
+        for worker in self.workers:
+            worker.terminate()
+            worker.join()
+        self.workers = []
+        if self.broker != None:
+            try:
+                self.broker.remove_context(self.context_id)
+            except (OSError, EOFError):
+                pass
+            if self.owns_manager:
+                self.manager.shutdown()
+            self.manager = self.broker = None
+
+    # Gets the number of evaluations that can run at once (i.e., the connected workers)
+    def get_num_workers(self):
+        self.start()
+        return max(1, self.num_processes, self.broker.get_num_workers())
+
+    # Evaluates a list of parameters in the workers (and adds the stats of the workers)
+    def map_params(self, params_list):
+        self.start()
+        task_ids = self.publish(params_list)
+        results = {}
+        while len(results) < len(task_ids):
+            results.update(self.collect([task_id for task_id in task_ids if task_id not in results]))
+        return [self.get_task_result(task_id, results[task_id]) for task_id in task_ids]
+
+    # Starts evaluating a set of parameters in a worker (returns the task identifier to wait for)
+    def submit_params(self, params):
+        self.start()
+        return self.publish([params])[0]
+
+    # Waits for at least one of the tasks to finish (returns the finished task identifiers and their results)
+    def wait_params(self, task_ids):
+        results = []
+        while len(results) == 0:
+            results = self.collect(task_ids)
+        return [(task_id, self.get_task_result(task_id, result)) for task_id, result in results]
+
+    # Adds tasks for a list of parameters to the broker (returns the task identifiers)
+    def publish(self, params_list):
+        task_ids = self.broker.publish(self.context_id, params_list)
+        self.task_params.update(zip(task_ids, params_list))
+        return task_ids
+
+    # Waits briefly for the results of the tasks (failing the tasks once all the workers are gone, since they would never finish)
+    def collect(self, task_ids):
+        self.restart_workers()
+        results = self.broker.collect_any(task_ids, POLL_INTERVAL)
+        num_workers = self.broker.get_num_workers()
+        if len(results) == 0 and len(self.workers) == 0 and num_workers == 0 and self.had_workers:
+            self.broker.fail(task_ids)
+            results = self.broker.collect_any(task_ids, 0)
+        self.had_workers = self.had_workers or num_workers > 0
+        self.model.stats.add_count('distributed.retries', self.broker.pop_retries(self.context_id))
+        return results
+
+    # Gets the curves and errors of a task (and adds the stats of the worker)
+    def get_task_result(self, task_id, result):
+        params = self.task_params.pop(task_id)
+        if result == None:
+            self.model.stats.add_count('distributed.failures')
+            self.unsaved.add(tuple(params))
+            return [], [], self.objective.get_errors([], [])
+        prd_x_data, prd_y_data, err_list, stats_dict = result
+        self.model.stats.merge(stats_dict)
+        return prd_x_data, prd_y_data, err_list
+
+# Runs a worker that evaluates the tasks of the broker (reconnects until stopped)
+def run_worker(host = 'localhost', port = BROKER_PORT, authkey = AUTHKEY, max_tasks = 1):
+    if authkey == None:
+        raise ValueError('Workers only connect to a broker if CREEP_AUTHKEY is set (since the broker sends pickles)')
+    worker_id = socket.gethostname() + ':' + str(os.getpid())
+    contexts = {} # job identifier: model and objective (of the latest jobs)
+    while True:
+        try:
+
+            # Connect to the broker and keep the leases alive while evaluating
+            manager = BrokerManager(address = (host, port), authkey = authkey)
+            manager.connect()
+            broker = manager.get_broker()
+            stop_event = threading.Event()
+            threading.Thread(target = send_heartbeats, args = (manager, worker_id, stop_event), daemon = True).start()
+
+            # Evaluate the leased tasks (getting the model and objective of new jobs, and skipping the tasks of removed jobs)
+            try:
+                while True:
+                    for context_id, task_id, params in broker.lease(worker_id, max_tasks):
+                        if context_id not in contexts:
+                            context = broker.get_context(context_id)
+                            if context == None:
+                                continue
+                            if len(contexts) >= CONTEXT_CACHE:
+                                del contexts[next(iter(contexts))]
+                            model, objective = context
+                            model.cache = None
+                            model.stats = objective.stats = stats.Stats()
+                            contexts[context_id] = context
+                        model, objective = contexts[context_id]
+                        broker.complete(worker_id, task_id, evaluate_params(model, objective, params))
+            finally:
+                stop_event.set()
+
+        # Wait for the broker to (re)start
+        except (OSError, EOFError, AuthenticationError):
+            time.sleep(RETRY_INTERVAL)
+
+# Checks whether a host is only reachable from this host
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+# Sends heartbeats to the broker until stopped
+def send_heartbeats(manager, worker_id, stop_event):
+    broker = manager.get_broker()
+    while not stop_event.wait(HEARTBEAT_INTERVAL):
+        try:
+            broker.heartbeat(worker_id)
+        except (OSError, EOFError):
+            return
+
+# Evaluates a set of parameters (failures are given the penalty of failed simulations)
+def evaluate_params(model, objective, params):
+    try:
+        prd_x_data, prd_y_data, err_list = evaluator.get_result(model, objective, params)
+    except Exception:
+        model.stats.add_count('distributed.errors')
+        prd_x_data, prd_y_data, err_list = [], [], objective.get_errors([], [])
+    return prd_x_data, prd_y_data, err_list, model.stats.pop()
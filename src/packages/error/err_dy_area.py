@@ -7,6 +7,7 @@
 
 # Libraries
 import packages.error.objective as objective
+import packages.error.fits as fits
 import numpy as np
 
 # Constants
@@ -17,9 +18,10 @@ NUM_POINTS  = 50
 class ErrDyArea():
 
     # Constructor
-    def __init__(self, exp_x_data, exp_y_data):
+    def __init__(self, exp_x_data, exp_y_data, test_names = None):
         self.name = "err_dy_area"
-        self.exp_polyder = [list(np.polyder(np.polyfit(exp_x_data[i], exp_y_data[i], POLY_DEG))) for i in range(len(exp_x_data))]
+        exp_polynomials = fits.get_polyfits(exp_x_data, exp_y_data, POLY_DEG, test_names)
+        self.exp_polyder = [list(np.polyder(exp_polynomial)) for exp_polynomial in exp_polynomials]
         self.exp_x_fail = [max(exp_x_list) for exp_x_list in exp_x_data]
         self.avg_dy_list = [np.average(np.polyval(self.exp_polyder[i], exp_x_data[i])) for i in range(len(exp_x_data))]
 
@@ -34,4 +36,18 @@ class ErrDyArea():
             exp_dy_list = list(np.polyval(self.exp_polyder[i], prd_x_list))
             area = [abs(prd_dy_list[j] - exp_dy_list[j]) for j in range(NUM_POINTS-1) if prd_x_list[j] <= self.exp_x_fail[i]]
             err_dy_area.append(np.average(area) / self.avg_dy_list[i])
-        return np.average(err_dy_area)
\ No newline at end of file
+        return np.average(err_dy_area)
+
+    # Computing the error of a batch of padded curves
+    def get_error_batch(self, prd_x_arrays, prd_y_arrays, sizes_list):
+        err_dy_area = []
+        for i in range(len(prd_x_arrays)):
+            thin_index_array = objective.get_thin_index_array(sizes_list[i], NUM_POINTS)
+            prd_x_array = np.take_along_axis(prd_x_arrays[i], thin_index_array, axis = 1)
+            prd_y_array = np.take_along_axis(prd_y_arrays[i], thin_index_array, axis = 1)
+            prd_dy_array = objective.get_fd_array(prd_x_array, prd_y_array)
+            exp_dy_array = np.polyval(self.exp_polyder[i], prd_x_array)
+            area_array = np.abs(prd_dy_array - exp_dy_array[:,:NUM_POINTS-1])
+            area_mask = prd_x_array[:,:NUM_POINTS-1] <= self.exp_x_fail[i]
+            err_dy_area.append(objective.get_masked_average(area_array, area_mask) / self.avg_dy_list[i])
+        return np.average(np.array(err_dy_area), axis = 0)
\ No newline at end of file
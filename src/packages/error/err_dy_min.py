@@ -13,7 +13,7 @@ import packages.error.objective as objective
 class ErrDyMin():
 
     # Constructor
-    def __init__(self, exp_x_data, exp_y_data):
+    def __init__(self, exp_x_data, exp_y_data, test_names = None):
         self.name = "err_dy_min"
         self.exp_dy_min = [min(objective.get_fd(exp_x_data[i], exp_y_data[i])) for i in range(len(exp_x_data))]
     
@@ -21,4 +21,14 @@ class ErrDyMin():
     def get_error(self, prd_x_data, prd_y_data):
         prd_dy_min = [min(objective.get_fd(prd_x_data[i], prd_y_data[i])) for i in range(len(prd_x_data))]
         err_dy_min = [abs(prd_dy_min[i] - self.exp_dy_min[i]) / self.exp_dy_min[i] for i in range(len(self.exp_dy_min))]
-        return np.average(err_dy_min)
\ No newline at end of file
+        return np.average(err_dy_min)
+
+    # Computing the error of a batch of padded curves
+    def get_error_batch(self, prd_x_arrays, prd_y_arrays, sizes_list):
+        err_dy_min = []
+        for i in range(len(prd_x_arrays)):
+            prd_dy_array = objective.get_fd_array(prd_x_arrays[i], prd_y_arrays[i])
+            prd_dy_mask = objective.get_size_mask(sizes_list[i] - 1, prd_dy_array.shape[1])
+            prd_dy_min = np.min(np.where(prd_dy_mask, prd_dy_array, np.inf), axis = 1)
+            err_dy_min.append(np.abs(prd_dy_min - self.exp_dy_min[i]) / self.exp_dy_min[i])
+        return np.average(np.array(err_dy_min), axis = 0)
\ No newline at end of file
@@ -7,6 +7,7 @@
 
 # Libraries
 import packages.error.objective as objective
+import packages.error.fits as fits
 import numpy as np
 
 # Constants
@@ -17,9 +18,9 @@ NUM_POINTS  = 50
 class ErrXArea():
 
     # Constructor
-    def __init__(self, exp_x_data, exp_y_data):
+    def __init__(self, exp_x_data, exp_y_data, test_names = None):
         self.name = "err_x_area"
-        self.exp_polynomials = [list(np.polyfit(exp_y_data[i], exp_x_data[i], POLY_DEG)) for i in range(len(exp_x_data))] # inverted
+        self.exp_polynomials = fits.get_polyfits(exp_y_data, exp_x_data, POLY_DEG, test_names) # inverted
         self.exp_y_end = [max(exp_y_list) for exp_y_list in exp_y_data]
         self.avg_x_list = [np.average(exp_x_list) for exp_x_list in exp_x_data]
 
@@ -33,4 +34,17 @@ class ErrXArea():
             exp_x_list = list(np.polyval(self.exp_polynomials[i], prd_y_list))
             area = [abs(prd_x_list[j] - exp_x_list[j]) for j in range(NUM_POINTS) if prd_y_list[j] <= self.exp_y_end[i]]
             err_x_area.append(np.average(area) / self.avg_x_list[i])
-        return np.average(err_x_area)
\ No newline at end of file
+        return np.average(err_x_area)
+
+    # Computing the error of a batch of padded curves
+    def get_error_batch(self, prd_x_arrays, prd_y_arrays, sizes_list):
+        err_x_area = []
+        for i in range(len(prd_x_arrays)):
+            thin_index_array = objective.get_thin_index_array(sizes_list[i], NUM_POINTS)
+            prd_x_array = np.take_along_axis(prd_x_arrays[i], thin_index_array, axis = 1)
+            prd_y_array = np.take_along_axis(prd_y_arrays[i], thin_index_array, axis = 1)
+            exp_x_array = np.polyval(self.exp_polynomials[i], prd_y_array)
+            area_array = np.abs(prd_x_array - exp_x_array)
+            area_mask = prd_y_array <= self.exp_y_end[i]
+            err_x_area.append(objective.get_masked_average(area_array, area_mask) / self.avg_x_list[i])
+        return np.average(np.array(err_x_area), axis = 0)
\ No newline at end of file
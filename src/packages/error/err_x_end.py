@@ -7,12 +7,13 @@
 
 # Libraries
 import numpy as np
+import packages.error.objective as objective
 
 # The ErrXEnd class
 class ErrXEnd():
 
     # Constructor
-    def __init__(self, exp_x_data, _):
+    def __init__(self, exp_x_data, exp_y_data, test_names = None):
         self.name = "err_x_end"
         self.exp_x_end = [max(exp_x_list) for exp_x_list in exp_x_data]
     
@@ -20,4 +21,13 @@ class ErrXEnd():
     def get_error(self, prd_x_data, _):
         prd_x_end = [max(prd_x_data[i]) for i in range(0, len(prd_x_data))]
         err_x_end = [abs(prd_x_end[i] - self.exp_x_end[i]) / self.exp_x_end[i] for i in range(len(self.exp_x_end))]
-        return np.average(err_x_end)
\ No newline at end of file
+        return np.average(err_x_end)
+
+    # Computing the error of a batch of padded curves
+    def get_error_batch(self, prd_x_arrays, _, sizes_list):
+        err_x_end = []
+        for i in range(len(prd_x_arrays)):
+            prd_x_mask = objective.get_size_mask(sizes_list[i], prd_x_arrays[i].shape[1])
+            prd_x_end = np.max(np.where(prd_x_mask, prd_x_arrays[i], -np.inf), axis = 1)
+            err_x_end.append(np.abs(prd_x_end - self.exp_x_end[i]) / self.exp_x_end[i])
+        return np.average(np.array(err_x_end), axis = 0)
\ No newline at end of file
@@ -7,6 +7,7 @@
 
 # Libraries
 import packages.error.objective as objective
+import packages.error.fits as fits
 import numpy as np
 
 # Constants
@@ -17,9 +18,9 @@ NUM_POINTS  = 100
 class ErrYArea():
 
     # Constructor
-    def __init__(self, exp_x_data, exp_y_data):
+    def __init__(self, exp_x_data, exp_y_data, test_names = None):
         self.name = "err_y_area"
-        self.exp_polynomials = [list(np.polyfit(exp_x_data[i], exp_y_data[i], POLY_DEG)) for i in range(len(exp_x_data))]
+        self.exp_polynomials = fits.get_polyfits(exp_x_data, exp_y_data, POLY_DEG, test_names)
         self.exp_x_end = [max(exp_x_list) for exp_x_list in exp_x_data]
         self.avg_y_list = [np.average(exp_y_list) for exp_y_list in exp_y_data]
 
@@ -33,4 +34,17 @@ class ErrYArea():
             exp_y_list = list(np.polyval(self.exp_polynomials[i], prd_x_list))
             area = [abs(prd_y_list[j] - exp_y_list[j]) for j in range(NUM_POINTS) if prd_x_list[j] <= self.exp_x_end[i]]
             err_y_area.append(np.average(area) / self.avg_y_list[i])
-        return np.average(err_y_area)
\ No newline at end of file
+        return np.average(err_y_area)
+
+    # Computing the error of a batch of padded curves
+    def get_error_batch(self, prd_x_arrays, prd_y_arrays, sizes_list):
+        err_y_area = []
+        for i in range(len(prd_x_arrays)):
+            thin_index_array = objective.get_thin_index_array(sizes_list[i], NUM_POINTS)
+            prd_x_array = np.take_along_axis(prd_x_arrays[i], thin_index_array, axis = 1)
+            prd_y_array = np.take_along_axis(prd_y_arrays[i], thin_index_array, axis = 1)
+            exp_y_array = np.polyval(self.exp_polynomials[i], prd_x_array)
+            area_array = np.abs(prd_y_array - exp_y_array)
+            area_mask = prd_x_array <= self.exp_x_end[i]
+            err_y_area.append(objective.get_masked_average(area_array, area_mask) / self.avg_y_list[i])
+        return np.average(np.array(err_y_area), axis = 0)
\ No newline at end of file
@@ -7,12 +7,13 @@
 
 # Libraries
 import numpy as np
+import packages.error.objective as objective
 
 # The ErrYEnd class
 class ErrYEnd():
 
     # Constructor
-    def __init__(self, _, exp_y_data):
+    def __init__(self, exp_x_data, exp_y_data, test_names = None):
         self.name = "err_y_end"
         self.exp_y_end = [max(exp_y_list) for exp_y_list in exp_y_data]
     
@@ -20,4 +21,13 @@ class ErrYEnd():
     def get_error(self, _, prd_y_data):
         prd_y_end = [max(prd_y_data[i]) for i in range(0, len(prd_y_data))]
         err_y_end = [abs(prd_y_end[i] - self.exp_y_end[i]) / self.exp_y_end[i] for i in range(len(self.exp_y_end))]
-        return np.average(err_y_end)
\ No newline at end of file
+        return np.average(err_y_end)
+
+    # Computing the error of a batch of padded curves
+    def get_error_batch(self, _, prd_y_arrays, sizes_list):
+        err_y_end = []
+        for i in range(len(prd_y_arrays)):
+            prd_y_mask = objective.get_size_mask(sizes_list[i], prd_y_arrays[i].shape[1])
+            prd_y_end = np.max(np.where(prd_y_mask, prd_y_arrays[i], -np.inf), axis = 1)
+            err_y_end.append(np.abs(prd_y_end - self.exp_y_end[i]) / self.exp_y_end[i])
+        return np.average(np.array(err_y_end), axis = 0)
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""
+ Title: Experimental fits
+ Description: For sharing the polynomial fits of the experimental curves within a process
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import hashlib, threading
+import numpy as np
+
+# Fits registered in this process (keyed by test name, fit settings and data)
+registered_fits = {}
+registered_lock = threading.Lock()
+
+# Gets the polynomial fit of a curve (only fitted once per process)
+def get_polyfit(x_list, y_list, poly_deg, test_name = None):
+    digest = hashlib.sha1(np.array(x_list, dtype = np.float64).tobytes() + np.array(y_list, dtype = np.float64).tobytes()).hexdigest()
+    key = (test_name, poly_deg, digest)
+    with registered_lock:
+        if key in registered_fits:
+            return registered_fits[key]
+    polynomial = list(np.polyfit(x_list, y_list, poly_deg))
+    with registered_lock:
+        registered_fits[key] = polynomial
+    return polynomial
+
+# Gets the polynomial fits of a list of curves
+def get_polyfits(x_data, y_data, poly_deg, test_names = None):
+    test_names = [None] * len(x_data) if test_names == None else test_names
+    return [get_polyfit(x_data[i], y_data[i], poly_deg, test_names[i]) for i in range(len(x_data))]
@@ -7,6 +7,8 @@
 
 # Libraries
 import math
+import numpy as np
+import packages.io.stats as stats
 import packages.error.err_dy_min as err_dy_min
 import packages.error.err_dy_area as err_dy_area
 import packages.error.err_x_end as err_x_end
@@ -21,16 +23,11 @@ BIG_VALUE = 100
 class Objective():
 
     # Constructor
-    def __init__(self, err_names, exp_x_data, exp_y_data):
+    def __init__(self, err_names, exp_x_data, exp_y_data, test_names = None):
         self.exp_x_data = exp_x_data
         self.exp_y_data = exp_y_data
-        self.err_collection = [err_dy_min.ErrDyMin(exp_x_data, exp_y_data),
-                               err_dy_area.ErrDyArea(exp_x_data, exp_y_data),
-                               err_x_end.ErrXEnd(exp_x_data, exp_y_data),
-                               err_y_end.ErrYEnd(exp_x_data, exp_y_data),
-                               err_x_area.ErrXArea(exp_x_data, exp_y_data),
-                               err_y_area.ErrYArea(exp_x_data, exp_y_data)]
-        self.err_collection = [err for err in self.err_collection if err.name in err_names]
+        self.stats = stats.Stats()
+        self.err_collection = [err_class(exp_x_data, exp_y_data, test_names = test_names) for err_name, err_class in get_error_classes() if err_name in err_names]
     
     # Get objective names
     def get_error_names(self):
@@ -39,10 +36,46 @@ class Objective():
     # Get all the errors
     def get_errors(self, prd_x_data, prd_y_data):
         if prd_x_data == [] or prd_y_data == []:
+            self.stats.add_count('objective.penalties')
             return [BIG_VALUE] * len(self.err_collection)
-        err_list = [err.get_error(prd_x_data, prd_y_data) for err in self.err_collection]
+        err_list = []
+        for err in self.err_collection:
+            with self.stats.timer('objective.' + err.name):
+                err_list.append(err.get_error(prd_x_data, prd_y_data))
         return err_list
 
+    # Get all the errors of a batch of predicted curves (returns a 2D array with the errors of each row)
+    def get_errors_batch(self, prd_x_data_list, prd_y_data_list):
+        err_array = np.full((len(prd_x_data_list), len(self.err_collection)), float(BIG_VALUE))
+        valid_indexes = [i for i in range(len(prd_x_data_list)) if len(prd_x_data_list[i]) > 0 and len(prd_y_data_list[i]) > 0]
+        if len(valid_indexes) == 0:
+            return err_array
+
+        # Pad the curves of each stress into 2D arrays
+        prd_x_arrays, prd_y_arrays, sizes_list = [], [], []
+        for i in range(len(self.exp_x_data)):
+            prd_x_array, sizes = pad_curves([prd_x_data_list[j][i] for j in valid_indexes])
+            prd_y_array, _     = pad_curves([prd_y_data_list[j][i] for j in valid_indexes])
+            prd_x_arrays.append(prd_x_array)
+            prd_y_arrays.append(prd_y_array)
+            sizes_list.append(sizes)
+
+        # Calculate the errors of all the curves at once
+        for i in range(len(self.err_collection)):
+            err_array[valid_indexes, i] = self.err_collection[i].get_error_batch(prd_x_arrays, prd_y_arrays, sizes_list)
+        return err_array
+
+# Returns the available error functions (in the order of the objectives)
+def get_error_classes():
+    return [
+        ('err_dy_min',  err_dy_min.ErrDyMin),
+        ('err_dy_area', err_dy_area.ErrDyArea),
+        ('err_x_end',   err_x_end.ErrXEnd),
+        ('err_y_end',   err_y_end.ErrYEnd),
+        ('err_x_area',  err_x_area.ErrXArea),
+        ('err_y_area',  err_y_area.ErrYArea),
+    ]
+
 # Returns a list of indexes corresponding to thinned data
 def get_thin_indexes(src_data_size, dst_data_size):
     step_size = src_data_size/dst_data_size
@@ -56,4 +89,34 @@ def get_fd(x_list, y_list):
     for i in range(1,len(x_list)):
         dy = (y_list[i]-y_list[i-1])/(x_list[i]-x_list[i-1]) if (x_list[i] > x_list[i-1] and y_list[i] > y_list[i-1]) else 100
         dy_list.append(dy)
-    return dy_list
\ No newline at end of file
+    return dy_list
+
+# Pads a list of curves of different sizes into a 2D array (returns the array and sizes)
+def pad_curves(curve_list):
+    sizes = np.array([len(curve) for curve in curve_list])
+    curve_array = np.full((len(curve_list), max(sizes)), np.nan)
+    for i in range(len(curve_list)):
+        curve_array[i, :sizes[i]] = curve_list[i]
+    return curve_array, sizes
+
+# Returns a 2D array of indexes corresponding to thinned data (for each source data size)
+def get_thin_index_array(src_data_sizes, dst_data_size):
+    step_sizes = np.array(src_data_sizes) / dst_data_size
+    thin_index_array = np.floor(np.outer(step_sizes, np.arange(1, dst_data_size-1))).astype(int)
+    return np.column_stack((np.zeros(len(step_sizes), dtype = int), thin_index_array, np.array(src_data_sizes)-1))
+
+# Returns the derivatives via finite difference (for each row; padded values are invalid)
+def get_fd_array(x_array, y_array):
+    dx_array = x_array[:,1:] - x_array[:,:-1]
+    dy_array = y_array[:,1:] - y_array[:,:-1]
+    is_valid = (x_array[:,1:] > x_array[:,:-1]) & (y_array[:,1:] > y_array[:,:-1])
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return np.where(is_valid, dy_array / dx_array, 100)
+
+# Returns the average of the included values of each row (summed in the same order as a list)
+def get_masked_average(value_array, mask_array):
+    return np.array([np.average(value_array[i][mask_array[i]]) for i in range(len(value_array))])
+
+# Returns a mask of the values within the sizes of each row
+def get_size_mask(sizes, num_columns):
+    return np.arange(num_columns) < np.array(sizes)[:,None]
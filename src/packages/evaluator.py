@@ -0,0 +1,222 @@
+"""
+ Title: Evaluator
+ Description: For evaluating batches of parameters across a pool of processes
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import itertools
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor
+import packages.io.stats as stats
+import packages.killable_pool as killable_pool
+
+# Constants
+NUM_PROCESSES = 1
+CHUNK_SIZE    = 4
+TIMEOUT       = None # seconds before an evaluation is stopped and penalised (none to wait indefinitely)
+
+# Model and objective of the worker process (set by the initialiser)
+worker_model     = None
+worker_objective = None
+
+# Class for evaluating parameters in parallel
+class Evaluator:
+
+    # Constructor
+    def __init__(self, model, objective, num_processes = NUM_PROCESSES, chunk_size = CHUNK_SIZE, timeout = TIMEOUT):
+        self.model = model
+        self.objective = objective
+        self.num_processes = num_processes
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.pool = None
+        self.keys = itertools.count()
+        self.pending = {} # handle: key and parameters (of evaluations that have not finished)
+        self.completed = [] # key, parameters and result (of evaluations that have not been collected)
+        self.killable_params = {} # handle: parameters (of evaluations in the killable pool)
+        self.timed_out = set() # parameters of timed out evaluations (until checked)
+        self.unsaved = set() # parameters of evaluations not added to the database (e.g., whose worker crashed)
+        self.database = None # of the evaluations of all optimisations (looked up before simulating)
+
+    # Starts the pool of processes (if not started, and killable if there is a timeout)
+    def start(self):
+        if self.pool != None:
+            return
+        if self.timeout == None:
+            self.pool = ProcessPoolExecutor(max_workers = self.num_processes, initializer = init_worker, initargs = (self.model, self.objective))
+        else:
+            self.pool = killable_pool.KillablePool(max(1, self.num_processes), init_worker, (self.model, self.objective), evaluate_params, self.timeout)
+
+    # Stops the pool of processes
+    def stop(self):
+        if self.pool != None:
+            self.pool.shutdown()
+            self.pool = None
+
+    # Checks whether the parameters are evaluated in this process (which cannot be stopped after a timeout)
+    def is_local(self):
+        return self.num_processes <= 1 and self.timeout == None
+
+    # Adds the curves and errors of a set of parameters to the database (if any, and unless they failed for reasons other than the simulation)
+    def save_result(self, params, result):
+        if tuple(params) in self.unsaved:
+            self.unsaved.remove(tuple(params))
+        elif self.database != None:
+            prd_x_data, prd_y_data, err_list = result
+            self.database.put(params, prd_x_data, prd_y_data, err_list, tuple(params) in self.timed_out)
+
+    # Checks whether the evaluation of a set of parameters timed out (only once per evaluation)
+    def pop_timeout(self, params):
+        params = tuple(params)
+        if not params in self.timed_out:
+            return False
+        self.timed_out.remove(params)
+        return True
+
+    # Gets the number of evaluations that can run at once
+    def get_num_workers(self):
+        return max(1, self.num_processes)
+
+    # Evaluates a list of parameters and returns the curves and errors in the same order
+    def evaluate(self, params_list):
+        params_list = [list(params) for params in params_list]
+        if self.database == None:
+            return self.simulate(params_list)
+
+        # Only simulate the parameters that are not in the database (of all optimisations)
+        results = self.database.get_results(params_list)
+        miss_indexes = [i for i in range(0, len(params_list)) if results[i] == None]
+        if len(miss_indexes) > 0:
+            miss_results = self.simulate([params_list[i] for i in miss_indexes])
+            for i, result in zip(miss_indexes, miss_results):
+                self.save_result(params_list[i], result)
+                results[i] = result
+        return results
+
+    # Simulates a list of parameters and returns the curves and errors in the same order
+    def simulate(self, params_list):
+        if self.is_local():
+            return [get_result(self.model, self.objective, params) for params in params_list]
+        if self.model.cache == None:
+            return self.map_params(params_list)
+
+        # Only send the parameters that are not cached to the workers
+        results = [None] * len(params_list)
+        for i in range(0, len(params_list)):
+            cached_curves = self.model.cache.get(params_list[i], self.model.stresses)
+            if cached_curves != None:
+                prd_x_data, prd_y_data = cached_curves
+                results[i] = (prd_x_data, prd_y_data, self.objective.get_errors(prd_x_data, prd_y_data))
+        miss_indexes = [i for i in range(0, len(params_list)) if results[i] == None]
+        if len(miss_indexes) > 0:
+            miss_results = self.map_params([params_list[i] for i in miss_indexes])
+            for i, result in zip(miss_indexes, miss_results):
+                self.model.cache.put(params_list[i], self.model.stresses, result[0], result[1])
+                results[i] = result
+        return results
+
+    # Starts evaluating a set of parameters without waiting for the result (returns the key of the evaluation)
+    def submit(self, params):
+        key = next(self.keys)
+        params = list(params)
+        database_result = self.database.get_results([params])[0] if self.database != None else None
+        if database_result != None:
+            self.completed.append((key, params, database_result))
+            return key
+        if self.is_local():
+            result = get_result(self.model, self.objective, params)
+            self.save_result(params, result)
+            self.completed.append((key, params, result))
+            return key
+        cached_curves = self.model.cache.get(params, self.model.stresses) if self.model.cache != None else None
+        if cached_curves != None:
+            prd_x_data, prd_y_data = cached_curves
+            self.completed.append((key, params, (prd_x_data, prd_y_data, self.objective.get_errors(prd_x_data, prd_y_data))))
+            return key
+        self.pending[self.submit_params(params)] = (key, params)
+        return key
+
+    # Waits for at least one evaluation to finish (returns the keys, parameters and results of the finished evaluations)
+    def get_completed(self):
+        if len(self.completed) == 0 and len(self.pending) > 0:
+            for handle, result in self.wait_params(list(self.pending.keys())):
+                key, params = self.pending.pop(handle)
+                if self.model.cache != None:
+                    self.model.cache.put(params, self.model.stresses, result[0], result[1])
+                self.save_result(params, result)
+                self.completed.append((key, params, result))
+        completed, self.completed = self.completed, []
+        return completed
+
+    # Starts evaluating a set of parameters in a worker (returns a handle to wait for)
+    def submit_params(self, params):
+        self.start()
+        if self.timeout == None:
+            return self.pool.submit(evaluate_params, params)
+        handle = self.pool.submit(params)
+        self.killable_params[handle] = params
+        return handle
+
+    # Waits for at least one of the handles to finish (returns the finished handles and their results)
+    def wait_params(self, handles):
+        if self.timeout != None:
+            return [(handle, self.get_killable_result(handle, status, result)) for handle, status, result in self.pool.wait(handles)]
+        done_futures, _ = concurrent.futures.wait(handles, return_when = concurrent.futures.FIRST_COMPLETED)
+        results = []
+        for future in done_futures:
+            prd_x_data, prd_y_data, err_list, stats_dict = future.result()
+            self.model.stats.merge(stats_dict)
+            results.append((future, (prd_x_data, prd_y_data, err_list)))
+        return results
+
+    # Gets the curves and errors of an evaluation in the killable pool (penalised if it timed out or its worker crashed)
+    def get_killable_result(self, handle, status, result):
+        params = self.killable_params.pop(handle)
+        if status == killable_pool.TIMED_OUT:
+            self.model.stats.add_count('evaluator.timeouts')
+            self.timed_out.add(tuple(params))
+        elif status == killable_pool.CRASHED:
+            self.model.stats.add_count('evaluator.crashes')
+            self.unsaved.add(tuple(params))
+        if status != killable_pool.SUCCESS:
+            return [], [], self.objective.get_errors([], [])
+        prd_x_data, prd_y_data, err_list, stats_dict = result
+        self.model.stats.merge(stats_dict)
+        return prd_x_data, prd_y_data, err_list
+
+    # Evaluates a list of parameters in the workers (and adds the stats of the workers)
+    def map_params(self, params_list):
+        self.start()
+        if self.timeout != None:
+            handles = [self.submit_params(params) for params in params_list]
+            results = {}
+            while len(results) < len(handles):
+                results.update(self.wait_params([handle for handle in handles if not handle in results]))
+            return [results[handle] for handle in handles]
+        results = []
+        for prd_x_data, prd_y_data, err_list, stats_dict in self.pool.map(evaluate_params, params_list, chunksize = self.chunk_size):
+            self.model.stats.merge(stats_dict)
+            results.append((prd_x_data, prd_y_data, err_list))
+        return results
+
+# Initialises the model and objective of a worker process
+def init_worker(model, objective):
+    global worker_model, worker_objective
+    worker_model = model
+    worker_model.cache = None # cached by the main process instead
+    worker_model.stress_processes = 1 # the workers already use the CPUs (and forked workers are not pickled)
+    worker_objective = objective
+    worker_model.stats = worker_objective.stats = stats.Stats() # sent back to the main process
+
+# Evaluates a set of parameters within a worker process
+def evaluate_params(params):
+    prd_x_data, prd_y_data, err_list = get_result(worker_model, worker_objective, params)
+    return prd_x_data, prd_y_data, err_list, worker_model.stats.pop()
+
+# Gets the curves and errors of a set of parameters
+def get_result(model, objective, params):
+    prd_x_data, prd_y_data = model.get_prd_curves(*params)
+    err_list = objective.get_errors(prd_x_data, prd_y_data)
+    return prd_x_data, prd_y_data, err_list
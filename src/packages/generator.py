@@ -0,0 +1,129 @@
+"""
+ Title: Generator
+ Description: For generating the datasets of the surrogate models across a pool of processes
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import os, time, math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import packages.polyfier as polyfier
+import packages.sampler as sampler
+
+# Constants
+NUM_PROCESSES   = 1
+CHUNK_SIZE      = 1000 # samples per chunk file
+SEED            = 0
+DEFAULT_PATH    = './'
+DEFAULT_FILE    = 'generated'
+CHUNK_EXTENSION = '.chunks'
+
+# Model and polyfier of the worker process (set by the initialiser)
+worker_model     = None
+worker_polyfier  = None
+
+# Class for generating the parameters and fitted curves of a dataset in chunks (resumed from the written chunks)
+class Generator:
+
+    # Constructor
+    def __init__(self, model, num_samples, chunk_size = CHUNK_SIZE, num_processes = NUM_PROCESSES, seed = SEED, path = DEFAULT_PATH, file = DEFAULT_FILE):
+        if len(model.stresses) != 1:
+            raise ValueError('The dataset can only be generated for one stress')
+        self.model = model
+        self.num_samples = num_samples
+        self.chunk_size = chunk_size
+        self.num_processes = num_processes
+        self.seed = seed
+        self.path = path
+        self.file = file
+        self.chunk_path = path + file + CHUNK_EXTENSION + '/'
+        self.num_chunks = math.ceil(num_samples / chunk_size)
+
+    # Gets the file of a chunk
+    def get_chunk_file(self, chunk_id):
+        return self.chunk_path + 'chunk_' + str(chunk_id).zfill(6) + '.npz'
+
+    # Generates the chunks that have not been written
+    def generate(self):
+        os.makedirs(self.chunk_path, exist_ok = True)
+        for file in os.listdir(self.chunk_path): # left by interrupted workers
+            if file.endswith('.tmp.npz'):
+                os.remove(self.chunk_path + file)
+        chunk_ids = [chunk_id for chunk_id in range(0, self.num_chunks) if not os.path.isfile(self.get_chunk_file(chunk_id))]
+        print('[generator]: Generating ' + str(len(chunk_ids)) + '/' + str(self.num_chunks) + ' chunks')
+
+        # Generate the remaining chunks across the pool and report the progress
+        start_time = time.time()
+        num_samples, num_failures = 0, 0
+        with ProcessPoolExecutor(max_workers = self.num_processes, initializer = init_worker, initargs = (self.model,)) as pool:
+            futures = [pool.submit(generate_chunk, chunk_id, self.get_chunk_size(chunk_id), self.seed, self.get_chunk_file(chunk_id)) for chunk_id in chunk_ids]
+            for num_done, future in enumerate(as_completed(futures), start = 1):
+                chunk_samples, chunk_failures = future.result()
+                num_samples += chunk_samples
+                num_failures += chunk_failures
+                time_elapsed = time.time() - start_time
+                print('[generator]: Generated chunk (' + str(num_done) + '/' + str(len(chunk_ids)) + ', '
+                    + str(round(num_samples / time_elapsed, 1)) + ' samples/s, '
+                    + str(round(100 * num_failures / num_samples, 1)) + '% failed, '
+                    + str(round(time_elapsed * (len(chunk_ids) - num_done) / num_done)) + 's remaining)')
+        return num_samples, num_failures
+
+    # Gets the number of samples of a chunk
+    def get_chunk_size(self, chunk_id):
+        return min(self.chunk_size, self.num_samples - chunk_id * self.chunk_size)
+
+    # Merges the written chunks into the memory-mapped cache read by the sampler (returns the number of samples)
+    def merge(self):
+        chunk_files = [self.get_chunk_file(chunk_id) for chunk_id in range(0, self.num_chunks) if os.path.isfile(self.get_chunk_file(chunk_id))]
+        num_rows_list = []
+        for chunk_file in chunk_files:
+            with np.load(chunk_file) as chunk:
+                num_rows_list.append(len(chunk['x_end']))
+
+        # Copy the chunks into the cache one at a time
+        cache_path = self.path + self.file + sampler.CACHE_EXTENSION + '/'
+        arrays = sampler.create_cache(cache_path, sum(num_rows_list), len(self.model.params), polyfier.DEFAULT_POLY_DEG + 1)
+        row = 0
+        for chunk_file, num_rows in zip(chunk_files, num_rows_list):
+            with np.load(chunk_file) as chunk:
+                for name, array in zip(sampler.ARRAY_NAMES, arrays):
+                    array[row:row + num_rows] = chunk[name]
+            row += num_rows
+        sampler.finish_cache(cache_path, arrays)
+        return row
+
+# Initialises the model and polyfier of a worker process
+def init_worker(model):
+    global worker_model, worker_polyfier
+    worker_model = model
+    worker_model.cache = None # parameters are not repeated
+    worker_polyfier = polyfier.Polyfier()
+
+# Simulates and fits the parameters of a chunk and writes them (returns the number of samples and failures)
+def generate_chunk(chunk_id, chunk_size, seed, chunk_file):
+
+    # Sample the parameters within the bounds (reproducible per chunk)
+    rng = np.random.default_rng([seed, chunk_id])
+    l_bnds, u_bnds = np.array(worker_model.l_bnds), np.array(worker_model.u_bnds)
+    params_array = l_bnds + (u_bnds - l_bnds) * rng.random((chunk_size, len(l_bnds)))
+
+    # Simulate the curves (failed simulations are excluded)
+    x_data, y_data, valid_indexes = [], [], []
+    for i in range(0, chunk_size):
+        prd_x_data, prd_y_data = worker_model.get_prd_curves(*params_array[i])
+        if prd_x_data != []:
+            x_data.append(prd_x_data[0])
+            y_data.append(prd_y_data[0])
+            valid_indexes.append(i)
+
+    # Fit the curves and write the chunk atomically
+    coeffs_array = np.zeros((0, polyfier.DEFAULT_POLY_DEG + 1))
+    x_end_array = np.zeros(0)
+    if len(valid_indexes) > 0:
+        x_end_array, coeffs_array = worker_polyfier.curves_to_polynomials(x_data, y_data)
+    temp_file = chunk_file[:-len('.npz')] + '.' + str(os.getpid()) + '.tmp.npz'
+    np.savez(temp_file, params = params_array[valid_indexes], x_end = x_end_array, coeffs = coeffs_array)
+    os.replace(temp_file, chunk_file)
+    return chunk_size, chunk_size - len(valid_indexes)
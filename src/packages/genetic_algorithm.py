@@ -6,11 +6,18 @@
 """
 
 # Libraries
+import os, pickle
 import numpy as np
 from pymoo.algorithms.moo.nsga2 import NSGA2
 from pymoo.factory import get_sampling, get_crossover, get_mutation, get_termination
-from pymoo.optimize import minimize
-from pymoo.core.problem import ElementwiseProblem
+from pymoo.core.problem import ElementwiseProblem, Problem as PymooProblem
+import packages.evaluator as evaluator
+import packages.distributed as distributed
+import packages.surrogate as surrogate
+import packages.steady_state as steady_state
+import packages.io.warm_start as warm_start
+import packages.io.store as store
+import packages.mapper as mapper
 
 # Constants
 NUM_GENS  = 1000
@@ -18,60 +25,266 @@ INIT_POP  = 500
 OFFSPRING = 500
 CROSSOVER = 0.65
 MUTATION  = 0.35
+NUM_PROCESSES = evaluator.NUM_PROCESSES
+SURROGATE = False
+NUM_COMPONENTS = surrogate.NUM_COMPONENTS # principal components of the curves of the surrogates (none to not compress)
+NORMALISE = True # searches the parameters mapped to 0 and 1 (using the scales of the model)
+CHECKPOINT_INTERVAL = 10 # generations between checkpoints (0 to disable)
+DISTRIBUTED = False # evaluates with workers connected to a broker (the processes are local workers)
+ASYNCHRONOUS = False # breeds and evaluates offspring one at a time whenever a worker is free (steady-state)
+TIMEOUT = evaluator.TIMEOUT
 
 # The Multi-Objective Genetic Algorithm (MOGA) class
 class MOGA:
     
     # Constructor
-    def __init__(self, model, objective, num_gens = NUM_GENS, init_pop = INIT_POP, offspring = OFFSPRING, crossover = CROSSOVER, mutation = MUTATION):
+    def __init__(self, model, objective, num_gens = NUM_GENS, init_pop = INIT_POP, offspring = OFFSPRING, crossover = CROSSOVER, mutation = MUTATION, num_processes = NUM_PROCESSES, use_surrogate = SURROGATE, normalise = NORMALISE, use_distributed = DISTRIBUTED, asynchronous = ASYNCHRONOUS, timeout = TIMEOUT, num_components = NUM_COMPONENTS, broker_authkey = None):
 
-        # Initialises the members
-        self.problem = Problem(model, objective)
+        # Initialises the members (evaluates through the evaluator if parallel, surrogate-assisted, distributed, asynchronous or timed)
+        param_mapper = mapper.ParameterMapper(model.l_bnds, model.u_bnds, model.scales) if normalise else None
+        if num_processes > 1 or use_surrogate or use_distributed or asynchronous or timeout != None:
+            assistant = surrogate.Assistant(objective, len(model.stresses), num_components = num_components) if use_surrogate else None
+            if use_distributed:
+                moga_evaluator = distributed.DistributedEvaluator(model, objective, num_processes, authkey = broker_authkey)
+            else:
+                moga_evaluator = evaluator.Evaluator(model, objective, num_processes, timeout = timeout)
+            self.problem = BatchProblem(model, objective, moga_evaluator, assistant, param_mapper)
+        else:
+            self.problem = Problem(model, objective, param_mapper)
         self.num_gens  = num_gens
         self.init_pop  = init_pop
         self.offspring = offspring
         self.crossover = crossover
         self.mutation  = mutation
+        self.asynchronous = asynchronous
 
         # Defines the algorithm and termination condition
-        self.algo = NSGA2(
+        self.algo = self.get_algo(get_sampling("real_lhs")) # real_random
+        self.term = get_termination("n_gen", self.num_gens)
+        self.resumed = False
+
+        # Checkpointing (disabled until a file is set)
+        self.checkpoint_file = None
+        self.checkpoint_interval = CHECKPOINT_INTERVAL
+        self.checkpoint_extra = {}
+
+    # Defines the algorithm (with a sampling or initial population)
+    def get_algo(self, sampling):
+        crossover = get_crossover("real_sbx", prob=self.crossover, eta=10) # simulated binary
+        mutation  = get_mutation("real_pm", prob=self.mutation, eta=15) # polynomial mutation
+        if self.asynchronous:
+            max_evals = self.init_pop + (self.num_gens - 1) * self.offspring # same evaluations as the generations
+            return steady_state.SteadyState(self.init_pop, self.offspring, max_evals, sampling, crossover, mutation)
+        return NSGA2(
             pop_size     = self.init_pop,
             n_offsprings = self.offspring,
-            sampling     = get_sampling("real_lhs"), # real_random
-            crossover    = get_crossover("real_sbx", prob=self.crossover, eta=10), # simulated binary
-            mutation     = get_mutation("real_pm", prob=self.mutation, eta=15), # polynomial mutation
+            sampling     = sampling,
+            crossover    = crossover,
+            mutation     = mutation,
             eliminate_duplicates = True
         )
-        self.term = get_termination("n_gen", self.num_gens)
+
+    # Starts the optimisation from the parameters of previous optimisations (topped up with LHS)
+    def set_warm_start(self, prior_params, perturbation = warm_start.PERTURBATION, fraction = warm_start.FRACTION):
+        if self.problem.mapper != None: # only map the valid parameters (since mapping moves parameters out of bounds to the bounds)
+            prior_params = np.array(prior_params, dtype = np.float64).reshape(-1, len(self.problem.model.l_bnds))
+            is_valid = np.all((prior_params >= self.problem.model.l_bnds) & (prior_params <= self.problem.model.u_bnds), axis = 1)
+            prior_params = self.problem.mapper.map(prior_params[is_valid])
+        population = warm_start.get_population(self.problem, get_sampling("real_lhs"), prior_params, self.init_pop, perturbation, fraction)
+        self.algo = self.get_algo(population)
 
     # Sets a recorder that records the results during the optimisations
     def set_recorder(self, rec):
         self.problem.rec = rec
 
-    # Runs the genetic optimisation
+    # Sets the database to look up the evaluations of previous optimisations from (and add the evaluations to)
+    def set_database(self, db):
+        self.problem.database = db
+        if isinstance(self.problem, BatchProblem):
+            self.problem.evaluator.database = db
+
+    # Sets the stats for timing the evaluations
+    def set_stats(self, stats):
+        self.problem.stats = stats
+
+    # Sets the file to periodically save the state of the optimisation to (with extra information to save)
+    def set_checkpoint(self, checkpoint_file, checkpoint_interval = CHECKPOINT_INTERVAL, extra = {}):
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_extra = extra
+
+    # Saves the state of the algorithm, random number generator, surrogate and recorder (replaced atomically)
+    def save_checkpoint(self):
+        checkpoint = {
+            'algo':      self.algo,
+            'np_random': np.random.get_state(),
+            'assistant': getattr(self.problem, 'assistant', None),
+            'recorder':  self.problem.rec.get_state() if self.problem.rec != None else None,
+            'extra':     self.checkpoint_extra,
+        }
+        temp_file = self.checkpoint_file + '.tmp'
+        self.algo.problem = None # contains the processes and threads of the run
+        try:
+            with open(temp_file, 'wb') as file:
+                pickle.dump(checkpoint, file)
+            os.replace(temp_file, self.checkpoint_file)
+        finally:
+            self.algo.problem = self.problem
+
+    # Restores the state of the optimisation from the checkpoint (set the recorder first)
+    def load_checkpoint(self):
+        checkpoint = read_checkpoint(self.checkpoint_file)
+        self.algo = checkpoint['algo']
+        self.algo.problem = self.problem
+        np.random.set_state(checkpoint['np_random'])
+        if checkpoint['assistant'] != None and isinstance(self.problem, BatchProblem):
+            self.problem.assistant = checkpoint['assistant']
+        if checkpoint['recorder'] != None and self.problem.rec != None:
+            self.problem.rec.set_state(checkpoint['recorder'])
+        self.resumed = True
+
+    # Runs the genetic optimisation (from the checkpoint if resumed)
     def optimise(self):
-        params_list = minimize(self.problem, self.algo, self.term, verbose=False, seed=None).X
+        try:
+            if not self.resumed:
+                self.algo.setup(self.problem, termination=self.term, verbose=False, seed=None)
+            while self.algo.has_next():
+                last_gen = self.algo.n_gen or 0 # none before the first generation
+                self.algo.next()
+                if (self.checkpoint_file != None and self.checkpoint_interval > 0
+                and (self.algo.n_gen or 0) // self.checkpoint_interval > last_gen // self.checkpoint_interval): # even if several generations finished at once
+                    self.save_checkpoint()
+            params_list = self.algo.result().X
+            if self.problem.mapper != None:
+                params_list = self.problem.mapper.unmap(params_list)
+
+        # Finish the recorder first (since plotting simulates with the model), then stop the processes
+        finally:
+            try:
+                if self.problem.rec != None:
+                    self.problem.rec.finish()
+            finally:
+                if isinstance(self.problem, BatchProblem):
+                    self.problem.evaluator.stop()
+                self.problem.model.stop()
+                if self.problem.database != None:
+                    self.problem.database.close()
         return params_list
 
 # The MOGA problem
 class Problem(ElementwiseProblem):
 
     # Constructor
-    def __init__(self, model, objective):
+    def __init__(self, model, objective, param_mapper = None):
         self.objective = objective
         self.model = model
+        self.mapper = param_mapper
         self.rec = None
+        self.database = None
+        self.stats = model.stats
         super().__init__(
             n_var    = len(self.model.params),
             n_obj    = len(self.objective.err_collection),
             n_constr = 0,
-            xl       = np.array(self.model.l_bnds),
-            xu       = np.array(self.model.u_bnds))
+            xl       = get_lower_bounds(self.model, self.mapper),
+            xu       = get_upper_bounds(self.model, self.mapper))
 
     # Minimises expression 'F' such that the expression 'G <= 0' is satisfied
     def _evaluate(self, params, out, *args, **kwargs):
-        prd_x_data, prd_y_data = self.model.get_prd_curves(*params)
-        err_list = self.objective.get_errors(prd_x_data, prd_y_data)
+        if self.mapper != None:
+            params = self.mapper.unmap(params)
+        with self.stats.timer('problem.evaluate'):
+            database_result = self.database.get_results([params])[0] if self.database != None else None
+            if database_result != None:
+                err_list = database_result[2]
+            else:
+                prd_x_data, prd_y_data = self.model.get_prd_curves(*params)
+                err_list = self.objective.get_errors(prd_x_data, prd_y_data)
+                if self.database != None:
+                    self.database.put(params, prd_x_data, prd_y_data, err_list)
         if (self.rec != None):
             self.rec.update_results(params, err_list)
-        out['F'] = err_list
\ No newline at end of file
+        out['F'] = err_list
+
+# The MOGA problem (evaluates the whole population at once)
+class BatchProblem(PymooProblem):
+
+    # Constructor
+    def __init__(self, model, objective, evaluator, assistant = None, param_mapper = None):
+        self.objective = objective
+        self.model = model
+        self.mapper = param_mapper
+        self.evaluator = evaluator
+        self.assistant = assistant
+        self.rec = None
+        self.database = None
+        self.stats = model.stats
+        super().__init__(
+            n_var    = len(self.model.params),
+            n_obj    = len(self.objective.err_collection),
+            n_constr = 0,
+            xl       = get_lower_bounds(self.model, self.mapper),
+            xu       = get_upper_bounds(self.model, self.mapper))
+
+    # Minimises expression 'F' for all the parameters (recorded in the same order as elementwise)
+    def _evaluate(self, params_list, out, *args, **kwargs):
+        if self.mapper != None:
+            params_list = self.mapper.unmap(params_list)
+
+        # Only evaluate the candidates selected by the surrogate (if assisted)
+        with self.stats.timer('problem.select'):
+            indexes = list(range(0, len(params_list))) if self.assistant == None else self.assistant.select(params_list)
+        with self.stats.timer('problem.evaluate_batch'):
+            results = self.evaluator.evaluate([params_list[i] for i in indexes])
+
+        # Record the evaluated candidates and penalise the rest
+        err_list_list = [self.objective.get_errors([], [])] * len(params_list)
+        for i, result in zip(indexes, results):
+            prd_x_data, prd_y_data, err_list = result
+            if (self.rec != None):
+                self.rec.update_results(params_list[i], err_list, self.get_status(params_list[i]))
+            if (self.assistant != None):
+                self.assistant.add(params_list[i], prd_x_data, prd_y_data)
+            err_list_list[i] = err_list
+        if (self.rec != None and len(indexes) < len(params_list)):
+            self.rec.skip_results(len(params_list) - len(indexes))
+
+        # Refresh the surrogate with the evaluated candidates
+        if (self.assistant != None):
+            with self.stats.timer('problem.train_surrogate'):
+                self.assistant.update()
+        out['F'] = np.array(err_list_list)
+
+    # Starts evaluating a set of parameters without waiting for the result (returns the key of the evaluation)
+    def submit(self, params):
+        if self.mapper != None:
+            params = self.mapper.unmap(params)
+        return self.evaluator.submit(params)
+
+    # Waits for evaluations to finish and records them (returns the keys and errors)
+    def get_completed(self):
+        with self.stats.timer('problem.wait'):
+            completed = self.evaluator.get_completed()
+        errors = []
+        for key, params, (_, _, err_list) in completed:
+            if (self.rec != None):
+                self.rec.update_results(params, err_list, self.get_status(params))
+            errors.append((key, err_list))
+        return errors
+
+    # Gets the status of an evaluation to record
+    def get_status(self, params):
+        return store.TIMED_OUT if self.evaluator.pop_timeout(params) else store.EVALUATED
+
+# Gets the lower bounds of the search space (of the mapped parameters if mapped)
+def get_lower_bounds(model, param_mapper):
+    return np.array(model.l_bnds) if param_mapper == None else np.full(len(model.params), mapper.MAP_LOWER)
+
+# Gets the upper bounds of the search space
+def get_upper_bounds(model, param_mapper):
+    return np.array(model.u_bnds) if param_mapper == None else np.full(len(model.params), mapper.MAP_UPPER)
+
+# Reads a checkpoint saved by a MOGA
+def read_checkpoint(checkpoint_file):
+    with open(checkpoint_file, 'rb') as file:
+        return pickle.load(file)
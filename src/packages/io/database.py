@@ -0,0 +1,213 @@
+"""
+ Title: Database
+ Description: For storing the evaluations of all optimisations (SQLite), so they can be looked up and queried across runs
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import sqlite3, queue, threading, hashlib, json, zlib, time
+import numpy as np
+
+# Constants
+DEFAULT_PATH = './'
+DEFAULT_FILE = 'evaluations'
+BATCH_SIZE   = 1000 # maximum evaluations per transaction
+QUERY_SIZE   = 500 # maximum parameters per lookup query (under the SQLite variable limit)
+TIMEOUT      = 60 # seconds to wait for other optimisations to release the database
+PRECISION    = None # number of significant figures to quantise the parameters to when looking up (None for exact)
+SAVE_CURVES  = False
+SAVE_FAILURES = True # False if failures depend on the optimisation (e.g., rejected by the screening)
+CREATE_TABLES = [
+    'CREATE TABLE IF NOT EXISTS evaluations (id INTEGER PRIMARY KEY, model TEXT, stresses TEXT, params_hash TEXT, params BLOB, status TEXT, curves BLOB, identifier INTEGER, time REAL)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS evaluations_key ON evaluations (model, stresses, params_hash)',
+    'CREATE TABLE IF NOT EXISTS errors (evaluation_id INTEGER, tests TEXT, error_name TEXT, value REAL, PRIMARY KEY (evaluation_id, tests, error_name))',
+    'CREATE INDEX IF NOT EXISTS errors_value ON errors (tests, error_name, value)',
+]
+
+# Statuses of the evaluations (of the curves, which only depend on the model, stresses and parameters)
+EVALUATED = 'evaluated'
+FAILED    = 'failed' # given the penalty of failed simulations
+TIMED_OUT = 'timed_out' # not looked up, since the timeout may differ between optimisations
+
+# Class for looking up and adding the evaluations of an optimisation
+class Database:
+
+    # Constructor
+    def __init__(self, model, objective, test_names, identifier = None, path = DEFAULT_PATH, file = DEFAULT_FILE, precision = PRECISION, save_curves = SAVE_CURVES, save_failures = SAVE_FAILURES):
+        self.db_file = path + file + '.db'
+        self.model = model
+        self.objective = objective
+        self.error_names = objective.get_error_names()
+        self.stresses_key = json.dumps([float(stress) for stress in model.stresses])
+        self.tests_key = get_tests_key(test_names)
+        self.identifier = identifier
+        self.precision = precision
+        self.save_curves = save_curves
+        self.save_failures = save_failures
+        self.connection = connect(self.db_file) # for lookups (the writer has its own)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target = self.write_loop, daemon = True)
+        self.thread.start()
+
+    # Gets the hash of a set of parameters (quantised if there is a precision)
+    def get_hash(self, params):
+        params = [float(param) for param in params]
+        if self.precision != None:
+            params = [float('{:.{}g}'.format(param, self.precision)) for param in params]
+        return hashlib.sha1(np.array(params, dtype = np.float64).tobytes()).hexdigest()
+
+    # Looks up the curves and errors of a list of parameters (none for the parameters that were not evaluated)
+    def get_results(self, params_list):
+        with self.model.stats.timer('database.get_results'):
+            hashes = [self.get_hash(params) for params in params_list]
+            rows = {}
+            for i in range(0, len(hashes), QUERY_SIZE):
+                hash_chunk = list(set(hashes[i:i+QUERY_SIZE]))
+                rows.update({row[1]: row for row in self.connection.execute(
+                    'SELECT id, params_hash, status, curves FROM evaluations WHERE model = ? AND stresses = ? AND status != ? AND params_hash IN ('
+                    + ','.join(['?'] * len(hash_chunk)) + ')', [self.model.name, self.stresses_key, TIMED_OUT] + hash_chunk)})
+            errors_dict = self.get_errors_dict([row[0] for row in rows.values()])
+
+            # Get the errors (computed from the curves if an error was not stored)
+            results = []
+            for params_hash in hashes:
+                row = rows.get(params_hash)
+                result = None if row == None else self.get_result(row, errors_dict.get(row[0], {}))
+                self.model.stats.add_count('database.misses' if result == None else 'database.hits')
+                results.append(result)
+            return results
+
+    # Gets the stored errors of evaluations for the tests (as dictionaries of the error names and values)
+    def get_errors_dict(self, evaluation_ids):
+        errors_dict = {}
+        for i in range(0, len(evaluation_ids), QUERY_SIZE):
+            id_chunk = evaluation_ids[i:i+QUERY_SIZE]
+            for evaluation_id, error_name, value in self.connection.execute(
+                'SELECT evaluation_id, error_name, value FROM errors WHERE tests = ? AND evaluation_id IN (' + ','.join(['?'] * len(id_chunk)) + ')', [self.tests_key] + id_chunk):
+                errors_dict.setdefault(evaluation_id, {})[error_name] = value
+        return errors_dict
+
+    # Gets the curves and errors of a stored evaluation (or none if the errors of the objective cannot be found)
+    def get_result(self, row, error_dict):
+        _, _, status, curves = row
+        if status == FAILED:
+            return [], [], self.objective.get_errors([], [])
+        prd_x_data, prd_y_data = decompress_curves(curves) if curves != None else ([], [])
+        if all([error_name in error_dict for error_name in self.error_names]):
+            return prd_x_data, prd_y_data, [error_dict[error_name] for error_name in self.error_names]
+        if prd_x_data == []:
+            return None
+        return prd_x_data, prd_y_data, self.objective.get_errors(prd_x_data, prd_y_data)
+
+    # Queues an evaluation to be added (with its errors added to those of previous optimisations, and failures skipped if not saved)
+    def put(self, params, prd_x_data, prd_y_data, err_list, timed_out = False):
+        status = TIMED_OUT if timed_out else FAILED if prd_x_data == [] else EVALUATED
+        if status == FAILED and not self.save_failures:
+            return
+        curves = compress_curves(prd_x_data, prd_y_data) if self.save_curves and status == EVALUATED else None
+        self.queue.put((self.model.name, self.stresses_key, self.tests_key, self.get_hash(params), np.array(params, dtype = np.float64).tobytes(),
+                        status, curves, self.identifier, time.time(), [float(error) for error in err_list]))
+
+    # Adds the queued evaluations in batches until closed
+    def write_loop(self):
+        connection = connect(self.db_file)
+        closed = False
+        while not closed:
+
+            # Gets the queued evaluations
+            rows = [self.queue.get()]
+            while len(rows) < BATCH_SIZE and not self.queue.empty():
+                rows.append(self.queue.get())
+            if rows[-1] == None:
+                rows.pop()
+                closed = True
+
+            # Adds the evaluations (keeping the first of repeated parameters, unless it timed out) and their errors for the tests
+            for row in rows:
+                connection.execute('INSERT INTO evaluations (model, stresses, params_hash, params, status, curves, identifier, time) VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                                   + 'ON CONFLICT (model, stresses, params_hash) DO UPDATE SET curves = COALESCE(curves, excluded.curves), '
+                                   + 'status = CASE WHEN status = ? THEN excluded.status ELSE status END', row[:2] + row[3:-1] + (TIMED_OUT,))
+                if row[5] == TIMED_OUT:
+                    continue
+                evaluation_id = connection.execute('SELECT id FROM evaluations WHERE model = ? AND stresses = ? AND params_hash = ?', (row[0], row[1], row[3])).fetchone()[0]
+                connection.executemany('INSERT OR IGNORE INTO errors (evaluation_id, tests, error_name, value) VALUES (?, ?, ?, ?)',
+                                       [(evaluation_id, row[2], error_name, error) for error_name, error in zip(self.error_names, row[-1])])
+            connection.commit()
+        connection.close()
+
+    # Adds the remaining evaluations and stops the writer
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.connection.close()
+
+# Connects to the database (creating the tables if needed)
+def connect(db_file):
+    connection = sqlite3.connect(db_file, timeout = TIMEOUT, check_same_thread = False)
+    connection.execute('PRAGMA journal_mode=WAL') # so optimisations can look up while others add
+    for create_table in CREATE_TABLES:
+        connection.execute(create_table)
+    connection.commit()
+    return connection
+
+# Gets the key of a set of tests (in any order)
+def get_tests_key(test_names):
+    return ','.join(sorted(test_names))
+
+# Compresses the curves of an evaluation
+def compress_curves(prd_x_data, prd_y_data):
+    sizes = np.array([len(prd_x_list) for prd_x_list in prd_x_data], dtype = np.int64)
+    values = np.concatenate([np.array(curve_list, dtype = np.float64) for curve_list in list(prd_x_data) + list(prd_y_data)])
+    return zlib.compress(np.int64(len(sizes)).tobytes() + sizes.tobytes() + values.tobytes())
+
+# Decompresses the curves of an evaluation
+def decompress_curves(curves):
+    data = zlib.decompress(curves)
+    num_curves = int(np.frombuffer(data[:8], dtype = np.int64)[0])
+    sizes = np.frombuffer(data[8:8+8*num_curves], dtype = np.int64)
+    values = np.frombuffer(data[8+8*num_curves:], dtype = np.float64)
+    bounds = np.cumsum(np.concatenate(([0], sizes, sizes)))
+    curve_lists = [list(values[bounds[i]:bounds[i+1]]) for i in range(0, 2 * num_curves)]
+    return curve_lists[:num_curves], curve_lists[num_curves:]
+
+# Reads the parameters and errors of the evaluations of a model and tests with all the errors (in order of evaluation)
+def read_evaluations(model_name, test_names, error_names, path = DEFAULT_PATH, file = DEFAULT_FILE, order_by = 'e.id', limit = -1):
+    connection = sqlite3.connect(path + file + '.db', timeout = TIMEOUT)
+    error_columns = ', '.join(['MAX(CASE WHEN r.error_name = ? THEN r.value END)'] * len(error_names))
+    rows = connection.execute(
+        'SELECT e.params, ' + error_columns + ' FROM evaluations e JOIN errors r ON r.evaluation_id = e.id '
+        + 'WHERE e.model = ? AND r.tests = ? AND r.error_name IN (' + ','.join(['?'] * len(error_names)) + ') '
+        + 'GROUP BY e.id HAVING COUNT(*) = ? ORDER BY ' + order_by + ' LIMIT ?',
+        error_names + [model_name, get_tests_key(test_names)] + error_names + [len(error_names), limit]).fetchall()
+    connection.close()
+    params_list = [list(np.frombuffer(row[0], dtype = np.float64)) for row in rows]
+    errors_list = [list(row[1:]) for row in rows]
+    return params_list, errors_list
+
+# Gets the N evaluations with the lowest sum of errors for a model and tests
+def get_best(model_name, test_names, error_names, num_best, path = DEFAULT_PATH, file = DEFAULT_FILE):
+    return read_evaluations(model_name, test_names, error_names, path, file, 'SUM(r.value)', num_best)
+
+# Gets the non-dominated evaluations for a model, tests and errors
+def get_pareto_front(model_name, test_names, error_names, path = DEFAULT_PATH, file = DEFAULT_FILE):
+    params_list, errors_list = read_evaluations(model_name, test_names, error_names, path, file)
+    if len(errors_list) == 0:
+        return [], []
+    is_front = get_non_dominated(np.array(errors_list))
+    return [params_list[i] for i in np.where(is_front)[0]], [errors_list[i] for i in np.where(is_front)[0]]
+
+# Gets whether each row of errors is not dominated by another (i.e., no other row is at least as good for all errors and better for one)
+def get_non_dominated(errors_array):
+    errors_array = np.asarray(errors_array, dtype = np.float64)
+    order = np.lexsort(errors_array.T[::-1]) # by the first error, so only earlier rows can dominate
+    is_front = np.zeros(len(errors_array), dtype = bool)
+    front = np.empty((0, errors_array.shape[1]))
+    for i in order:
+        errors = errors_array[i]
+        if np.any(np.all(front <= errors, axis = 1)): # dominated or repeated
+            continue
+        is_front[i] = True
+        front = np.vstack((front, errors))
+    return is_front
@@ -0,0 +1,108 @@
+"""
+ Title: Dataset
+ Description: For parsing workbooks once and caching their columns in binary form
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import os, threading, json
+import numpy as np
+import pandas as pd
+
+# Constants
+CACHE_EXTENSION = '.cache.npz'
+SEPARATOR       = '::' # between the sheet and column names of the cached arrays
+VERSION_KEY     = '__version__' # modified time and size of the cached workbook
+OBJECT_PREFIX   = '__json__' # of the cached arrays of mixed columns (stored as JSON strings, so the cache is loaded without pickle)
+
+# Datasets loaded by this process (keyed by workbook)
+loaded_datasets = {}
+loaded_lock = threading.Lock()
+
+# Class for the columns of a workbook
+class Dataset:
+
+    # Constructor
+    def __init__(self, xlsx_file):
+        self.xlsx_file = xlsx_file
+        self.cache_file = xlsx_file[:-len('.xlsx')] + CACHE_EXTENSION if xlsx_file.endswith('.xlsx') else xlsx_file + CACHE_EXTENSION
+        self.version = None
+        self.columns = {}
+        self.lock = threading.Lock()
+
+    # Loads the columns if the workbook has changed (from the cache if up to date)
+    def load(self):
+        stat = os.stat(self.xlsx_file)
+        version = np.array([stat.st_mtime_ns, stat.st_size], dtype = np.int64)
+        with self.lock:
+            if self.version is not None and np.array_equal(self.version, version):
+                return
+            if not self.load_cache(version):
+                self.parse()
+                self.save_cache(version)
+            self.version = version
+
+    # Loads the columns from the cache (returns whether successful)
+    def load_cache(self, version):
+        try:
+            with np.load(self.cache_file, allow_pickle = False) as cache:
+                if not np.array_equal(cache[VERSION_KEY], version):
+                    return False
+                columns = {}
+                for key in [key for key in cache.files if key != VERSION_KEY]:
+                    if key.startswith(OBJECT_PREFIX):
+                        columns[key[len(OBJECT_PREFIX):]] = np.array([json.loads(value) for value in cache[key]], dtype = object)
+                    else:
+                        columns[key] = cache[key]
+            self.columns = columns
+            return True
+        except (OSError, KeyError, ValueError):
+            return False
+
+    # Parses all the sheets of the workbook at once
+    def parse(self):
+        self.columns = {}
+        sheets = pd.read_excel(io = self.xlsx_file, sheet_name = None)
+        for sheet_name in sheets:
+            for column in sheets[sheet_name].columns:
+                values = sheets[sheet_name][column].dropna().to_numpy()
+                if values.dtype == object:
+                    values = np.array(values.tolist(), dtype = object)
+                self.columns[str(sheet_name) + SEPARATOR + str(column)] = values
+
+    # Saves the columns to the cache (ignored if the directory cannot be written to)
+    def save_cache(self, version):
+        temp_file = self.cache_file + '.' + str(os.getpid()) + '.tmp'
+        try:
+            arrays = {VERSION_KEY: version}
+            for key, values in self.columns.items():
+                if values.dtype == object:
+                    arrays[OBJECT_PREFIX + key] = np.array([json.dumps(value) for value in values.tolist()], dtype = str)
+                else:
+                    arrays[key] = values
+            with open(temp_file, 'wb') as file:
+                np.savez(file, **arrays)
+            os.replace(temp_file, self.cache_file)
+        except (OSError, TypeError, ValueError): # e.g., values that are not numbers or strings
+            if os.path.isfile(temp_file):
+                os.remove(temp_file)
+
+    # Gets a column of data as an array
+    def get_array(self, sheet, column):
+        self.load()
+        key = str(sheet) + SEPARATOR + str(column)
+        if not key in self.columns:
+            raise ValueError('Column \'' + str(column) + '\' does not exist in sheet \'' + str(sheet) + '\' of ' + self.xlsx_file)
+        return self.columns[key]
+
+    # Gets a column of data as a list
+    def read_column(self, sheet, column):
+        return self.get_array(sheet, column).tolist()
+
+# Gets the dataset of a workbook (shared within the process)
+def get_dataset(xlsx_file):
+    with loaded_lock:
+        if not xlsx_file in loaded_datasets:
+            loaded_datasets[xlsx_file] = Dataset(xlsx_file)
+        return loaded_datasets[xlsx_file]
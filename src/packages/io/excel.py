@@ -8,6 +8,7 @@
 # Libraries
 import os
 import pandas as pd
+import packages.io.dataset as dataset
 
 # Constants
 DEFAULT_PATH    = './'
@@ -30,19 +31,16 @@ class Excel:
         sheet = self.sheet if sheet == '' else sheet
         return path, file, sheet
 
-    # Reads a column of data and returns it in the form of a list
+    # Reads a column of data and returns it in the form of a list (the workbook is only parsed once)
     def read_column(self, column, path = '', file = '', sheet = ''):
         path, file, sheet = self.set_default(path, file, sheet)
-        data = pd.read_excel(io = path + file + '.xlsx', sheet_name = sheet, usecols = [column])
-        data = data.dropna()
-        data = data.values.tolist()
-        data = [d[0] for d in data]
+        data = dataset.get_dataset(path + file + '.xlsx').read_column(sheet, column)
         return data
 
     # Reads multuple columns of data
     def read_columns(self, columns, path = '', file = '', sheet = ''):
         path, file, sheet = self.set_default(path, file, sheet)
-        data = [self.read_column(column = column) for column in columns]
+        data = [self.read_column(column = column, path = path, file = file, sheet = sheet) for column in columns]
         data = [[column[i] for column in data] for i in range(0, len(data[0]))]
         return data
 
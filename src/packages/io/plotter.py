@@ -6,6 +6,8 @@
 """
 
 # Libraries
+import matplotlib
+matplotlib.use('Agg') # non-interactive, so plots can be rendered in background processes
 import matplotlib.pyplot as plt
 
 # Constants
@@ -21,26 +23,36 @@ class Plotter:
     def __init__(self, path = DEFAULT_PATH, plot = DEFAULT_PLOT):
         self.path = path
         self.plot = plot
+        self.figure = None
+        self.axes = None
 
-    # Prepares the plot
+    # Prepares the plot (closes the previous figure if unsaved)
     def prep_plot(self, title = '', xlabel = 'x', ylabel = 'y'):
-        plt.figure(figsize=(8,8))
-        plt.xlabel(xlabel, fontsize=20)
-        plt.ylabel(ylabel, fontsize=20)
-        plt.title(title, fontsize=20)
-        
+        self.close_plot()
+        self.figure, self.axes = plt.subplots(figsize=(8,8))
+        self.axes.set_xlabel(xlabel, fontsize=20)
+        self.axes.set_ylabel(ylabel, fontsize=20)
+        self.axes.set_title(title, fontsize=20)
+
     # Plots the experimental data using a scatter plot
     def exp_plot(self, exp_x_data, exp_y_data, colour = EXP_DATA_COLOUR):
         for i in range(0, len(exp_x_data)):
-            plt.scatter(exp_x_data[i], exp_y_data[i], marker='o', color=colour, linewidth=1)
-        
+            self.axes.scatter(exp_x_data[i], exp_y_data[i], marker='o', color=colour, linewidth=1)
+
     # Plots the predicted data using a line plot
     def prd_plot(self, prd_x_data, prd_y_data, colour = PRD_DATA_COLOUR):
         for i in range(0, len(prd_x_data)):
-            plt.plot(prd_x_data[i], prd_y_data[i], colour)
+            self.axes.plot(prd_x_data[i], prd_y_data[i], colour)
 
-    # Saves the plot
+    # Saves the plot (and closes the figure to free its memory)
     def save_plot(self, path = '', plot = ''):
         path = self.path if path == '' else path
         plot = self.plot if plot == '' else plot
-        plt.savefig(path + plot)
\ No newline at end of file
+        self.figure.savefig(path + plot)
+        self.close_plot()
+
+    # Closes the figure of the plot
+    def close_plot(self):
+        if self.figure != None:
+            plt.close(self.figure)
+            self.figure = self.axes = None
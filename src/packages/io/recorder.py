@@ -10,11 +10,14 @@ import time, math
 import numpy as np
 import pandas as pd
 from itertools import zip_longest
+import packages.io.store as store
+import packages.io.stats as stats
+import packages.archive as archive
 
 
 # Constants
-RECORD_INTERVAL = 1
-POPULATION_LIMIT = 50
+RECORD_INTERVAL = 0 # generations between reports (0 to only report at the end)
+POPULATION_LIMIT = archive.CAPACITY
 DEFAULT_PATH = './'
 CURVE_DENSITY = 100
 
@@ -22,7 +25,7 @@ CURVE_DENSITY = 100
 class Recorder:
 
     # Constructor
-    def __init__(self, identifier, model, obj_func, settings, path = DEFAULT_PATH):
+    def __init__(self, identifier, model, obj_func, settings, path = DEFAULT_PATH, progress_connection = None):
 
         # Set up writer
         self.identifier_string = str(identifier).zfill(3) # supports 0-999
@@ -32,7 +35,7 @@ class Recorder:
         # Record settings
         self.model_name = settings['model']
         self.test_names = settings['tests']
-        self.error_names = settings['errors']
+        self.error_names = obj_func.get_error_names() # in the order of the objectives
         self.moga_options = settings['moga']
     
         # Model
@@ -48,59 +51,115 @@ class Recorder:
         self.start_time = time.time()
         self.start_time_str = time.strftime('%A, %D, %H:%M:%S', time.localtime())
         self.num_evals  = 0
+        self.num_skips  = 0
+        self.num_timeouts = 0
         self.num_gens   = 0
-        self.opt_params = []
-        self.opt_errors = []
-
-    # Updates the optimal population
+        self.archive    = archive.Archive(len(model.params), len(self.error_names), POPULATION_LIMIT)
+
+        # Log all evaluations in the background
+        self.store = store.Store(self.path, self.filename)
+        self.stats = stats.Stats()
+        self.stats_filename = 'stats_' + self.identifier_string
+        self.progress_connection = progress_connection # sends the progress to the scheduler
+
+    # Gets the progress of the optimisation (for checkpoints)
+    def get_state(self):
+        return {'num_evals': self.num_evals, 'num_skips': self.num_skips, 'num_timeouts': self.num_timeouts, 'num_gens': self.num_gens, 'archive': self.archive}
+
+    # Restores the progress of the optimisation (and discards the evaluations logged after it)
+    def set_state(self, state):
+        self.num_evals = state['num_evals']
+        self.num_skips = state['num_skips']
+        self.num_timeouts = state.get('num_timeouts', 0) # not in older checkpoints
+        self.num_gens  = state['num_gens']
+        self.archive   = state['archive']
+        self.store.truncate(self.num_evals)
+
+    # Updates the optimal population (i.e., the non-dominated parameters)
     def update_population(self, params, errors):
-        params, errors = list(params), list(errors)
-        error_avg = np.average(errors)
-
-        # If the stored parameters exceed the limit, remove the worst
-        if len(self.opt_params) == POPULATION_LIMIT:
-            if self.opt_errors[-1][-1] < error_avg:
-                return
-            self.opt_params.pop()
-            self.opt_errors.pop()
-        
-        # Adds new params in order
-        inserted = False
-        for i in range(0, len(self.opt_params)):
-            if error_avg < self.opt_errors[i][-1]:
-                self.opt_params.insert(i, params)
-                self.opt_errors.insert(i, errors + [error_avg])
-                inserted = True
-                break
-
-        # If new params is worst between existing params
-        if not inserted:
-            self.opt_params.append(params)
-            self.opt_errors.append(errors + [error_avg])
-
-    # Updates the results after X iterations
-    def update_results(self, params, errors):
-
-        # Updates the population
-        self.update_population(params, errors)
+        self.archive.add(params, errors)
+
+    # Updates the results after each evaluation (with the status of the evaluation)
+    def update_results(self, params, errors, status = store.EVALUATED):
+
+        # Updates the population and logs the evaluation
+        with self.stats.timer('recorder.update_results'):
+            self.update_population(params, errors)
+            self.store.append(params, errors, status)
+        if status == store.TIMED_OUT:
+            self.num_timeouts += 1
 
         # Update optimisation progress
         self.num_evals += 1
-        self.num_gens = (self.num_evals - self.moga_options['init_pop']) / self.moga_options['offspring'] + 1
+        self.update_progress()
+
+    # Updates the progress after individuals are skipped (i.e., not evaluated)
+    def skip_results(self, num_skips):
+        for _ in range(0, num_skips):
+            self.num_skips += 1
+            self.update_progress()
+
+    # Updates the optimisation progress
+    def update_progress(self):
+        self.num_gens = (self.num_evals + self.num_skips - self.moga_options['init_pop']) / self.moga_options['offspring'] + 1
         
-        # Record results after X iterations
-        if self.num_gens > 0 and self.num_gens % RECORD_INTERVAL == 0:
+        # Report progress after each generation and record results after X generations
+        if self.num_gens > 0 and self.num_gens % 1 == 0:
             progress = str(round(self.num_gens)) + '/' + str(self.moga_options['num_gens'])
-            writer = pd.ExcelWriter(self.path + self.filename + '.xlsx', engine='xlsxwriter')
-            self.record_settings(writer)
-            self.record_results(writer)
-            self.record_plot(writer)
-            writer.save()
-            print('[' + self.identifier_string + ']: Recorded results (' + progress + ')')
-            # try:
-            #     print('[' + self.identifier_string + ']: Recorded results (' + progress + ')')
-            # except:
-            #     print('[' + self.identifier_string + ']: Failed to record results (' + progress + ')')
+            print('[' + self.identifier_string + ']: Evaluated generation (' + progress + ')')
+            self.record_stats()
+            self.send_progress()
+            if RECORD_INTERVAL > 0 and self.num_gens % RECORD_INTERVAL == 0:
+                self.record()
+
+    # Records the results in an excel report
+    def record(self):
+        if self.archive.size == 0:
+            return
+        progress = str(round(self.num_gens)) + '/' + str(self.moga_options['num_gens'])
+        writer = pd.ExcelWriter(self.path + self.filename + '.xlsx', engine='xlsxwriter')
+        self.record_settings(writer)
+        self.record_results(writer)
+        self.record_plot(writer)
+        writer.save()
+        print('[' + self.identifier_string + ']: Recorded results (' + progress + ')')
+        if self.model.cache != None:
+            print('[' + self.identifier_string + ']: Curve cache (' + self.model.cache.get_summary() + ')')
+
+    # Finishes logging and records the final results
+    def finish(self):
+        self.store.close()
+        self.record_stats()
+        self.record()
+
+    # Sends the progress to the scheduler (if run by the scheduler)
+    def send_progress(self):
+        if self.progress_connection == None:
+            return
+        time_elapsed = time.time() - self.start_time
+        try:
+            self.progress_connection.send({
+                'generation':       round(self.num_gens),
+                'num_gens':         self.moga_options['num_gens'],
+                'evaluations':      self.num_evals,
+                'skips':            self.num_skips,
+                'timeouts':         self.num_timeouts,
+                'time_elapsed':     time_elapsed,
+                'evals_per_second': self.num_evals / time_elapsed if time_elapsed > 0 else 0,
+                'archive_size':     self.archive.size,
+            })
+        except (BrokenPipeError, OSError):
+            self.progress_connection = None
+
+    # Records a snapshot of the stats
+    def record_stats(self):
+        extra = {'generations': self.num_gens, 'skips': self.num_skips, 'timeouts': self.num_timeouts}
+        if self.model.cache != None:
+            extra['cache'] = {'hits': self.model.cache.hits, 'misses': self.model.cache.misses, 'evictions': self.model.cache.evictions}
+        try:
+            self.stats.write(self.path, self.stats_filename, self.num_evals, extra)
+        except:
+            print('[' + self.identifier_string + ']: Failed to record stats')
 
     # Records the settings
     def record_settings(self, writer):
@@ -129,10 +188,11 @@ class Recorder:
             column_index = settings.columns.get_loc(column)
             sheet.set_column(column_index, column_index, column_length)
 
-    # Records the results
+    # Records the results (non-dominated parameters sorted by average error)
     def record_results(self, writer):
         columns = self.model.params + self.error_names + ['err_avg']
-        data = [self.opt_params[i] + self.opt_errors[i] for i in range(0,len(self.opt_params))]
+        params_array, errors_array = self.archive.get_sorted()
+        data = [list(params_array[i]) + list(errors_array[i]) + [np.average(errors_array[i])] for i in range(0, len(params_array))]
         results = pd.DataFrame(data, columns=columns)
         results.to_excel(writer, 'results', index = False)
 
@@ -140,7 +200,8 @@ class Recorder:
     def record_plot(self, writer):
 
         # Prepare predicted curves
-        prd_x_data, prd_y_data = self.model.get_prd_curves(*self.opt_params[0])
+        best_params, _ = self.archive.get_best()
+        prd_x_data, prd_y_data = self.model.get_prd_curves(*best_params)
         prd_x_flat = [prd_x for prd_x_list in prd_x_data for prd_x in get_thinned_list(prd_x_list)] # flatten
         prd_y_flat = [prd_y for prd_y_list in prd_y_data for prd_y in get_thinned_list(prd_y_list)] # flatten
         
@@ -0,0 +1,81 @@
+"""
+ Title: Stats
+ Description: For timing and counting the phases of an optimisation
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import time, json, os
+from contextlib import contextmanager
+
+# Constants
+DEFAULT_PATH = './'
+DEFAULT_FILE = 'stats'
+
+# Class for the timers and counters of an optimisation
+class Stats:
+
+    # Constructor
+    def __init__(self):
+        self.start_time = time.time()
+        self.timers = {} # name: [calls, seconds]
+        self.counters = {}
+
+    # Adds to the time of a phase
+    def add_time(self, name, seconds, calls = 1):
+        if not name in self.timers:
+            self.timers[name] = [0, 0.0]
+        self.timers[name][0] += calls
+        self.timers[name][1] += seconds
+
+    # Adds to a counter
+    def add_count(self, name, count = 1):
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    # Times a phase
+    @contextmanager
+    def timer(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    # Adds the timers and counters of another process (as returned by pop)
+    def merge(self, stats_dict):
+        for name in stats_dict['timers']:
+            self.add_time(name, stats_dict['timers'][name][1], stats_dict['timers'][name][0])
+        for name in stats_dict['counters']:
+            self.add_count(name, stats_dict['counters'][name])
+
+    # Gets the timers and counters, and resets them
+    def pop(self):
+        stats_dict = {'timers': self.timers, 'counters': self.counters}
+        self.timers, self.counters = {}, {}
+        return stats_dict
+
+    # Gets a snapshot of the timers and counters
+    def get_snapshot(self, num_evals = 0):
+        time_elapsed = time.time() - self.start_time
+        timers = {name: {
+            'calls': self.timers[name][0],
+            'total': self.timers[name][1],
+            'mean':  self.timers[name][1] / self.timers[name][0] if self.timers[name][0] > 0 else 0,
+        } for name in sorted(self.timers)}
+        return {
+            'time_elapsed':     time_elapsed,
+            'evaluations':      num_evals,
+            'evals_per_second': num_evals / time_elapsed if time_elapsed > 0 else 0,
+            'timers':           timers,
+            'counters':         dict(sorted(self.counters.items())),
+        }
+
+    # Writes a snapshot to a file (replaced atomically)
+    def write(self, path = DEFAULT_PATH, file = DEFAULT_FILE, num_evals = 0, extra = {}):
+        snapshot = self.get_snapshot(num_evals)
+        snapshot.update(extra)
+        temp_file = path + file + '.json.tmp'
+        with open(temp_file, 'w') as json_file:
+            json.dump(snapshot, json_file, indent = 2)
+        os.replace(temp_file, path + file + '.json')
@@ -0,0 +1,94 @@
+"""
+ Title: Store
+ Description: For appending evaluations to a binary log (SQLite) from a background thread
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import sqlite3, queue, threading
+import numpy as np
+
+# Constants
+DEFAULT_PATH = './'
+DEFAULT_FILE = 'store'
+BATCH_SIZE   = 1000 # maximum evaluations per transaction
+TIMEOUT      = 60 # seconds to wait for the writer to release the database
+CREATE_TABLE = 'CREATE TABLE IF NOT EXISTS evaluations (eval_num INTEGER PRIMARY KEY, params BLOB, errors BLOB, status INTEGER DEFAULT 0)'
+
+# Statuses of the evaluations
+EVALUATED = 0
+TIMED_OUT = 1 # given the penalty of failed simulations
+
+# Class for storing evaluations
+class Store:
+
+    # Constructor
+    def __init__(self, path = DEFAULT_PATH, file = DEFAULT_FILE):
+        self.db_file = path + file + '.db'
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target = self.write_loop, daemon = True)
+        self.thread.start()
+
+    # Queues an evaluation to be appended
+    def append(self, params, errors, status = EVALUATED):
+        self.queue.put((np.array(params, dtype = np.float64).tobytes(), np.array(errors, dtype = np.float64).tobytes(), status))
+
+    # Removes the evaluations after a number of evaluations (call before appending, e.g., when resuming)
+    def truncate(self, num_evals):
+        connection = sqlite3.connect(self.db_file, timeout = TIMEOUT)
+        create_table(connection)
+        connection.execute('DELETE FROM evaluations WHERE eval_num > ?', (num_evals,))
+        connection.commit()
+        connection.close()
+
+    # Appends the queued evaluations in batches until closed
+    def write_loop(self):
+        connection = sqlite3.connect(self.db_file, timeout = TIMEOUT)
+        create_table(connection)
+        connection.commit()
+        closed = False
+        while not closed:
+
+            # Gets the queued evaluations
+            rows = [self.queue.get()]
+            while len(rows) < BATCH_SIZE and not self.queue.empty():
+                rows.append(self.queue.get())
+            if rows[-1] == None:
+                rows.pop()
+                closed = True
+
+            # Appends the evaluations
+            connection.executemany('INSERT INTO evaluations (params, errors, status) VALUES (?, ?, ?)', rows)
+            connection.commit()
+        connection.close()
+
+    # Writes the remaining evaluations and stops the writer
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+# Creates the table of evaluations (adding the status to tables logged before it)
+def create_table(connection):
+    connection.execute(CREATE_TABLE)
+    columns = [row[1] for row in connection.execute('PRAGMA table_info(evaluations)')]
+    if not 'status' in columns:
+        connection.execute('ALTER TABLE evaluations ADD COLUMN status INTEGER DEFAULT 0')
+
+# Reads the parameters and errors of all the stored evaluations (in order)
+def read_store(path = DEFAULT_PATH, file = DEFAULT_FILE):
+    connection = sqlite3.connect(path + file + '.db')
+    rows = connection.execute('SELECT params, errors FROM evaluations ORDER BY eval_num').fetchall()
+    connection.close()
+    params_list = [list(np.frombuffer(row[0], dtype = np.float64)) for row in rows]
+    errors_list = [list(np.frombuffer(row[1], dtype = np.float64)) for row in rows]
+    return params_list, errors_list
+
+# Reads the statuses of all the stored evaluations (in order)
+def read_statuses(path = DEFAULT_PATH, file = DEFAULT_FILE):
+    connection = sqlite3.connect(path + file + '.db')
+    create_table(connection)
+    rows = connection.execute('SELECT status FROM evaluations ORDER BY eval_num').fetchall()
+    connection.close()
+    return [row[0] for row in rows]
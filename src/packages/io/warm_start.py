@@ -0,0 +1,49 @@
+"""
+ Title: Warm start
+ Description: For reading the parameters of previous optimisations to start a new optimisation from
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import numpy as np
+import packages.io.dataset as dataset
+
+# Constants
+DEFAULT_SHEET   = 'results'
+SHEET_SEPARATOR = ':' # between the workbook and sheet of a source (e.g., 'alloy_617:vp_moga')
+PERTURBATION    = 0.0 # standard deviation of the perturbed copies (relative to the bounds)
+FRACTION        = 1.0 # maximum fraction of the initial population from previous parameters
+
+# Reads the parameters of a source workbook (in the order of the rows)
+def read_params(source, param_names):
+    file, _, sheet = source.partition(SHEET_SEPARATOR)
+    file = file if file.endswith('.xlsx') else file + '.xlsx'
+    sheet = DEFAULT_SHEET if sheet == '' else sheet
+    columns = [dataset.get_dataset(file).get_array(sheet, param_name).astype(np.float64) for param_name in param_names]
+    num_rows = min([len(column) for column in columns])
+    return np.column_stack([column[:num_rows] for column in columns])
+
+# Gets an initial population from previous parameters (topped up with the sampling)
+def get_population(problem, sampling, prior_params, pop_size, perturbation = PERTURBATION, fraction = FRACTION):
+
+    # Keep the unique previous parameters within the bounds
+    prior_params = np.array(prior_params, dtype = np.float64).reshape(-1, problem.n_var)
+    is_valid = np.all(np.isfinite(prior_params), axis = 1) & np.all((prior_params >= problem.xl) & (prior_params <= problem.xu), axis = 1)
+    prior_params = prior_params[is_valid]
+    _, unique_indexes = np.unique(prior_params, axis = 0, return_index = True)
+    prior_params = prior_params[np.sort(unique_indexes)]
+
+    # Fill the warm part of the population with the previous parameters (and perturbed copies if perturbing)
+    num_warm = min(int(round(fraction * pop_size)), pop_size)
+    warm_params = prior_params[:num_warm]
+    if perturbation > 0 and len(prior_params) > 0 and len(warm_params) < num_warm:
+        copy_params = prior_params[np.arange(num_warm - len(warm_params)) % len(prior_params)]
+        copy_params = copy_params + np.random.normal(0, perturbation, copy_params.shape) * (problem.xu - problem.xl)
+        warm_params = np.concatenate((warm_params, np.clip(copy_params, problem.xl, problem.xu)))
+
+    # Top up the population with the sampling
+    if len(warm_params) == pop_size:
+        return warm_params
+    sampled_params = sampling.do(problem, pop_size - len(warm_params)).get('X')
+    return np.concatenate((warm_params, sampled_params))
@@ -0,0 +1,131 @@
+"""
+ Title: Killable pool
+ Description: For running tasks in worker processes that are killed and replaced when a task runs past a timeout
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import time, itertools
+from collections import deque
+from multiprocessing import Process, Pipe
+from multiprocessing.connection import wait
+
+# Statuses of the tasks
+SUCCESS   = 'success'
+TIMED_OUT = 'timed_out'
+CRASHED   = 'crashed' # the worker exited during the task
+
+# Class for a pool of worker processes (one pipe each, so a worker can be killed without affecting the others)
+class KillablePool:
+
+    # Constructor (without an initialiser if none, and without a timeout if none)
+    def __init__(self, num_processes, initializer, initargs, function, timeout):
+        self.initializer = initializer
+        self.initargs = initargs
+        self.function = function
+        self.timeout = timeout
+        self.workers = [self.start_worker() for _ in range(0, num_processes)] # process and connection
+        self.busy = {} # worker index: handle and start time
+        self.queue = deque() # handles and arguments waiting for a worker
+        self.handles = itertools.count()
+        self.results = {} # handle: status and result
+        self.num_replaced = 0
+
+    # Starts a worker process
+    def start_worker(self):
+        connection, child_connection = Pipe()
+        process = Process(target = run_worker, args = (child_connection, self.initializer, self.initargs, self.function), daemon = True)
+        process.start()
+        child_connection.close()
+        return process, connection
+
+    # Kills a worker and starts another in its place
+    def replace_worker(self, index):
+        process, connection = self.workers[index]
+        process.kill()
+        process.join()
+        connection.close()
+        self.workers[index] = self.start_worker()
+        self.num_replaced += 1
+
+    # Queues a task (returns the handle of the task)
+    def submit(self, *args):
+        handle = next(self.handles)
+        self.queue.append((handle, args))
+        self.dispatch()
+        return handle
+
+    # Sends the queued tasks to the free workers
+    def dispatch(self):
+        for index in range(0, len(self.workers)):
+            if len(self.queue) == 0:
+                return
+            if index in self.busy:
+                continue
+            handle, args = self.queue.popleft()
+            try:
+                self.workers[index][1].send(args)
+            except (BrokenPipeError, OSError):
+                self.replace_worker(index)
+                self.workers[index][1].send(args)
+            self.busy[index] = (handle, time.time())
+
+    # Waits for at least one of the tasks to finish (returns the handles, statuses and results of the finished tasks)
+    def wait(self, handles):
+        while not any([handle in self.results for handle in handles]):
+
+            # Receive the results of the workers until the earliest deadline
+            deadline = min([start_time for _, start_time in self.busy.values()]) + self.timeout if self.timeout != None else None
+            connections = {self.workers[index][1]: index for index in self.busy}
+            for connection in wait(list(connections.keys()), max(0, deadline - time.time()) if deadline != None else None):
+                index = connections[connection]
+                try:
+                    self.results[self.busy[index][0]] = (SUCCESS, connection.recv())
+                except (EOFError, OSError):
+                    self.results[self.busy[index][0]] = (CRASHED, None)
+                    self.replace_worker(index)
+                del self.busy[index]
+
+            # Replace the workers of the tasks past the timeout
+            for index, (handle, start_time) in list(self.busy.items()):
+                if self.timeout != None and time.time() - start_time >= self.timeout:
+                    self.results[handle] = (TIMED_OUT, None)
+                    self.replace_worker(index)
+                    del self.busy[index]
+            self.dispatch()
+
+        # Remove the finished tasks
+        done_handles = [handle for handle in handles if handle in self.results]
+        return [(handle, *self.results.pop(handle)) for handle in done_handles]
+
+    # Cancels tasks (dropping the queued tasks, and killing and replacing the workers of the running tasks)
+    def cancel(self, handles):
+        handles = set(handles)
+        self.queue = deque([(handle, args) for handle, args in self.queue if not handle in handles])
+        for index, (handle, _) in list(self.busy.items()):
+            if handle in handles:
+                self.replace_worker(index)
+                del self.busy[index]
+        for handle in handles:
+            self.results.pop(handle, None)
+        self.dispatch()
+
+    # Stops the workers
+    def shutdown(self):
+        for process, connection in self.workers:
+            process.kill()
+            process.join()
+            connection.close()
+        self.workers = []
+
+# Runs the tasks sent to a worker process until the pipe is closed
+def run_worker(connection, initializer, initargs, function):
+    if initializer != None:
+        initializer(*initargs)
+    while True:
+        try:
+            args = connection.recv()
+        except EOFError:
+            return
+        connection.send(function(*args))
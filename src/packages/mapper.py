@@ -1,69 +1,94 @@
 """
  Title: Mapper functions
- Description: Functions for linearly mapping values within intervals to 0 and 1
+ Description: Functions for mapping values within intervals to 0 and 1 (linearly or logarithmically)
  Author: Janzen Choi
 
 """
 
+# Libraries
+import numpy as np
+
 # Mapped bounds
 MAP_LOWER = 0
 MAP_UPPER = 1
 
-# Mapper class (to minimise evaluations)
+# Scales
+LINEAR     = 'linear'
+LOG        = 'log'
+LOG_OFFSET = 1e-6 # fraction of the interval added before taking the logarithm (so the lower bound can be zero)
+
+# Mapper class (to minimise evaluations; maps the lower bound to the upper mapped bound and vice versa)
 class Mapper:
-    
-    # Constructor
-    def __init__(self, lower, upper, map_lower, map_upper):
-        self.lower = lower
-        self.upper = upper
+
+    # Constructor (the bounds and scales can be arrays, to map each dimension of an array)
+    def __init__(self, lower, upper, map_lower, map_upper, scale = LINEAR):
+        self.lower = np.array(lower, dtype = np.float64)
+        self.upper = np.array(upper, dtype = np.float64)
         self.map_lower = map_upper
         self.map_upper = map_lower
-        self.gradient = (self.map_upper - self.map_lower) / (upper - lower)
-        self.intercept = (upper * self.map_lower - lower * self.map_upper) / (upper - lower)
-
-    # Linearly maps a value (and sets them to the mapped bounds if exceeds expected bounds)
-    def map(self, unmapped_value):
-        if unmapped_value < self.lower:
-            return self.map_lower
-        elif unmapped_value > self.upper:
-            return self.map_upper
-        else:
-            return self.gradient * unmapped_value + self.intercept
-
-    # Linearly unmaps a value
-    def unmap(self, mapped_value):
-        return (mapped_value - self.intercept) / self.gradient
+        self.is_log = np.array(scale) == LOG
+        self.offset = LOG_OFFSET * (self.upper - self.lower)
+        scaled_lower, scaled_upper = self.scale(self.lower), self.scale(self.upper)
+        self.gradient = (self.map_upper - self.map_lower) / (scaled_upper - scaled_lower)
+        self.intercept = (scaled_upper * self.map_lower - scaled_lower * self.map_upper) / (scaled_upper - scaled_lower)
+
+    # Scales values (logarithmically for the log dimensions)
+    def scale(self, values):
+        shifted_values = np.where(self.is_log, np.maximum(values - self.lower + self.offset, self.offset), 1)
+        return np.where(self.is_log, np.log(shifted_values), values)
+
+    # Unscales values
+    def unscale(self, scaled_values):
+        return np.where(self.is_log, np.exp(np.where(self.is_log, scaled_values, 0)) + self.lower - self.offset, scaled_values)
+
+    # Maps values (and sets them to the mapped bounds if exceeds expected bounds)
+    def map(self, unmapped_values):
+        unmapped_values = np.asarray(unmapped_values, dtype = np.float64)
+        mapped_values = self.gradient * self.scale(unmapped_values) + self.intercept
+        mapped_values = np.clip(mapped_values, min(self.map_lower, self.map_upper), max(self.map_lower, self.map_upper))
+        mapped_values = np.where(unmapped_values < self.lower, self.map_lower, mapped_values)
+        return to_output(np.where(unmapped_values > self.upper, self.map_upper, mapped_values))
+
+    # Unmaps values (within the bounds)
+    def unmap(self, mapped_values):
+        scaled_values = (np.asarray(mapped_values, dtype = np.float64) - self.intercept) / self.gradient
+        return to_output(np.clip(self.unscale(scaled_values), self.lower, self.upper))
 
 # Mapper class for parameters
 class ParameterMapper:
-    
+
     # Constructor
-    def __init__(self, params_lower, params_upper):
-        self.mappers = [Mapper(params_lower[i], params_upper[i], MAP_LOWER, MAP_UPPER) for i in range(0, len(params_lower))]
+    def __init__(self, params_lower, params_upper, scales = None):
+        scales = [LINEAR] * len(params_lower) if scales == None else scales
+        self.mapper = Mapper(params_lower, params_upper, MAP_LOWER, MAP_UPPER, scales)
 
-    # Linearly maps a list of parameters
+    # Maps a list of parameters (each row is a set of parameters)
     def map(self, unmapped_params_list):
-        mapped_params_list = [[self.mappers[i].map(params[i]) for i in range(0, len(params))] for params in unmapped_params_list]
-        return mapped_params_list
+        return np.asarray(self.mapper.map(unmapped_params_list)).tolist()
 
-    # Linearly unmaps a list of parameters
+    # Unmaps a list of parameters
     def unmap(self, mapped_params_list):
-        unmapped_params_list = [[self.mappers[i].unmap(params[i]) for i in range(0, len(params))] for params in mapped_params_list]
-        return unmapped_params_list
+        return np.asarray(self.mapper.unmap(mapped_params_list)).tolist()
 
 # Mapper for strain data
 class StrainMapper:
-    
+
     # Constructor
-    def __init__(self, strain_lower, strain_upper):
-        self.mapper = Mapper(strain_lower, strain_upper, MAP_LOWER, MAP_UPPER)
-    
-    # Linearly maps a 2D list of strain values
+    def __init__(self, strain_lower, strain_upper, scale = LINEAR):
+        self.mapper = Mapper(strain_lower, strain_upper, MAP_LOWER, MAP_UPPER, scale)
+
+    # Maps a 2D list of strain values (each list at once if their sizes differ)
     def map(self, unmapped_2D_strain_list):
-        mapped_2D_strain_list = [[self.mapper.map(strain) for strain in strain_list] for strain_list in unmapped_2D_strain_list]
-        return mapped_2D_strain_list
-    
-    # Linearly unmaps a 2D list of strain values
+        if len(set([len(strain_list) for strain_list in unmapped_2D_strain_list])) > 1:
+            return [np.asarray(self.mapper.map(strain_list)).tolist() for strain_list in unmapped_2D_strain_list]
+        return np.asarray(self.mapper.map(unmapped_2D_strain_list)).tolist()
+
+    # Unmaps a 2D list of strain values
     def unmap(self, mapped_2D_strain_list):
-        unmapped_2D_strain_list = [[self.mapper.map(strain) for strain in strain_list] for strain_list in mapped_2D_strain_list]
-        return unmapped_2D_strain_list
\ No newline at end of file
+        if len(set([len(strain_list) for strain_list in mapped_2D_strain_list])) > 1:
+            return [np.asarray(self.mapper.unmap(strain_list)).tolist() for strain_list in mapped_2D_strain_list]
+        return np.asarray(self.mapper.unmap(mapped_2D_strain_list)).tolist()
+
+# Converts mapped values to a float if a single value was mapped (or keeps the array)
+def to_output(values):
+    return float(values) if np.ndim(values) == 0 else values
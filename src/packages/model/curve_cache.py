@@ -0,0 +1,59 @@
+"""
+ Title: Curve Cache
+ Description: For memoising the predicted curves of recently simulated parameters
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import numpy as np
+from collections import OrderedDict
+
+# Constants
+MAX_SIZE  = 1000
+PRECISION = None # number of significant figures to quantise the parameters to (None for exact)
+
+# Least recently used (LRU) cache of predicted curves
+class CurveCache:
+
+    # Constructor
+    def __init__(self, max_size = MAX_SIZE, precision = PRECISION):
+        self.max_size = max_size
+        self.precision = precision
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Gets the key of a set of parameters and stresses
+    def get_key(self, params, stresses):
+        params = [float(param) for param in params]
+        if self.precision != None:
+            params = [float('{:.{}g}'.format(param, self.precision)) for param in params]
+        return tuple(params), tuple(stresses)
+
+    # Gets the cached curves (or None if not cached)
+    def get(self, params, stresses):
+        key = self.get_key(params, stresses)
+        if not key in self.cache:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.cache.move_to_end(key)
+        prd_x_data, prd_y_data = self.cache[key]
+        return [list(prd_x_list) for prd_x_list in prd_x_data], [list(prd_y_list) for prd_y_list in prd_y_data]
+
+    # Caches the curves (stored as arrays to save memory) and removes the least recently used
+    def put(self, params, stresses, prd_x_data, prd_y_data):
+        key = self.get_key(params, stresses)
+        self.cache[key] = ([np.array(prd_x_list) for prd_x_list in prd_x_data], [np.array(prd_y_list) for prd_y_list in prd_y_data])
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last = False)
+            self.evictions += 1
+
+    # Gets a summary of the cache counters
+    def get_summary(self):
+        num_lookups = self.hits + self.misses
+        hit_rate = round(100 * self.hits / num_lookups, 1) if num_lookups > 0 else 0
+        return 'hits=' + str(self.hits) + ', misses=' + str(self.misses) + ', evictions=' + str(self.evictions) + ', hit rate=' + str(hit_rate) + '%'
@@ -7,6 +7,9 @@
 
 # Libraries
 from neml import models, elasticity, drivers, surfaces, hardening, visco_flow, general_flow, damage
+import packages.model.curve_cache as curve_cache
+import packages.killable_pool as killable_pool
+import packages.io.stats as stats
 
 # Constants
 YOUNGS       = 157000.0
@@ -16,20 +19,48 @@ E_RATE       = 1.0e-4
 HOLD         = 11500.0 * 3600.0
 NUM_STEPS    = 501
 MIN_DATA     = 50
+SCREEN_STEPS = 101 # number of steps for the low fidelity screening
+ENVELOPE     = 2.0 # factor of the experimental end time / strain past which curves are rejected when screening
 PARAMS       = ['s0', 'R', 'd', 'n', 'eta', 'A', 'xi', 'phi']
 L_BNDS       = [0.0e1, 0.0e1, 0.0e1, 0.0e1, 0.0e1, 0.0e1, 0.0e1, 0.0e1]
 U_BNDS       = [1.0e2, 1.0e2, 1.0e1, 1.0e1, 1.0e4, 1.0e10, 1.0e1, 1.0e1]
+SCALES       = ['linear', 'linear', 'linear', 'linear', 'log', 'log', 'linear', 'linear'] # of the search space
+STRESS_PROCESSES = 1 # processes simulating the stresses of one evaluation concurrently (1 to simulate them in turn)
+
+# Statuses of the simulation of a stress
+SUCCESS      = 'success'
+FAILURE      = 'failure'
+SHORT_CURVE  = 'short_curve'
 
 # The Visco-Plastic model class
 class ViscoPlastic:
 
     # Constructor
-    def __init__(self, stresses):
+    def __init__(self, stresses, cache_size = 0, cache_precision = None, stress_processes = STRESS_PROCESSES):
         self.name = 'visco_plastic'
         self.params = PARAMS
         self.l_bnds = L_BNDS
         self.u_bnds = U_BNDS
+        self.scales = SCALES
         self.stresses = stresses
+        self.cache = curve_cache.CurveCache(cache_size, cache_precision) if cache_size > 0 else None
+        self.x_envelopes = None
+        self.y_envelopes = None
+        self.stats = stats.Stats()
+        self.stress_processes = stress_processes
+        self.stress_pool = None
+
+    # Excludes the pool of processes when copied to other processes (which are already workers, so simulate the stresses in turn)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['stress_pool'] = None
+        state['stress_processes'] = 1
+        return state
+
+    # Enables the low fidelity screening of the parameters (within an envelope of the experimental curves)
+    def set_screen(self, exp_x_data, exp_y_data, envelope = ENVELOPE):
+        self.x_envelopes = [max(exp_x_list) * envelope for exp_x_list in exp_x_data]
+        self.y_envelopes = [max(exp_y_list) * envelope for exp_y_list in exp_y_data]
 
     # Creates the model
     def get_elvpdm_model(self, s0, R, d, n, eta, A, xi, phi):
@@ -43,29 +74,117 @@ class ViscoPlastic:
         elvpdm_model  = damage.ModularCreepDamageModel_sd(elastic_model, A, xi, phi, damage.VonMisesEffectiveStress(), elvp_model, verbose=False)
         return elvpdm_model
     
-    # Gets the predicted curves
+    # Gets the predicted curves (from the cache if previously simulated)
     def get_prd_curves(self, s0, R, d, n, eta, A, xi, phi):
+        if self.cache == None:
+            return self.simulate_prd_curves(s0, R, d, n, eta, A, xi, phi)
+        params = [s0, R, d, n, eta, A, xi, phi]
+        cached_curves = self.cache.get(params, self.stresses)
+        if cached_curves != None:
+            return cached_curves
+        prd_x_data, prd_y_data = self.simulate_prd_curves(s0, R, d, n, eta, A, xi, phi)
+        self.cache.put(params, self.stresses, prd_x_data, prd_y_data)
+        return prd_x_data, prd_y_data
+
+    # Simulates the predicted curves
+    def simulate_prd_curves(self, s0, R, d, n, eta, A, xi, phi):
         
-        # Gets the elastic, visco-plastic, damage model
-        elvpdm_model = self.get_elvpdm_model(s0, R, d, n, eta, A, xi, phi)
+        # Only simulate the parameters that pass the low fidelity screening (if enabled, with the model reused for the full simulation)
+        params = [s0, R, d, n, eta, A, xi, phi]
+        elvpdm_model = None
+        if self.x_envelopes != None:
+            with self.stats.timer('model.build'):
+                elvpdm_model = self.get_elvpdm_model(*params)
+            with self.stats.timer('model.screen'):
+                passed = self.passes_screen(elvpdm_model)
+            if not passed:
+                return [], []
+
+        # Simulates the stresses concurrently (if enabled)
+        if self.stress_processes > 1 and len(self.stresses) > 1:
+            return self.simulate_concurrently(params)
+
+        # Gets the elastic, visco-plastic, damage model (if not built for the screening)
+        if elvpdm_model == None:
+            with self.stats.timer('model.build'):
+                elvpdm_model = self.get_elvpdm_model(*params)
         
-        # Gets the predicted curves
+        # Gets the predicted curves (stops at the first failed stress)
         prd_x_data, prd_y_data = [], []
         for i in range(0,len(self.stresses)):
-            
-            # Get predictions
-            try:
-                creep_results = drivers.creep(elvpdm_model, self.stresses[i], S_RATE, HOLD, verbose=False, check_dmg=False, dtol=0.95, nsteps_up=150, nsteps=NUM_STEPS, logspace=False)
-            except:
-                return [], []
-            prd_x_list = list(creep_results['rtime'] / 3600)
-            prd_y_list = list(creep_results['rstrain'])
-            
-            # Make sure predictions contain more than MIN_DATA data points
-            if len(prd_x_list) <= MIN_DATA or len(prd_y_list) <= MIN_DATA:
+            with self.stats.timer('model.creep.' + str(self.stresses[i])):
+                status, prd_x_list, prd_y_list = simulate_stress(elvpdm_model, self.stresses[i])
+            if status != SUCCESS:
+                self.stats.add_count('model.failures' if status == FAILURE else 'model.short_curves')
                 return [], []
             prd_x_data.append(prd_x_list)
             prd_y_data.append(prd_y_list)
 
         # Returns it
-        return prd_x_data, prd_y_data
\ No newline at end of file
+        return prd_x_data, prd_y_data
+
+    # Simulates each stress in a separate process (returns as soon as one stress fails, killing the simulations of the other stresses)
+    def simulate_concurrently(self, params):
+        if self.stress_pool == None:
+            self.stress_pool = killable_pool.KillablePool(self.stress_processes, None, (), simulate_params, None)
+        with self.stats.timer('model.creep.concurrent'):
+            handles = {self.stress_pool.submit(params, stress): i for i, stress in enumerate(self.stresses)}
+            prd_x_data, prd_y_data = [None] * len(self.stresses), [None] * len(self.stresses)
+            remaining_handles = list(handles.keys())
+            while len(remaining_handles) > 0:
+                for handle, pool_status, result in self.stress_pool.wait(remaining_handles):
+                    remaining_handles.remove(handle)
+                    status, prd_x_list, prd_y_list = result if pool_status == killable_pool.SUCCESS else (FAILURE, [], [])
+                    if status != SUCCESS:
+                        self.stress_pool.cancel(remaining_handles)
+                        self.stats.add_count('model.failures' if status == FAILURE else 'model.short_curves')
+                        return [], []
+                    prd_x_data[handles[handle]] = prd_x_list
+                    prd_y_data[handles[handle]] = prd_y_list
+        return prd_x_data, prd_y_data
+
+    # Stops the processes simulating the stresses
+    def stop(self):
+        if self.stress_pool != None:
+            self.stress_pool.shutdown()
+            self.stress_pool = None
+
+    # Checks whether a model produces curves within the envelope at a low fidelity
+    def passes_screen(self, elvpdm_model):
+        self.stats.add_count('model.screened')
+        for i in range(0,len(self.stresses)):
+
+            # Get predictions until the end of the envelope
+            hold = min(HOLD, self.x_envelopes[i] * 3600)
+            try:
+                creep_results = drivers.creep(elvpdm_model, self.stresses[i], S_RATE, hold, verbose=False, check_dmg=False, dtol=0.95, nsteps_up=150, nsteps=SCREEN_STEPS, logspace=False)
+            except:
+                self.stats.add_count('model.rejections')
+                return False
+
+            # Reject if the curve fails, has not ruptured within the envelope (i.e., was held for all the steps of the capped hold, since the
+            # rupture time excludes the loading) or strains past the envelope (curves are only rejected by time if the envelope ends before HOLD)
+            if (len(creep_results['rtime']) <= MIN_DATA
+            or (hold < HOLD and len(creep_results['rtime']) >= SCREEN_STEPS - 1)
+            or max(creep_results['rstrain']) > self.y_envelopes[i]):
+                self.stats.add_count('model.rejections')
+                return False
+        return True
+
+# Simulates the curve of a stress (returns the status and the curve)
+def simulate_stress(elvpdm_model, stress):
+    try:
+        creep_results = drivers.creep(elvpdm_model, stress, S_RATE, HOLD, verbose=False, check_dmg=False, dtol=0.95, nsteps_up=150, nsteps=NUM_STEPS, logspace=False)
+    except:
+        return FAILURE, [], []
+    prd_x_list = list(creep_results['rtime'] / 3600)
+    prd_y_list = list(creep_results['rstrain'])
+
+    # Make sure predictions contain more than MIN_DATA data points
+    if len(prd_x_list) <= MIN_DATA or len(prd_y_list) <= MIN_DATA:
+        return SHORT_CURVE, [], []
+    return SUCCESS, prd_x_list, prd_y_list
+
+# Builds the model and simulates the curve of a stress within a process of the pool
+def simulate_params(params, stress):
+    return simulate_stress(ViscoPlastic([stress]).get_elvpdm_model(*params), stress)
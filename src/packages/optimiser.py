@@ -11,19 +11,29 @@ import packages.io.recorder as recorder
 import packages.model.visco_plastic as visco_plastic
 import packages.error.objective as objective
 import packages.genetic_algorithm as genetic_algorithm
+import packages.io.stats as stats
+import packages.io.warm_start as warm_start
+import packages.io.database as database
+import numpy as np
 from threading import Thread
 
+# Constants
+CHECKPOINT_PREFIX = 'checkpoint_'
+DATABASE_FILE     = database.DEFAULT_FILE # shared by all the optimisations of the record path
+
 # For conducting the optimisation
 class Optimiser(Thread):
 
     # Constructor
-    def __init__(self, settings, identifier, data_path = './', data_file = 'data', record_path = './'):
+    def __init__(self, settings, identifier, data_path = './', data_file = 'data', record_path = './', progress_connection = None, broker_authkey = None):
         Thread.__init__(self)
         self.settings = settings
         self.identifier = identifier
         self.data_path = data_path
         self.data_file = data_file
         self.record_path = record_path
+        self.progress_connection = progress_connection
+        self.broker_authkey = broker_authkey
 
     # Starts the optimisation
     def run(self):
@@ -42,19 +52,58 @@ class Optimiser(Thread):
 
         # Define model
         available_models = [
-            visco_plastic.ViscoPlastic(exp_stresses)
+            visco_plastic.ViscoPlastic(exp_stresses, self.settings['cache_size'], self.settings['cache_precision'], self.settings['stress_processes'])
         ]
         model = [available_model for available_model in available_models if available_model.name == model_name][0]
+        if self.settings['screen']:
+            model.set_screen(exp_x_data, exp_y_data)
 
         # Define optimiser
-        obj_func = objective.Objective(error_names, exp_x_data, exp_y_data)
-        moga = genetic_algorithm.MOGA(model, obj_func, moga_options['num_gens'], moga_options['init_pop'], moga_options['offspring'], moga_options['crossover'], moga_options['mutation'])
+        obj_func = objective.Objective(error_names, exp_x_data, exp_y_data, test_names)
+        moga = genetic_algorithm.MOGA(model, obj_func, moga_options['num_gens'], moga_options['init_pop'], moga_options['offspring'], moga_options['crossover'], moga_options['mutation'], moga_options['num_processes'], moga_options['surrogate'], moga_options['normalise'], moga_options['distributed'], moga_options['asynchronous'], moga_options['timeout'], moga_options['num_components'], self.broker_authkey)
+
+        # Start from the parameters of previous optimisations (if any)
+        prior_params_list = []
+        for source in moga_options['warm_start']:
+            try:
+                prior_params_list.append(warm_start.read_params(source, model.params))
+            except (OSError, ValueError):
+                print('[' + str(self.identifier).zfill(3) + ']: Could not read parameters to warm start from (' + source + ')')
+        if len(prior_params_list) > 0:
+            moga.set_warm_start(np.concatenate(prior_params_list), moga_options['perturbation'], moga_options['warm_fraction'])
 
         # Define recorder
-        rec = recorder.Recorder(self.identifier, model, obj_func, self.settings, path = self.record_path)
+        rec = recorder.Recorder(self.identifier, model, obj_func, self.settings, path = self.record_path, progress_connection = self.progress_connection)
         moga.set_recorder(rec)
 
+        # Share the stats of the run
+        run_stats = stats.Stats()
+        model.stats = obj_func.stats = rec.stats = run_stats
+        moga.set_stats(run_stats)
+
+        # Look up the evaluations of previous optimisations (and add the evaluations of this one, without the failures if screening, since rejections depend on the envelopes)
+        if self.settings['database']:
+            db = database.Database(model, obj_func, test_names, self.identifier, self.record_path, DATABASE_FILE, self.settings['cache_precision'], self.settings['database_curves'], not self.settings['screen'])
+            moga.set_database(db)
+
+        # Periodically save the state of the optimisation (and restore it if resuming)
+        moga.set_checkpoint(get_checkpoint_file(self.record_path, self.identifier), moga_options['checkpoint_interval'], {'settings': self.settings})
+        if self.settings['resume']:
+            moga.load_checkpoint()
+            print('[' + str(self.identifier).zfill(3) + ']: Resumed optimisation (' + str(round(rec.num_gens)) + '/' + str(moga_options['num_gens']) + ')')
+
         # Conducts the optimisation
         print('[' + str(self.identifier).zfill(3) + ']: Commenced optimisation')
         moga.optimise()
-        print('[' + str(self.identifier).zfill(3) + ']: Finished optimisation')
\ No newline at end of file
+        print('[' + str(self.identifier).zfill(3) + ']: Finished optimisation')
+
+# Gets the checkpoint file of an optimisation
+def get_checkpoint_file(record_path, identifier):
+    return record_path + CHECKPOINT_PREFIX + str(identifier).zfill(3) + '.pkl'
+
+# Reads the settings of a checkpointed optimisation (none if there is no checkpoint)
+def read_checkpoint_settings(record_path, identifier):
+    try:
+        return genetic_algorithm.read_checkpoint(get_checkpoint_file(record_path, identifier))['extra']['settings']
+    except (OSError, EOFError, KeyError):
+        return None
\ No newline at end of file
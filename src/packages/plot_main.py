@@ -7,9 +7,11 @@
 
 # Libraries
 import time
+from concurrent.futures import ProcessPoolExecutor
 import packages.io.excel as excel
 import packages.model.visco_plastic as visco_plastic
 import packages.io.plotter as plotter
+import packages.scheduler as scheduler
 
 # Geneal Constants
 DATA_PATH = './'
@@ -19,10 +21,17 @@ PLOT_FILE = 'result_plot'
 SHEET_NAME = 'vp_moga'
 
 # Plot selection
-PLOT_TEST_SET       = 23
+PLOT_TEST_SETS      = [23] # none to plot all the test sets of the sheet
 ALL_TEST_NAMES      = ['G32', 'G33', 'G44', 'G25']
 TRAIN_TEST_NAMES    = ['G32', 'G25']
 
+# Simulation constants
+NUM_PROCESSES       = scheduler.get_num_cpus()
+CHUNK_SIZE          = 1
+
+# Model of the worker process (set by the initialiser)
+worker_model = None
+
 def main():
 
     # Initialisation
@@ -36,31 +45,45 @@ def main():
     exp_stresses = xl.read_included('stress', ALL_TEST_NAMES)
     print('The experimental data for ' + str(len(ALL_TEST_NAMES)) + ' test(s) has been read!')
 
-    # Prepare model and plotter
+    # Get parameters of the selected test sets
     model = visco_plastic.ViscoPlastic(exp_stresses)
-    pt = plotter.Plotter(path = PLOT_PATH, plot = PLOT_FILE + '_' + str(PLOT_TEST_SET))
-    pt.prep_plot(title = 'Creep at 800°C', xlabel = 'Time (h)', ylabel = 'Creep Strain (%)')
-    pt.exp_plot(exp_x_data, exp_y_data)
-
-
-    # Get parameters
-    params_include_list = xl.read_column(column = 'test_set', sheet = SHEET_NAME)
+    params_include_list = [int(test_set) for test_set in xl.read_column(column = 'test_set', sheet = SHEET_NAME)]
     params_list = [xl.read_column(column = param, sheet = SHEET_NAME) for param in model.params]
     params_list = [[params[i] for params in params_list] for i in range(0, len(params_list[0]))] # transpose
-    params_list = [params_list[i] for i in range(0, len(params_list)) if int(params_include_list[i]) == PLOT_TEST_SET]
-
-    # Conduct predictions
-    for params in params_list:
-        prd_x_data, prd_y_data = model.get_prd_curves(*params)
-        for i in range(0, len(prd_x_data)):
-            if ALL_TEST_NAMES[i] in TRAIN_TEST_NAMES:
-                pt.prd_plot([prd_x_data[i]], [prd_y_data[i]], 'b')
-            else:
-                pt.prd_plot([prd_x_data[i]], [prd_y_data[i]], 'r')
-
-    # Save plot and end
-    pt.save_plot()
+    test_sets = sorted(set(params_include_list)) if PLOT_TEST_SETS == None else PLOT_TEST_SETS
+    indexes = [i for i in range(0, len(params_list)) if params_include_list[i] in test_sets]
+
+    # Conduct predictions of all the test sets at once
+    with ProcessPoolExecutor(max_workers = NUM_PROCESSES, initializer = init_worker, initargs = (model,)) as pool:
+        prd_curves_list = list(pool.map(simulate, [params_list[i] for i in indexes], chunksize = CHUNK_SIZE))
+    print('The curves of ' + str(len(indexes)) + ' parameter set(s) have been simulated!')
+
+    # Plot each test set (one figure at a time)
+    pt = plotter.Plotter(path = PLOT_PATH)
+    for test_set in test_sets:
+        pt.prep_plot(title = 'Creep at 800°C', xlabel = 'Time (h)', ylabel = 'Creep Strain (%)')
+        pt.exp_plot(exp_x_data, exp_y_data)
+        for index, (prd_x_data, prd_y_data) in zip(indexes, prd_curves_list):
+            if params_include_list[index] != test_set:
+                continue
+            for i in range(0, len(prd_x_data)):
+                if ALL_TEST_NAMES[i] in TRAIN_TEST_NAMES:
+                    pt.prd_plot([prd_x_data[i]], [prd_y_data[i]], 'b')
+                else:
+                    pt.prd_plot([prd_x_data[i]], [prd_y_data[i]], 'r')
+        pt.save_plot(plot = PLOT_FILE + '_' + str(test_set))
+
+    # End
     print('Program finished on ' + time.strftime('%A, %D, %H:%M:%S', time.localtime()) + ' in ' + str(round(time.time()-start_time)) + ' seconds!')
 
+# Initialises the model of a worker process
+def init_worker(model):
+    global worker_model
+    worker_model = model
+
+# Simulates the curves of a set of parameters
+def simulate(params):
+    return worker_model.get_prd_curves(*params)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -11,6 +11,9 @@ import numpy as np
 # General constants
 DEFAULT_POLY_DEG        = 15
 DEFAULT_NUM_POINTS      = 100
+DEFAULT_BASIS           = 'power' # coefficients of np.polyfit (in x)
+BASES                   = ['power', 'chebyshev', 'legendre'] # chebyshev / legendre are fitted over [0, x_end]
+MAX_CACHED_GRIDS        = 1000 # pseudo-inverses of design matrices kept per polyfier
 
 # Constants for invalid values
 DEFAULT_UPPER_BOUND     = 15000
@@ -21,9 +24,14 @@ DEFAULT_INVALID_VALUE   = 0
 class Polyfier:
 
     # Constructor
-    def __init__(self, poly_deg = DEFAULT_POLY_DEG, num_points = DEFAULT_NUM_POINTS):
+    def __init__(self, poly_deg = DEFAULT_POLY_DEG, num_points = DEFAULT_NUM_POINTS, basis = DEFAULT_BASIS):
+        if not basis in BASES:
+            raise ValueError('Basis \'' + str(basis) + '\' is not one of ' + str(BASES))
         self.poly_deg = poly_deg
         self.num_points = num_points
+        self.basis = basis
+        self.pinv_cache = {} # x values: pseudo-inverse of the scaled design matrix, column scales
+        self.x_array = np.array(self.get_x_list(round(DEFAULT_UPPER_BOUND / DEFAULT_STEP_SIZE)), dtype = np.float64)
 
     # Gets a list of stretched x values
     def get_stretched_x_list(self, x_end):
@@ -32,14 +40,13 @@ class Polyfier:
 
     # Converts a list of values into a polynomial
     def curve_to_polynomial(self, x_list, y_list):
-        x_end = max(x_list)
-        polynomial = list(np.polyfit(x_list, y_list, self.poly_deg))
-        return x_end, polynomial
+        x_end_array, coeffs_array = self.curves_to_polynomials([x_list], [y_list])
+        return x_end_array[0], list(coeffs_array[0])
 
     # Converts a polynomial into stretched x and y lists
     def polynomial_to_stretched_curve(self, x_end, polynomial):
         x_list = self.get_stretched_x_list(x_end)
-        y_list = list(np.polyval(polynomial, x_list))
+        y_list = list(self.evaluate(np.array([polynomial], dtype = np.float64), np.array([x_end], dtype = np.float64), x_list)[0])
         return x_list, y_list
 
     # Gets a list of x values
@@ -49,27 +56,91 @@ class Polyfier:
 
     # Converts a polynomial into x and y lists with invalid values
     def polynomial_to_curve(self, x_end, polynomial):
-        
-        # Gets the valid points
-        max_points = round(DEFAULT_UPPER_BOUND / DEFAULT_STEP_SIZE)
-        num_valid_points = min(round(x_end / DEFAULT_STEP_SIZE), max_points)
-        x_list = self.get_x_list(num_valid_points)
-        y_list = list(np.polyval(polynomial, x_list))
-        
-        # Gets the invalid points
-        num_invalid_points = round(DEFAULT_UPPER_BOUND / DEFAULT_STEP_SIZE) - num_valid_points
-        x_list = self.get_x_list(num_valid_points + num_invalid_points)
-        y_list += [DEFAULT_INVALID_VALUE] * num_invalid_points
-        
-        # Return lists
-        return x_list, y_list
-    
+        x_array, y_array = self.polynomials_to_curves([x_end], [polynomial])
+        return self.get_x_list(len(x_array)), list(y_array[0])
+
     # Converts a list of x and y lists of any size into ones with the set step size
     def curves_to_curves(self, x_data, y_data):
-        new_x_data, new_y_data = [], []
-        for i in range(0, len(x_data)):
-            x_end, polynomial = self.curve_to_polynomial(x_data[i], y_data[i])
-            x_list, y_list = self.polynomial_to_curve(x_end, polynomial)
-            new_x_data.append(x_list)
-            new_y_data.append(y_list)
-        return new_x_data, new_y_data
\ No newline at end of file
+        x_array, y_array = self.curves_to_arrays(x_data, y_data)
+        x_list = self.get_x_list(len(x_array))
+        return [list(x_list) for _ in range(0, len(x_data))], [list(y_list) for y_list in y_array]
+
+    # Converts curves of any size into a 2D array of curves with the set step size (returns the x values and y values)
+    def curves_to_arrays(self, x_data, y_data):
+        x_end_array, coeffs_array = self.curves_to_polynomials(x_data, y_data)
+        return self.polynomials_to_curves(x_end_array, coeffs_array)
+
+    # Fits polynomials to curves of any size (returns an array of the x ends and a 2D array of the coefficients)
+    def curves_to_polynomials(self, x_data, y_data):
+        coeffs_array = np.zeros((len(x_data), self.poly_deg + 1))
+        x_end_array = np.array([max(x_list) for x_list in x_data], dtype = np.float64)
+
+        # Group the curves by size, so the fits of each size are solved at once
+        sizes = np.array([len(x_list) for x_list in x_data])
+        for size in np.unique(sizes):
+            indexes = np.flatnonzero(sizes == size)
+            x_group = np.array([x_data[i] for i in indexes], dtype = np.float64)
+            y_group = np.array([y_data[i] for i in indexes], dtype = np.float64)
+            pinv_group, scale_group = self.get_pinvs(x_group)
+            coeffs_array[indexes] = np.einsum('kij,kj->ki', pinv_group, y_group) / scale_group
+        return x_end_array, coeffs_array
+
+    # Converts polynomials into a 2D array of curves with the set step size and invalid values (returns the x values and y values)
+    def polynomials_to_curves(self, x_end_array, coeffs_array):
+        x_end_array = np.array(x_end_array, dtype = np.float64)
+        coeffs_array = np.array(coeffs_array, dtype = np.float64).reshape(len(x_end_array), -1)
+        y_array = self.evaluate(coeffs_array, x_end_array, self.x_array)
+
+        # Replace the values past the end of each curve with invalid values
+        num_valid_array = np.minimum(np.round(x_end_array / DEFAULT_STEP_SIZE), len(self.x_array))
+        y_array[np.arange(len(self.x_array)) >= num_valid_array[:,None]] = DEFAULT_INVALID_VALUE
+        return self.x_array.copy(), y_array
+
+    # Evaluates polynomials at the same x values (returns a 2D array)
+    def evaluate(self, coeffs_array, x_end_array, x_array):
+        x_array = np.array(x_array, dtype = np.float64)
+
+        # Evaluate the power series with Horner's method (identical to np.polyval for each row)
+        if self.basis == 'power':
+            y_array = np.zeros((len(coeffs_array), len(x_array)))
+            for coeffs in coeffs_array.T:
+                y_array = y_array * x_array + coeffs[:,None]
+            return y_array
+
+        # Evaluate the orthogonal series over the domain of each curve
+        t_array = get_domain(x_array[None,:], x_end_array[:,None])
+        val_function = np.polynomial.chebyshev.chebval if self.basis == 'chebyshev' else np.polynomial.legendre.legval
+        return val_function(t_array, coeffs_array.T[:,:,None], tensor = False)
+
+    # Gets the pseudo-inverses of the scaled design matrices of x values of the same size (cached per x values)
+    def get_pinvs(self, x_group):
+        keys = [x_list.tobytes() for x_list in x_group]
+        missing = [i for i in range(0, len(keys)) if not keys[i] in self.pinv_cache]
+        missing = list({keys[i]: i for i in missing}.values()) # once per unique x values
+        if len(missing) > 0:
+            if len(self.pinv_cache) + len(missing) > MAX_CACHED_GRIDS:
+                self.pinv_cache = {}
+
+            # Scale the columns like np.polyfit and factorise with the same cutoff
+            design_group = self.get_design(x_group[missing])
+            scale_group = np.sqrt(np.sum(design_group * design_group, axis = 1))
+            scale_group[scale_group == 0] = 1
+            pinv_group = np.linalg.pinv(design_group / scale_group[:,None,:], rcond = x_group.shape[1] * np.finfo(np.float64).eps)
+            for i, index in enumerate(missing):
+                self.pinv_cache[keys[index]] = (pinv_group[i], scale_group[i])
+        pinv_group = np.array([self.pinv_cache[key][0] for key in keys])
+        scale_group = np.array([self.pinv_cache[key][1] for key in keys])
+        return pinv_group, scale_group
+
+    # Gets the design matrices of x values of the same size (in decreasing powers for the power series)
+    def get_design(self, x_group):
+        if self.basis == 'power':
+            return np.power(x_group[:,:,None], np.arange(self.poly_deg, -1, -1))
+        t_group = get_domain(x_group, np.max(x_group, axis = 1)[:,None])
+        vander_function = np.polynomial.chebyshev.chebvander if self.basis == 'chebyshev' else np.polynomial.legendre.legvander
+        return vander_function(t_group, self.poly_deg)
+
+# Maps x values from [0, x_end] onto [-1, 1]
+def get_domain(x_array, x_end_array):
+    x_end_array = np.where(x_end_array > 0, x_end_array, 1)
+    return 2 * x_array / x_end_array - 1
\ No newline at end of file
@@ -6,9 +6,10 @@
 """
 
 # Libraries
-import random
+import os
+import numpy as np
 import packages.polyfier as polyfier
-import packages.io.excel as excel
+import packages.io.dataset as dataset
 import packages.model.visco_plastic as visco_plastic
 
 # Constants
@@ -18,34 +19,112 @@ COEFFS_LIST = ['c_' + str(term) for term in range(0, POLY_DEG + 1)]
 INPUT_PATH  = './results/param_sets/'
 INPUT_FILE  = 'wide_80_15'
 INPUT_SHEET = 'params'
+BATCH_SIZE  = 1000
+
+# Constants for the memory-mapped cache (a directory of .npy files next to the workbook)
+CACHE_EXTENSION = '.cache'
+ARRAY_NAMES     = ['params', 'x_end', 'coeffs']
+VERSION_NAME    = 'version' # modified time and size of the cached workbook (zeros if not from a workbook)
 
 # For sampling parameters
 class Sampler:
 
     # Constructor
-    def __init__(self):
-        xl = excel.Excel(path = INPUT_PATH, file = INPUT_FILE, sheet = INPUT_SHEET)
-        self.params_list = xl.read_columns(columns = PARAMS_LIST)
-        self.x_end_list  = xl.read_column(column = 'x_end')
-        self.coeffs_list = xl.read_columns(columns = COEFFS_LIST)
-        self.index_list  = [i for i in range(0, len(self.params_list))]
-        random.shuffle(self.index_list)
+    def __init__(self, path = INPUT_PATH, file = INPUT_FILE, seed = None):
+
+        # Memory-maps the parameters, x ends and coefficients (cached from the workbook if it has changed)
+        xlsx_file = path + file + '.xlsx'
+        self.cache_path = path + file + CACHE_EXTENSION + '/'
+        if os.path.isfile(xlsx_file):
+            version = get_version(xlsx_file)
+            if not np.array_equal(read_version(self.cache_path), version):
+                write_cache(self.cache_path, *read_workbook(xlsx_file), version)
+        self.params_array, self.x_end_array, self.coeffs_array = read_cache(self.cache_path)
+
+        # Shuffles the samples
+        self.pf = polyfier.Polyfier(POLY_DEG)
+        self.rng = np.random.default_rng(seed)
+        self.index_array = self.rng.permutation(len(self.params_array))
+        self.cursor = 0
+
+    # Gets the number of samples
+    def get_num_samples(self):
+        return len(self.params_array)
 
     # Reads random parameters and errors
     def sample(self, num_samples):
-        
-        # Gets a list of random indexes
-        index_list = [self.index_list.pop(0) for i in range(0, num_samples)]
-        
-        # Gets the inputs (params)
-        input_list = [self.params_list[i] for i in index_list]
-        
-        # Gets the outputs (y values)
-        output_list = []
-        pf = polyfier.Polyfier()
-        for i in index_list:
-            _, y_list = pf.polynomial_to_curve(self.x_end_list[i], self.coeffs_list[i])
-            output_list.append(y_list)
-
-        # Return input and output
-        return input_list, output_list
\ No newline at end of file
+        if self.cursor + num_samples > len(self.index_array):
+            raise IndexError('Only ' + str(len(self.index_array) - self.cursor) + ' samples remain')
+        index_array = self.index_array[self.cursor:self.cursor + num_samples]
+        self.cursor += num_samples
+        input_array, output_array = self.get_batch(index_array)
+        return input_array.tolist(), output_array.tolist()
+
+    # Yields shuffled batches of inputs (params) and outputs (y values) as arrays
+    def stream(self, batch_size = BATCH_SIZE, num_epochs = 1, seed = None):
+        rng = self.rng if seed == None else np.random.default_rng(seed)
+        for _ in range(0, num_epochs):
+            index_array = rng.permutation(len(self.params_array))
+            for start in range(0, len(index_array), batch_size):
+                yield self.get_batch(index_array[start:start + batch_size])
+
+    # Gets the inputs and outputs of some samples (read from the cache in order)
+    def get_batch(self, index_array):
+        order = np.argsort(index_array, kind = 'stable')
+        unsort = np.argsort(order, kind = 'stable')
+        sorted_indexes = index_array[order]
+        input_array = np.array(self.params_array[sorted_indexes])[unsort]
+        x_end_array = np.array(self.x_end_array[sorted_indexes])[unsort]
+        coeffs_array = np.array(self.coeffs_array[sorted_indexes])[unsort]
+        _, output_array = self.pf.polynomials_to_curves(x_end_array, coeffs_array)
+        return input_array, output_array
+
+# Reads the parameters, x ends and coefficients of a workbook
+def read_workbook(xlsx_file):
+    ds = dataset.get_dataset(xlsx_file)
+    params_array = np.column_stack([ds.get_array(INPUT_SHEET, param).astype(np.float64) for param in PARAMS_LIST])
+    x_end_array = ds.get_array(INPUT_SHEET, 'x_end').astype(np.float64)
+    coeffs_array = np.column_stack([ds.get_array(INPUT_SHEET, coeff).astype(np.float64) for coeff in COEFFS_LIST])
+    return params_array, x_end_array, coeffs_array
+
+# Gets the version of a workbook
+def get_version(xlsx_file):
+    stat = os.stat(xlsx_file)
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype = np.int64)
+
+# Reads the version of a cache (none if there is no complete cache)
+def read_version(cache_path):
+    try:
+        return np.load(cache_path + VERSION_NAME + '.npy')
+    except OSError:
+        return None
+
+# Writes the arrays of a cache
+def write_cache(cache_path, params_array, x_end_array, coeffs_array, version = np.zeros(2, dtype = np.int64)):
+    arrays = create_cache(cache_path, len(x_end_array), params_array.shape[1], coeffs_array.shape[1])
+    for array, values in zip(arrays, [params_array, x_end_array, coeffs_array]):
+        array[:] = values
+    finish_cache(cache_path, arrays, version)
+
+# Creates the memory-mapped arrays of a cache to be written to (removes the version until finished)
+def create_cache(cache_path, num_rows, num_params, num_coeffs):
+    os.makedirs(cache_path, exist_ok = True)
+    for name in [VERSION_NAME] + ARRAY_NAMES: # replaced rather than overwritten while memory-mapped by readers
+        if os.path.isfile(cache_path + name + '.npy'):
+            os.remove(cache_path + name + '.npy')
+    shapes = [(num_rows, num_params), (num_rows,), (num_rows, num_coeffs)]
+    return [np.lib.format.open_memmap(cache_path + name + '.npy', mode = 'w+', dtype = np.float64, shape = shape) for name, shape in zip(ARRAY_NAMES, shapes)]
+
+# Flushes the arrays of a cache and writes its version (so the cache is only read once complete)
+def finish_cache(cache_path, arrays, version = np.zeros(2, dtype = np.int64)):
+    for array in arrays:
+        array.flush()
+    temp_file = cache_path + VERSION_NAME + '.' + str(os.getpid()) + '.tmp.npy'
+    np.save(temp_file, version)
+    os.replace(temp_file, cache_path + VERSION_NAME + '.npy')
+
+# Memory-maps the arrays of a cache
+def read_cache(cache_path):
+    if read_version(cache_path) is None:
+        raise FileNotFoundError('There is no sample cache at ' + cache_path)
+    return [np.load(cache_path + name + '.npy', mmap_mode = 'r') for name in ARRAY_NAMES]
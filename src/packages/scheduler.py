@@ -0,0 +1,153 @@
+"""
+ Title: Scheduler
+ Description: For running queued optimisations concurrently in separate processes
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import os, signal, heapq, itertools
+from multiprocessing import Process, Pipe
+import packages.optimiser as optimiser
+
+# Constants
+DEFAULT_PRIORITY = 0
+DEFAULT_CPUS     = 1
+
+# Job statuses
+QUEUED    = 'queued'
+RUNNING   = 'running'
+FINISHED  = 'finished'
+FAILED    = 'failed'
+CANCELLED = 'cancelled'
+
+# Class for an optimisation job
+class Job:
+
+    # Constructor
+    def __init__(self, identifier, settings, priority = DEFAULT_PRIORITY, num_cpus = DEFAULT_CPUS):
+        self.identifier = identifier
+        self.settings = settings
+        self.priority = priority
+        self.num_cpus = num_cpus
+        self.status = QUEUED
+        self.process = None
+        self.connection = None # receives the progress of the running job
+        self.progress = {}
+
+    # Receives the latest progress of the job
+    def update_progress(self):
+        try:
+            while self.connection != None and self.connection.poll():
+                self.progress = self.connection.recv()
+        except (EOFError, OSError): # the job has exited
+            self.connection.close()
+            self.connection = None
+
+    # Gets the status of the job
+    def get_status(self):
+        return {
+            'id':       self.identifier,
+            'status':   self.status,
+            'priority': self.priority,
+            'num_cpus': self.num_cpus,
+            'progress': self.progress,
+            'settings': self.settings,
+        }
+
+# Class for scheduling optimisation jobs
+class Scheduler:
+
+    # Constructor
+    def __init__(self, data_path = './', data_file = 'data', record_path = './', num_cpus = None, broker_authkey = None):
+        self.data_path = data_path
+        self.data_file = data_file
+        self.record_path = record_path
+        self.broker_authkey = broker_authkey # of the broker shared by the distributed jobs (if any)
+        self.num_cpus = get_num_cpus() if num_cpus == None else num_cpus
+        self.queue = [] # heap of (-priority, order, job)
+        self.jobs = {}
+        self.order = itertools.count()
+
+    # Adds a job to the queue (higher priorities first, then first in first out)
+    def submit(self, identifier, settings, priority = DEFAULT_PRIORITY, num_cpus = DEFAULT_CPUS):
+        num_cpus = max(1, min(num_cpus, self.num_cpus)) # so that large jobs can still run
+        job = Job(identifier, settings, priority, num_cpus)
+        heapq.heappush(self.queue, (-priority, next(self.order), job))
+        self.jobs[identifier] = job
+        return job
+
+    # Cancels a queued or running job (kills the job and its workers)
+    def cancel(self, identifier):
+        job = self.jobs[identifier]
+        if job.status == RUNNING:
+            try:
+                os.killpg(job.process.pid, signal.SIGTERM)
+            except:
+                job.process.terminate()
+            job.process.join()
+        if job.status in [QUEUED, RUNNING]:
+            job.status = CANCELLED
+
+    # Cancels all the jobs
+    def shutdown(self):
+        for identifier in list(self.jobs.keys()):
+            self.cancel(identifier)
+
+    # Gets the number of CPUs not used by running jobs
+    def get_free_cpus(self):
+        used_cpus = sum([job.num_cpus for job in self.jobs.values() if job.status == RUNNING])
+        return self.num_cpus - used_cpus
+
+    # Checks whether a job is queued or running
+    def is_active(self, identifier):
+        return identifier in self.jobs and self.jobs[identifier].status in [QUEUED, RUNNING]
+
+    # Checks whether there are no queued or running jobs
+    def is_idle(self):
+        return not any([job.status in [QUEUED, RUNNING] for job in self.jobs.values()])
+
+    # Receives the latest progress of the running jobs
+    def update_progress(self):
+        for job in self.jobs.values():
+            job.update_progress()
+
+    # Updates the finished jobs and starts queued jobs while there are enough CPUs
+    def poll(self):
+
+        # Update finished jobs
+        self.update_progress()
+        for job in self.jobs.values():
+            if job.status == RUNNING and not job.process.is_alive():
+                job.update_progress()
+                job.process.join()
+                job.status = FINISHED if job.process.exitcode == 0 else FAILED
+
+        # Start the next jobs (waits for CPUs rather than skipping ahead of the queue)
+        while len(self.queue) > 0:
+            job = self.queue[0][2]
+            if job.status == CANCELLED:
+                heapq.heappop(self.queue)
+                continue
+            if job.num_cpus > self.get_free_cpus():
+                break
+            heapq.heappop(self.queue)
+            job.connection, child_connection = Pipe(duplex = False) # one per job, so killed jobs cannot block others
+            job.process = Process(target = run_job, args = (job.settings, job.identifier, self.data_path, self.data_file, self.record_path, child_connection, self.broker_authkey))
+            job.process.start()
+            child_connection.close()
+            job.status = RUNNING
+
+# Gets the number of CPUs available to this process
+def get_num_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except:
+        return os.cpu_count()
+
+# Runs an optimisation within a job process
+def run_job(settings, identifier, data_path, data_file, record_path, progress_connection = None, broker_authkey = None):
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp() # so that cancelling also kills the workers of the job
+    opt = optimiser.Optimiser(settings, identifier, data_path, data_file, record_path, progress_connection, broker_authkey)
+    opt.run()
@@ -0,0 +1,97 @@
+"""
+ Title: Server
+ Description: For submitting optimisations and getting their status over a local HTTP interface
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import json, re, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Constants
+DEFAULT_HOST     = '127.0.0.1' # only accepts local connections
+DEFAULT_PORT     = 8765
+MAX_BODY_SIZE    = 1000000
+JOBS_PATH        = '/jobs'
+JOB_PATH_PATTERN = re.compile(r'^/jobs/(\d+)$')
+
+# Class for the local HTTP interface of the optimisation daemon
+class Server:
+
+    # Constructor (the functions are called from the threads of the server)
+    def __init__(self, submit_function, status_function, cancel_function, host = DEFAULT_HOST, port = DEFAULT_PORT):
+        self.submit_function = submit_function # settings -> (identifier, error message)
+        self.status_function = status_function # identifier (or none for all) -> status (or none if unknown)
+        self.cancel_function = cancel_function # identifier -> whether cancelled
+        self.httpd = ThreadingHTTPServer((host, port), get_handler(self))
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target = self.httpd.serve_forever, daemon = True)
+
+    # Starts serving requests in the background
+    def start(self):
+        self.thread.start()
+
+    # Stops serving requests
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# Gets the request handler of a server
+def get_handler(server):
+
+    # Class for handling the requests
+    class Handler(BaseHTTPRequestHandler):
+
+        # Submits an optimisation (POST /jobs with the settings as JSON)
+        def do_POST(self):
+            if self.path != JOBS_PATH:
+                return self.send_json(404, {'error': 'Unknown path ' + self.path})
+            length = int(self.headers.get('Content-Length', 0))
+            if length > MAX_BODY_SIZE:
+                return self.send_json(413, {'error': 'The settings are too large'})
+            try:
+                settings = json.loads(self.rfile.read(length))
+            except ValueError:
+                return self.send_json(400, {'error': 'The settings are not valid JSON'})
+            if not isinstance(settings, dict):
+                return self.send_json(400, {'error': 'The settings must be a JSON object'})
+            try:
+                identifier, error = server.submit_function(settings)
+            except Exception as exception: # so the handler still responds
+                return self.send_json(400, {'error': 'Could not submit the optimisation (' + str(exception) + ')'})
+            if error != None:
+                return self.send_json(400, {'error': error})
+            self.send_json(201, {'id': identifier})
+
+        # Gets the status and progress of all the optimisations (GET /jobs) or one (GET /jobs/<id>)
+        def do_GET(self):
+            if self.path == JOBS_PATH:
+                return self.send_json(200, server.status_function(None))
+            match = JOB_PATH_PATTERN.match(self.path)
+            status = server.status_function(int(match.group(1))) if match else None
+            if status == None:
+                return self.send_json(404, {'error': 'Unknown job ' + self.path})
+            self.send_json(200, status)
+
+        # Cancels an optimisation (DELETE /jobs/<id>)
+        def do_DELETE(self):
+            match = JOB_PATH_PATTERN.match(self.path)
+            if not match or not server.cancel_function(int(match.group(1))):
+                return self.send_json(404, {'error': 'Unknown job ' + self.path})
+            self.send_json(200, server.status_function(int(match.group(1))))
+
+        # Sends a response as JSON
+        def send_json(self, code, data):
+            body = json.dumps(data, default = str).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # Suppresses the logging of each request
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
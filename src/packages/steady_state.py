@@ -0,0 +1,93 @@
+"""
+ Title: Steady-state NSGA-II
+ Description: For breeding and evaluating offspring asynchronously, so workers do not wait for the slowest of a generation
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import numpy as np
+from pymoo.algorithms.moo.nsga2 import RankAndCrowdingSurvival, binary_tournament
+from pymoo.operators.selection.tournament import TournamentSelection
+from pymoo.core.duplicate import DefaultDuplicateElimination
+from pymoo.core.mating import Mating
+from pymoo.core.population import Population
+from pymoo.core.sampling import Sampling
+from pymoo.core.result import Result
+
+# Constants
+MAX_MATINGS = 100 # attempts to breed an offspring that is not a duplicate
+
+# The steady-state NSGA-II algorithm (with the setup, has_next, next and result of the pymoo algorithms)
+class SteadyState:
+
+    # Constructor
+    def __init__(self, pop_size, offspring, max_evals, sampling, crossover, mutation):
+        self.pop_size = pop_size
+        self.offspring = offspring # evaluations per generation (for counting generations)
+        self.max_evals = max_evals
+        self.sampling = sampling
+        self.mating = Mating(TournamentSelection(func_comp = binary_tournament), crossover, mutation,
+                             eliminate_duplicates = DefaultDuplicateElimination(), n_max_iterations = MAX_MATINGS)
+        self.survival = RankAndCrowdingSurvival()
+        self.tournament_type = 'comp_by_dom_and_crowding' # read by the binary tournament
+        self.problem = None
+        self.pop = Population()
+        self.unsent = [] # parameters to evaluate before breeding
+        self.in_flight = {} # key: parameters (of evaluations that have not finished)
+        self.num_sent = 0
+        self.num_evals = 0
+        self.n_gen = 0
+
+    # Sends the evaluations that have not finished to the checkpoint as unsent (since the evaluator is not saved)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['unsent'] = list(self.in_flight.values()) + self.unsent
+        state['in_flight'] = {}
+        state['num_sent'] = self.num_sent - len(self.in_flight)
+        return state
+
+    # Prepares the initial population to evaluate
+    def setup(self, problem, **kwargs):
+        self.problem = problem
+        initial = self.sampling.do(problem, self.pop_size) if isinstance(self.sampling, Sampling) else self.sampling
+        self.unsent = list(initial.get('X') if isinstance(initial, Population) else np.array(initial))
+
+    # Checks whether the evaluation budget has not been used
+    def has_next(self):
+        return self.num_evals < self.max_evals
+
+    # Keeps the workers busy, then adds the finished evaluations to the population
+    def next(self):
+        while len(self.in_flight) < self.problem.evaluator.get_num_workers() and self.num_sent < self.max_evals:
+            params = self.get_next_params()
+            if params is None:
+                break
+            self.in_flight[self.problem.submit(params)] = params
+            self.num_sent += 1
+        for key, err_list in self.problem.get_completed():
+            params = self.in_flight.pop(key)
+            individual = Population.new('X', np.array([params]), 'F', np.array([err_list], dtype = float), 'CV', np.zeros((1, 1)))
+            self.pop = self.survival.do(self.problem, Population.merge(self.pop, individual), n_survive = self.pop_size)
+            self.num_evals += 1
+        self.n_gen = 0 if self.num_evals < self.pop_size else (self.num_evals - self.pop_size) // self.offspring + 1
+
+    # Gets the parameters to evaluate next (from the initial population, then bred from the population)
+    def get_next_params(self):
+        if len(self.unsent) > 0:
+            return self.unsent.pop(0)
+        if len(self.pop) < 2 and len(self.in_flight) > 0:
+            return None # wait for parents
+        offspring = self.mating.do(self.problem, self.pop, 1, algorithm = self) if len(self.pop) >= 2 else []
+        if len(offspring) == 0: # sample instead if only duplicates were bred
+            return np.random.uniform(self.problem.xl, self.problem.xu)
+        return offspring.get('X')[0]
+
+    # Gets the non-dominated parameters of the population
+    def result(self):
+        result = Result()
+        result.pop = self.pop
+        result.opt = self.pop[self.pop.get('rank') == 0] if len(self.pop) > 0 else self.pop
+        result.X = result.opt.get('X')
+        result.F = result.opt.get('F')
+        return result
@@ -6,6 +6,7 @@
 """
 
 # Libraries
+import math, os, time
 import numpy as np
 import pickle
 from smt.surrogate_models import KPLS
@@ -17,25 +18,57 @@ TRAINING_SAMPLES    = 273 # k^2 + 2*k + c_p (number of centre points)
 TESTING_SAMPLES     = 10
 MODEL_PATH          = './results/'
 MODEL_FILE          = 'sm'
+NUM_COMPONENTS      = None # principal components of the output curves (none to not compress)
+FORMAT_VERSION      = 1
+
+# Surrogate-assisted optimisation constants
+SELECT_FRACTION     = 0.1 # fraction of the candidates to simulate
+EXPLORE_FRACTION    = 0.2 # fraction of the simulated candidates to select randomly
+REFRESH_INTERVAL    = 5 # generations between retraining
+MIN_SAMPLES         = 50
+MAX_SAMPLES         = 500 # most recent samples to train with
 
 # Surrogate Model
 class Surrogate:
 
-    # Constructor
-    def __init__(self):
+    # Constructor (compresses the output curves into their principal components if a number is given)
+    def __init__(self, num_components = NUM_COMPONENTS):
         self.sm = KPLS(theta0=[1e-2]) # kriging model using partial least squares (PLS) 
         self.pf = polyfier.Polyfier()
+        self.num_components = num_components
+        self.pca_mean = None
+        self.pca_components = None
+        self.predict_time = 0.0
+        self.num_predicted = 0
 
     # Trains the surrogate model
     def train_sm(self, input_list, output_list):
-        self.sm.set_training_values(np.array(input_list), np.array(output_list))
+        output_array = np.array(output_list, dtype = np.float64)
+        if self.num_components != None:
+            self.pca_mean, self.pca_components = get_principal_components(output_array, self.num_components)
+            output_array = (output_array - self.pca_mean) @ self.pca_components.T
+        self.sm.set_training_values(np.array(input_list, dtype = np.float64), output_array)
         self.sm.train()
 
+    # Predicts the output curves of a 2D array of inputs (returns a 2D array)
+    def predict(self, params_array):
+        start_time = time.perf_counter()
+        output_array = self.sm.predict_values(np.array(params_array, dtype = np.float64))
+        if self.pca_components is not None:
+            output_array = output_array @ self.pca_components + self.pca_mean
+        self.predict_time += time.perf_counter() - start_time
+        self.num_predicted += len(output_array)
+        return output_array
+
+    # Gets the mean time to predict a thousand inputs
+    def get_latency(self):
+        return 1000 * self.predict_time / self.num_predicted if self.num_predicted > 0 else 0.0
+
     # Assesses the surrogate model
     def assess_sm(self, input_list, output_list):
         
         # Initialise
-        prd_output_list = self.sm.predict_values(np.array(input_list))
+        prd_output_list = self.predict(input_list)
 
         # Compare with expected output
         for i in range(0, len(input_list)):
@@ -54,13 +87,97 @@ class Surrogate:
             plt.exp_plot([exp_x_list], [exp_y_list])
             plt.prd_plot([prd_x_list], [prd_y_list])
             plt.save_plot()
+        print('Predicted ' + str(len(input_list)) + ' curves in ' + str(round(self.get_latency(), 4)) + 's per 1000')
+
+    # Saves the trained model (the principal components and the model in a versioned archive, with the model still pickled, since
+    # SMT models cannot be rebuilt without retraining, so only archives from trusted sources should be loaded)
+    def save_sm(self, path = MODEL_PATH, file = MODEL_FILE):
+        arrays = {'version': np.array(FORMAT_VERSION), 'sm': np.frombuffer(pickle.dumps(self.sm), dtype = np.uint8)}
+        if self.pca_components is not None:
+            arrays.update({'pca_mean': self.pca_mean, 'pca_components': self.pca_components})
+        temp_file = path + file + '.' + str(os.getpid()) + '.tmp.npz'
+        np.savez(temp_file, **arrays)
+        os.replace(temp_file, path + file + '.npz')
+
+    # Loads the trained model (from the archive, or the pickled model of older versions, both unpickling the model)
+    def load_sm(self, path = MODEL_PATH, file = MODEL_FILE):
+        if not os.path.isfile(path + file + '.npz'):
+            with open(path + file + ".pkl", "rb") as f:
+                self.sm = pickle.load(f)
+            self.pca_mean = self.pca_components = None
+            return
+        with np.load(path + file + '.npz') as arrays:
+            if int(arrays['version']) > FORMAT_VERSION:
+                raise ValueError('The surrogate model was saved in a newer format (version ' + str(int(arrays['version'])) + ')')
+            self.sm = pickle.loads(arrays['sm'].tobytes())
+            self.pca_mean = arrays['pca_mean'] if 'pca_mean' in arrays.files else None
+            self.pca_components = arrays['pca_components'] if 'pca_components' in arrays.files else None
+        self.num_components = None if self.pca_components is None else len(self.pca_components)
+
+# Surrogate assistant for only simulating the most promising candidates
+class Assistant:
+
+    # Constructor
+    def __init__(self, objective, num_stresses, select_fraction = SELECT_FRACTION, explore_fraction = EXPLORE_FRACTION, refresh_interval = REFRESH_INTERVAL, num_components = NUM_COMPONENTS):
+        self.objective = objective
+        self.select_fraction = select_fraction
+        self.explore_fraction = explore_fraction
+        self.refresh_interval = refresh_interval
+        self.surrogates = [Surrogate(num_components) for _ in range(0, num_stresses)] # one per stress
+        for surrogate in self.surrogates:
+            surrogate.sm.options['print_global'] = False
+        self.pf = polyfier.Polyfier()
+        self.input_list = []
+        self.output_lists = [[] for _ in range(0, num_stresses)]
+        self.num_updates = 0
+        self.trained = False
+
+    # Adds a simulated candidate to the training samples (failed simulations are excluded)
+    def add(self, params, prd_x_data, prd_y_data):
+        if prd_x_data == [] or prd_y_data == []:
+            return
+        _, new_y_array = self.pf.curves_to_arrays(prd_x_data, prd_y_data)
+        self.input_list.append(list(params))
+        for i in range(0, len(self.output_lists)):
+            self.output_lists[i].append(new_y_array[i])
+
+    # Trains the surrogate models with the latest samples (once there are enough, then after every X updates)
+    def update(self):
+        self.num_updates += 1
+        if len(self.input_list) < MIN_SAMPLES or (self.trained and self.num_updates % self.refresh_interval != 0):
+            return
+        for i in range(0, len(self.surrogates)):
+            self.surrogates[i].train_sm(self.input_list[-MAX_SAMPLES:], self.output_lists[i][-MAX_SAMPLES:])
+        self.trained = True
+
+    # Predicts the curves of a list of candidates
+    def predict_curves(self, params_list):
+        prd_x_data_list = [[] for _ in params_list]
+        prd_y_data_list = [[] for _ in params_list]
+        for surrogate in self.surrogates:
+            prd_y_array = surrogate.predict(params_list)
+            for i in range(0, len(params_list)):
+                num_valid = max(int(np.argmax(prd_y_array[i])) + 1, 2) # curves drop to invalid values after failure
+                prd_x_data_list[i].append(self.pf.get_x_list(num_valid))
+                prd_y_data_list[i].append(list(prd_y_array[i][:num_valid]))
+        return prd_x_data_list, prd_y_data_list
 
-    # Saves the trained model (via pickling)
-    def save_sm(self):
-        with open(MODEL_PATH + MODEL_FILE + ".pkl", "wb") as f:
-            pickle.dump(self.sm, f)
+    # Selects the indexes of the most promising candidates and randomly selected candidates
+    def select(self, params_list):
+        if not self.trained:
+            return list(range(0, len(params_list)))
+        num_select = math.ceil(self.select_fraction * len(params_list))
+        num_explore = round(self.explore_fraction * num_select)
+        prd_x_data_list, prd_y_data_list = self.predict_curves(params_list)
+        err_avg_array = np.average(self.objective.get_errors_batch(prd_x_data_list, prd_y_data_list), axis = 1)
+        order = list(np.argsort(err_avg_array, kind = 'stable'))
+        selected = order[:num_select - num_explore]
+        remaining = order[num_select - num_explore:]
+        selected += list(np.random.choice(remaining, size = min(num_explore, len(remaining)), replace = False))
+        return sorted([int(index) for index in selected])
 
-    # Loads the trained model (via pickling)
-    def load_sm(self):
-        with open(MODEL_PATH + MODEL_FILE + ".pkl", "rb") as f:
-            self.sm = pickle.load(f)
\ No newline at end of file
+# Gets the mean and principal components of the rows of a 2D array
+def get_principal_components(output_array, num_components):
+    pca_mean = np.average(output_array, axis = 0)
+    _, _, vt = np.linalg.svd(output_array - pca_mean, full_matrices = False)
+    return pca_mean, vt[:num_components]
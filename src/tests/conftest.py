@@ -0,0 +1,12 @@
+"""
+ Title: Test configuration
+ Description: Lets the tests import the packages (as when running from creep/src)
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import os, sys
+
+# Add creep/src to the import path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
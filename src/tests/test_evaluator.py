@@ -0,0 +1,54 @@
+"""
+ Title: Evaluator tests
+ Description: Checks that the parameters evaluated in parallel are returned in the same order as in turn
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import time
+import numpy as np
+import pytest
+import packages.evaluator as evaluator
+import packages.error.objective as objective
+import packages.io.stats as stats
+
+# Constants
+PARAMS_LIST = [[float(i), 0.1 * (i + 1)] for i in range(0, 8)]
+
+# Class for a stub model (whose earlier parameters take longer, so the workers finish out of order)
+class StubModel:
+
+    # Constructor
+    def __init__(self):
+        self.stresses = [80, 90]
+        self.cache = None
+        self.stress_processes = 1
+        self.stats = stats.Stats()
+
+    # Gets the curves of a set of parameters (fails for the third set)
+    def get_prd_curves(self, index, rate):
+        time.sleep(0.02 * (len(PARAMS_LIST) - index))
+        if index == 2:
+            return [], []
+        prd_x_data = [list(np.linspace(0, 1000 + 100 * index, 50 + 10 * i)) for i in range(0, len(self.stresses))]
+        prd_y_data = [list(rate * (np.array(x_list) / 1000) ** 2) for x_list in prd_x_data]
+        return prd_x_data, prd_y_data
+
+# Gets an objective fitted to a stub experimental curve of each stress
+def get_objective():
+    exp_x_data = [list(np.linspace(0, 1000, 100)) for _ in range(0, 2)]
+    exp_y_data = [list(0.3 * (np.array(x_list) / 1000) ** 2) for x_list in exp_x_data]
+    return objective.Objective(['err_y_area', 'err_x_end'], exp_x_data, exp_y_data)
+
+# Checks that the results of the process pools are in the order of the parameters and the same as in turn
+@pytest.mark.parametrize('timeout', [None, 60])
+def test_map_params_keeps_order(timeout):
+    serial_results = evaluator.Evaluator(StubModel(), get_objective()).evaluate(PARAMS_LIST)
+    parallel_evaluator = evaluator.Evaluator(StubModel(), get_objective(), num_processes = 3, chunk_size = 1, timeout = timeout)
+    try:
+        parallel_results = parallel_evaluator.evaluate(PARAMS_LIST)
+    finally:
+        parallel_evaluator.stop()
+    assert [list(result) for result in parallel_results] == [list(result) for result in serial_results]
+    assert serial_results[2][0] == [] and serial_results[3][0] != []
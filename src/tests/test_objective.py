@@ -0,0 +1,41 @@
+"""
+ Title: Objective tests
+ Description: Checks the batch errors against the errors of each curve in turn
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import numpy as np
+import packages.error.objective as objective
+
+# Constants
+ERR_NAMES = [err_name for err_name, _ in objective.get_error_classes()]
+
+# Gets creep-like curves (one per stress) of a given length and rate
+def get_curves(num_points, rate, end_time):
+    x_data = [list(np.linspace(0, end_time * (1 + i / 10), num_points)) for i in range(0, 2)]
+    y_data = [list(rate * (1 + i) * (np.array(x_list) / end_time) ** 3 + 0.01 * np.array(x_list) / end_time) for i, x_list in enumerate(x_data)]
+    return x_data, y_data
+
+# Gets an objective of all the errors fitted to experimental curves
+def get_objective():
+    exp_x_data, exp_y_data = get_curves(150, 0.2, 1000)
+    return objective.Objective(ERR_NAMES, exp_x_data, exp_y_data, test_names = ['G32', 'G33'])
+
+# Checks that the batch errors are the same as the errors of each curve in turn (including failed evaluations)
+def test_errors_batch_matches_serial():
+    err_objective = get_objective()
+    prd_data_list = [get_curves(num_points, rate, end_time) for num_points, rate, end_time in [(120, 0.1, 800), (250, 0.3, 1500), (97, 0.2, 1000), (400, 0.05, 1200)]]
+    prd_data_list.insert(2, ([], []))
+    prd_x_data_list = [prd_x_data for prd_x_data, _ in prd_data_list]
+    prd_y_data_list = [prd_y_data for _, prd_y_data in prd_data_list]
+    err_array = err_objective.get_errors_batch(prd_x_data_list, prd_y_data_list)
+    serial_err_array = np.array([err_objective.get_errors(prd_x_data, prd_y_data) for prd_x_data, prd_y_data in prd_data_list], dtype = float)
+    assert err_array.shape == (len(prd_data_list), len(ERR_NAMES))
+    assert np.array_equal(err_array, serial_err_array)
+
+# Checks that the batch errors of only failed evaluations are penalised
+def test_errors_batch_penalises_failures():
+    err_array = get_objective().get_errors_batch([[], []], [[], []])
+    assert np.array_equal(err_array, np.full((2, len(ERR_NAMES)), float(objective.BIG_VALUE)))
@@ -0,0 +1,43 @@
+"""
+ Title: Visco-plastic model tests
+ Description: Checks the low fidelity screening against stub creep curves
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import numpy as np
+import pytest
+pytest.importorskip('neml')
+import packages.model.visco_plastic as visco_plastic
+
+# Gets a stub of the creep driver (held for all the steps if not ruptured, like the rupture time of NEML which excludes the loading)
+def get_stub_creep(rupture_time):
+    def creep(elvpdm_model, stress, srate, hold, nsteps = visco_plastic.SCREEN_STEPS, **kwargs):
+        hold_times = np.linspace(0, hold, nsteps + 1)[:-1]
+        rtime = hold_times[hold_times < rupture_time] if rupture_time != None else hold_times
+        return {'rtime': rtime, 'rstrain': np.linspace(0, 0.1, len(rtime))}
+    return creep
+
+# Gets a model screening a curve ending at 1000 hours (i.e., an envelope of 2000 hours)
+def get_screened_model():
+    model = visco_plastic.ViscoPlastic([80])
+    model.set_screen([[0, 1000]], [[0, 1]])
+    return model
+
+# Checks that curves that have not ruptured within the envelope are rejected
+def test_screen_rejects_unruptured(monkeypatch):
+    monkeypatch.setattr(visco_plastic.drivers, 'creep', get_stub_creep(None))
+    assert not get_screened_model().passes_screen(None)
+
+# Checks that curves that ruptured within the envelope pass
+def test_screen_passes_ruptured(monkeypatch):
+    monkeypatch.setattr(visco_plastic.drivers, 'creep', get_stub_creep(1500 * 3600))
+    assert get_screened_model().passes_screen(None)
+
+# Checks that curves that strain past the envelope are rejected
+def test_screen_rejects_strained(monkeypatch):
+    monkeypatch.setattr(visco_plastic.drivers, 'creep', get_stub_creep(1500 * 3600))
+    model = get_screened_model()
+    model.y_envelopes = [0.05]
+    assert not model.passes_screen(None)
@@ -0,0 +1,52 @@
+"""
+ Title: Main file for evaluation workers
+ Description: Main file for starting workers that evaluate the parameters of distributed optimisations
+ Author: Janzen Choi
+
+"""
+
+# Libraries
+import time
+from multiprocessing import Process
+import packages.distributed as distributed
+import packages.scheduler as scheduler
+
+# Broker constants (the host running main.py, with the authkey set by CREEP_AUTHKEY)
+BROKER_HOST     = 'localhost'
+BROKER_PORT     = distributed.BROKER_PORT
+
+# Worker constants
+NUM_WORKERS     = scheduler.get_num_cpus()
+MAX_TASKS       = 1 # tasks leased at once by each worker
+
+# Main function
+def main():
+
+    # Initialisation
+    start_time = time.time()
+    print('Program began on ' + time.strftime('%A, %D, %H:%M:%S', time.localtime()) + '!')
+
+    # Only connect with the key of the broker (which could otherwise run code in the workers)
+    if distributed.AUTHKEY == None:
+        print('Set CREEP_AUTHKEY to the authkey of the broker to start the workers!')
+        return
+
+    # Start the workers (which reconnect whenever the broker restarts)
+    workers = [Process(target = distributed.run_worker, args = (BROKER_HOST, BROKER_PORT, distributed.AUTHKEY, MAX_TASKS)) for _ in range(0, NUM_WORKERS)]
+    for worker in workers:
+        worker.start()
+    print(str(NUM_WORKERS) + ' worker(s) are evaluating for ' + BROKER_HOST + ':' + str(BROKER_PORT) + '!')
+
+    # Run the workers until halted
+    try:
+        for worker in workers:
+            worker.join()
+    finally:
+        for worker in workers:
+            worker.terminate()
+
+    # End
+    print('Program finished on ' + time.strftime('%A, %D, %H:%M:%S', time.localtime()) + ' in ' + str(round(time.time()-start_time)) + ' seconds!')
+
+if __name__ == "__main__":
+    main()